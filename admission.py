@@ -0,0 +1,206 @@
+"""
+Admission Control
+Sheds webhook load when the audit backlog, concurrent renders or process memory are over their limits
+"""
+
+import os
+import sys
+import time
+import logging
+import resource
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of this process.
+
+    Read from /proc on Linux; elsewhere falls back to the peak RSS, which
+    never decreases and so only makes the memory check more conservative.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class AdmissionRejected(Exception):
+    """The service is too busy to accept more audits right now"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float, signal: str = ""):
+        self.status_code = status_code
+        self.reason = reason
+        self.signal = signal
+        self.retry_after = retry_after
+        super().__init__(f"Service busy ({reason}), retry in {retry_after:.0f}s")
+
+
+class AdmissionController:
+    """
+    Accept/reject decisions for new audit requests.
+
+    The backlog is every accepted audit not yet finished: jobs running in
+    this process plus jobs still pending in the durable queue. A full
+    backlog or too many concurrent renders returns 429 (come back later);
+    RSS over its limit returns 503 (this instance is unhealthy). Retry-After
+    is the time the excess backlog needs to drain at the completion rate
+    observed over the last few minutes. A limit of 0 disables that check.
+    """
+
+    def __init__(
+        self,
+        max_queue_depth: int = 200,
+        max_inflight_renders: int = 0,
+        max_rss_mb: float = 0.0,
+        queue_depth: Optional[Callable[[], int]] = None,
+        drain_window_seconds: float = 300.0,
+        min_retry_after: float = 5.0,
+        max_retry_after: float = 600.0
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            max_queue_depth: Maximum unfinished audits (running + queued)
+            max_inflight_renders: Maximum PDF renders in progress; the render
+                stage never runs more than one per render process, so only a
+                value below the pool size has an effect
+            max_rss_mb: Maximum resident memory of this process in MB
+            queue_depth: Returns the number of jobs pending in the durable queue
+            drain_window_seconds: Window over which the completion rate is measured
+            min_retry_after: Lower bound of the Retry-After hint
+            max_retry_after: Upper bound of the Retry-After hint (also used
+                when nothing has completed recently)
+        """
+        self.max_queue_depth = max_queue_depth
+        self.max_inflight_renders = max_inflight_renders
+        self.max_rss_mb = max_rss_mb
+        self.drain_window_seconds = drain_window_seconds
+        self.min_retry_after = min_retry_after
+        self.max_retry_after = max_retry_after
+        self._queue_depth = queue_depth or (lambda: 0)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._rendering = 0
+        self._completions: Deque[float] = deque(maxlen=10000)
+        self._decisions = {"admitted": 0, "rejected_queue_depth": 0, "rejected_renders": 0, "rejected_memory": 0}
+
+    @classmethod
+    def from_env(cls, queue_depth: Optional[Callable[[], int]] = None) -> "AdmissionController":
+        """Build a controller configured from ADMISSION_* environment variables"""
+        return cls(
+            max_queue_depth=int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "200")),
+            # Off by default: renders wait in the durable queue, which the backlog check already bounds
+            max_inflight_renders=int(os.getenv("ADMISSION_MAX_INFLIGHT_RENDERS", "0")),
+            max_rss_mb=float(os.getenv("ADMISSION_MAX_RSS_MB", "0")),
+            queue_depth=queue_depth,
+            max_retry_after=float(os.getenv("ADMISSION_MAX_RETRY_AFTER_SECONDS", "600"))
+        )
+
+    def admit(self, count: int = 1):
+        """
+        Decide whether `count` new audits may be accepted.
+
+        Raises:
+            AdmissionRejected: With the HTTP status and Retry-After to return
+        """
+        if self.max_rss_mb > 0:
+            rss_mb = current_rss_bytes() / (1024 * 1024)
+            if rss_mb > self.max_rss_mb:
+                self._reject("memory", f"RSS {rss_mb:.0f}MB over {self.max_rss_mb:.0f}MB", 503, 1)
+
+        if self.max_inflight_renders > 0 and self._rendering >= self.max_inflight_renders:
+            self._reject("renders", f"{self._rendering} renders in progress", 429, 1)
+
+        if self.max_queue_depth > 0:
+            depth = self.backlog()
+            excess = depth + count - self.max_queue_depth
+            # An idle service takes any batch, so one larger than the limit is not refused forever
+            if excess > 0 and depth > 0:
+                self._reject("queue_depth", f"backlog of {depth} audits", 429, excess)
+
+        with self._lock:
+            self._decisions["admitted"] += count
+
+    def backlog(self) -> int:
+        """Unfinished audits: running here plus pending in the durable queue"""
+        return self._running + self._queue_depth()
+
+    def retry_after(self, excess: int = 1) -> float:
+        """Seconds until `excess` audits should have completed at the observed rate"""
+        rate = self.drain_rate()
+        if rate <= 0:
+            return self.max_retry_after
+        return min(self.max_retry_after, max(self.min_retry_after, excess / rate))
+
+    def drain_rate(self) -> float:
+        """Audits completed per second over the drain window"""
+        now = time.time()
+        cutoff = now - self.drain_window_seconds
+        with self._lock:
+            while self._completions and self._completions[0] <= cutoff:
+                self._completions.popleft()
+            completed = len(self._completions)
+        return completed / self.drain_window_seconds
+
+    def job_started(self):
+        """Count an audit as in progress"""
+        with self._lock:
+            self._running += 1
+
+    def job_finished(self):
+        """Count an audit as finished (successful or not); feeds the drain rate"""
+        with self._lock:
+            self._running -= 1
+            self._completions.append(time.time())
+
+    @contextmanager
+    def rendering(self) -> Iterator[None]:
+        """Count a PDF render as in progress"""
+        with self._lock:
+            self._rendering += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._rendering -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Decision counters and the current values of each admission signal"""
+        rate = self.drain_rate()
+        with self._lock:
+            decisions = dict(self._decisions)
+            running, rendering = self._running, self._rendering
+        return {
+            "decisions": decisions,
+            "running": running,
+            "backlog": running + self._queue_depth(),
+            "inflight_renders": rendering,
+            "rss_mb": round(current_rss_bytes() / (1024 * 1024), 1),
+            "drain_rate_per_minute": round(rate * 60, 2),
+            "limits": {
+                "max_queue_depth": self.max_queue_depth,
+                "max_inflight_renders": self.max_inflight_renders,
+                "max_rss_mb": self.max_rss_mb,
+            },
+        }
+
+    def _reject(self, signal: str, detail: str, status_code: int, excess: int):
+        with self._lock:
+            self._decisions[f"rejected_{signal}"] += 1
+        retry_after = self.retry_after(excess)
+        logger.warning("Admission rejected: %s (retry in %.0fs)", detail, retry_after)
+        raise AdmissionRejected(status_code, detail, retry_after, signal)
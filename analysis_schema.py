@@ -0,0 +1,156 @@
+"""
+Response Schema for AI Audit Analysis
+Pydantic models used to decode and validate the JSON returned by the LLM
+"""
+
+import re
+from enum import Enum
+from typing import Any, Dict, List, Union
+
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, ValidationInfo, field_validator
+
+
+class MaturityLevel(str, Enum):
+    """AI maturity level used for the summary and each department section"""
+    LOW = "Low"
+    MEDIUM = "Medium"
+    HIGH = "High"
+
+
+# Spellings the LLM commonly returns instead of the exact enum values
+_LEVEL_ALIASES = {
+    "low": MaturityLevel.LOW,
+    "medium": MaturityLevel.MEDIUM,
+    "med": MaturityLevel.MEDIUM,
+    "moderate": MaturityLevel.MEDIUM,
+    "high": MaturityLevel.HIGH,
+}
+
+_SCORE_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(?:%|/\s*100)?\s*$")
+
+
+def _coerce_level(value: Any) -> Any:
+    """Map case/spelling variations such as 'medium' or ' HIGH ' onto the enum"""
+    if isinstance(value, str):
+        return _LEVEL_ALIASES.get(value.strip().lower(), value)
+    return value
+
+
+class Drawback(BaseModel):
+    """A single gap or limitation identified in a department"""
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    title: str = "Unnamed Issue"
+    details: str = "No details provided."
+
+    @field_validator("title", "details", mode="before")
+    @classmethod
+    def _default_if_null(cls, value: Any, info: ValidationInfo) -> Any:
+        """Treat an explicit null like a missing field"""
+        if value is None:
+            return cls.model_fields[info.field_name].default
+        return value
+
+
+class Section(BaseModel):
+    """Department-level analysis"""
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True, use_enum_values=True)
+
+    section_name: str = Field(..., min_length=1)
+    level: MaturityLevel
+    drawbacks: List[Drawback]
+
+    @field_validator("level", mode="before")
+    @classmethod
+    def _normalize_level(cls, value: Any) -> Any:
+        return _coerce_level(value)
+
+
+class Summary(BaseModel):
+    """Overall summary of the audit"""
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True, use_enum_values=True)
+
+    personalized_summary: str = Field(..., min_length=1)
+    overall_risk_score: int = Field(..., ge=0, le=100)
+    ai_maturity_level: MaturityLevel
+
+    @field_validator("ai_maturity_level", mode="before")
+    @classmethod
+    def _normalize_level(cls, value: Any) -> Any:
+        return _coerce_level(value)
+
+    @field_validator("overall_risk_score", mode="before")
+    @classmethod
+    def _coerce_score(cls, value: Any) -> Any:
+        """Accept numeric strings ('68', '68/100', '68%') and round floats; reject booleans"""
+        if isinstance(value, bool):
+            raise ValueError("must be a number, not a boolean")
+        if isinstance(value, str):
+            match = _SCORE_PATTERN.match(value)
+            if match:
+                value = float(match.group(1))
+        if isinstance(value, float):
+            return int(round(value))
+        return value
+
+
+class AuditAnalysis(BaseModel):
+    """Complete LLM analysis as consumed by the PDF builder and mailer"""
+    model_config = ConfigDict(extra="ignore")
+
+    summary: Summary
+    sections: List[Section]
+
+
+class AnalysisValidationError(ValueError):
+    """Raised when the LLM output does not match the analysis schema"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def _format_errors(exc: ValidationError) -> List[str]:
+    """Flatten pydantic errors into 'sections.1.level: message' strings"""
+    formatted = []
+    for error in exc.errors():
+        location = ".".join(str(part) for part in error["loc"]) or "<root>"
+        formatted.append(f"{location}: {error['msg']}")
+    return formatted
+
+
+def parse_analysis(json_text: Union[str, bytes]) -> Dict[str, Any]:
+    """
+    Decode and validate an LLM analysis JSON document.
+
+    Args:
+        json_text: Raw JSON object text
+
+    Returns:
+        Normalized analysis dictionary
+
+    Raises:
+        orjson.JSONDecodeError: If the text is not valid JSON
+        AnalysisValidationError: If the document does not match the schema
+    """
+    return validate_analysis(orjson.loads(json_text))
+
+
+def validate_analysis(data: Any) -> Dict[str, Any]:
+    """
+    Validate an already decoded analysis object.
+
+    Args:
+        data: Decoded JSON value
+
+    Returns:
+        Normalized analysis dictionary
+
+    Raises:
+        AnalysisValidationError: If the document does not match the schema
+    """
+    try:
+        return AuditAnalysis.model_validate(data).model_dump()
+    except ValidationError as e:
+        raise AnalysisValidationError(_format_errors(e)) from e
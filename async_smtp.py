@@ -0,0 +1,219 @@
+"""
+Async SMTP Client
+Minimal SMTP client built directly on asyncio streams (no thread hop)
+"""
+
+import ssl
+import base64
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from mime_stream import iter_data_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSMTPError(Exception):
+    """SMTP server returned an unexpected reply"""
+
+    def __init__(self, code: int, message: str):
+        self.code = code
+        self.message = message
+        super().__init__(f"{code} {message}")
+
+
+class AsyncSMTPAuthenticationError(AsyncSMTPError):
+    """SMTP server rejected the credentials"""
+
+
+class AsyncSMTPDisconnected(AsyncSMTPError):
+    """Connection closed by the server"""
+
+    def __init__(self, message: str = "Connection unexpectedly closed"):
+        super().__init__(-1, message)
+
+
+class AsyncSMTPClient:
+    """
+    SMTP client for asyncio.
+
+    Port 465 uses implicit TLS; any other port must upgrade with STARTTLS
+    (like smtplib.SMTP.starttls in the sync pool), so credentials and
+    messages are never sent in plaintext.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        timeout: float = 30.0,
+        ssl_context: Optional[ssl.SSLContext] = None
+    ):
+        """
+        Initialize client. Call connect() before sending.
+
+        Args:
+            host: SMTP server hostname
+            port: SMTP port
+            username: SMTP login (skip AUTH when not set)
+            password: SMTP password
+            timeout: Timeout in seconds for each server reply
+            ssl_context: TLS context (defaults to system trust store)
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+
+        self.extensions: Dict[str, str] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """Open the connection, negotiate TLS and authenticate"""
+        implicit_tls = self.port == 465
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self.ssl_context if implicit_tls else None,
+                server_hostname=self.host if implicit_tls else None
+            ),
+            timeout=self.timeout
+        )
+
+        try:
+            await self._expect(220)
+            await self._ehlo()
+
+            if not implicit_tls:
+                if "starttls" not in self.extensions:
+                    raise AsyncSMTPError(-1, f"Server does not support STARTTLS on port {self.port}")
+                await self.execute("STARTTLS", 220)
+                await self._writer.start_tls(self.ssl_context, server_hostname=self.host)
+                await self._ehlo()
+
+            if self.username and self.password:
+                await self._login()
+        except BaseException:
+            self.close()
+            raise
+
+    async def sendmail_chunks(self, from_addr: str, to_addrs: List[str], chunks: Iterable[bytes]):
+        """
+        Stream a message during DATA, draining the socket after every chunk.
+
+        Args:
+            from_addr: Envelope sender
+            to_addrs: Envelope recipients
+            chunks: Message in wire format; each chunk starts at a line
+                boundary and ends with CRLF (see PreparedMessage.iter_chunks)
+        """
+        await self._start_data(from_addr, to_addrs)
+        for chunk in iter_data_chunks(chunks):
+            self._writer.write(chunk)
+            # Wait for the kernel to take the chunk before encoding the next one
+            await self._writer.drain()
+        await self._end_data()
+
+    async def _start_data(self, from_addr: str, to_addrs: List[str]):
+        mail_options = " BODY=8BITMIME" if "8bitmime" in self.extensions else ""
+        await self.execute(f"MAIL FROM:<{from_addr}>{mail_options}", 250)
+        for address in to_addrs:
+            await self.execute(f"RCPT TO:<{address}>", 250, 251)
+        await self.execute("DATA", 354)
+
+    async def _end_data(self):
+        self._writer.write(b".\r\n")
+        await self._writer.drain()
+        await self._expect(250)
+
+    async def noop(self) -> int:
+        """Send NOOP and return the reply code"""
+        code, _ = await self.execute("NOOP")
+        return code
+
+    async def quit(self):
+        """End the session politely"""
+        try:
+            await self.execute("QUIT")
+        except (AsyncSMTPError, OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """Close the transport without a QUIT"""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def execute(self, command: str, *expected: int) -> Tuple[int, str]:
+        """
+        Send a command and read its reply.
+
+        Args:
+            command: Command line without CRLF
+            expected: Accepted reply codes (any code when empty)
+
+        Returns:
+            Tuple of (reply code, reply text)
+        """
+        if not self.is_connected:
+            raise AsyncSMTPDisconnected("Not connected")
+        self._writer.write(command.encode("ascii") + b"\r\n")
+        await self._writer.drain()
+        return await self._expect(*expected)
+
+    async def _expect(self, *expected: int) -> Tuple[int, str]:
+        code, message = await asyncio.wait_for(self._read_reply(), timeout=self.timeout)
+        if expected and code not in expected:
+            raise AsyncSMTPError(code, message)
+        return code, message
+
+    async def _read_reply(self) -> Tuple[int, str]:
+        """Read a (possibly multi-line) reply"""
+        lines = []
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                self.close()
+                raise AsyncSMTPDisconnected()
+            line = line.decode("utf-8", "replace").rstrip("\r\n")
+            lines.append(line[4:])
+            if len(line) < 4 or line[3] != "-":
+                try:
+                    return int(line[:3]), "\n".join(lines)
+                except ValueError:
+                    raise AsyncSMTPError(-1, f"Malformed reply: {line}")
+
+    async def _ehlo(self):
+        _, message = await self.execute("EHLO localhost", 250)
+        self.extensions = {}
+        for line in message.split("\n")[1:]:
+            keyword, _, params = line.partition(" ")
+            self.extensions[keyword.lower()] = params
+
+    async def _login(self):
+        mechanisms = self.extensions.get("auth", "").upper().split()
+        try:
+            if "PLAIN" in mechanisms or not mechanisms:
+                token = base64.b64encode(f"\0{self.username}\0{self.password}".encode()).decode()
+                await self.execute(f"AUTH PLAIN {token}", 235)
+            else:
+                await self.execute("AUTH LOGIN", 334)
+                await self.execute(base64.b64encode(self.username.encode()).decode(), 334)
+                await self.execute(base64.b64encode(self.password.encode()).decode(), 235)
+        except AsyncSMTPError as e:
+            if isinstance(e, AsyncSMTPDisconnected):
+                raise
+            raise AsyncSMTPAuthenticationError(e.code, e.message) from e
@@ -0,0 +1,339 @@
+"""
+Audit Worker
+Runs queued audits (LLM -> PDF -> email); embedded in the API process or standalone via `python -m audit_worker`
+"""
+
+import os
+import time
+import signal
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+
+from llm_client import LLMClient
+from render_pool import RenderPool
+from pipeline import Pipeline, Stage
+from mailer import EmailService
+from mail_outbox import MailOutbox, OutboxWorker, DELIVER_NOW_HOLD_SECONDS
+from job_queue import JobQueue, JobWorker
+from job_tracker import JobTracker
+from job_events import JobEventHub
+from admission import AdmissionController
+from report_store import ReportStore
+from loop_monitor import LoopMonitor
+import metrics
+import tracing
+import log_setup
+
+logger = logging.getLogger(__name__)
+
+# Initialize services
+llm_client = LLMClient()
+# REPORT_DELIVERY_MODE=link emails a signed download link instead of attaching the PDF
+report_store = ReportStore.from_env() if os.getenv("REPORT_DELIVERY_MODE", "attachment") == "link" else None
+email_service = EmailService(report_store=report_store)
+mail_outbox = MailOutbox()
+outbox_worker = OutboxWorker.from_env(mail_outbox, email_service)
+job_queue = JobQueue.from_env()
+admission = AdmissionController.from_env(queue_depth=job_queue.pending_count)
+# Progress events streamed by GET /jobs/{request_id}/events
+job_events = JobEventHub()
+# Recent job status and per-stage timings (GET /jobs/{request_id})
+job_tracker = JobTracker(
+    max_entries=int(os.getenv("JOB_STATUS_MAX_ENTRIES", "10000")),
+    retention_seconds=float(os.getenv("JOB_STATUS_RETENTION_HOURS", "24")) * 3600,
+    events=job_events
+)
+# Event-loop lag and blocking-call detection
+loop_monitor = LoopMonitor.from_env()
+
+@dataclass
+class AuditJob:
+    """An audit moving through the pipeline; each stage fills in its result"""
+    request_id: str
+    request_data: Dict[str, Any]
+    llm_response: Optional[Dict[str, Any]] = None
+    pdf_path: Optional[str] = None
+    # Span of the whole audit; stage spans are its children
+    trace: Optional[tracing.SpanContext] = None
+
+
+async def run_llm_stage(job: AuditJob):
+    """Stage 1: call the LLM to generate the analysis"""
+    request_id, request_data = job.request_id, job.request_data
+    company_name = request_data.get('company_name', 'Unknown')
+    logger.info("Starting audit processing for %s", company_name)
+    logger.info("Company: %s, Industry: %s", company_name, request_data.get('industry'))
+    
+    logger.info("Calling LLM for analysis...")
+    token_usage: Dict[str, int] = {}
+    with job_tracker.stage(request_id, "llm"):
+        llm_response = await llm_client.generate_audit_analysis(request_data, usage=token_usage)
+    job_tracker.update(request_id, tokens=token_usage)
+    
+    if not llm_response:
+        raise Exception("LLM returned empty response")
+    
+    # Log LLM response details
+    summary = llm_response.get('summary', {})
+    personalized_summary = summary.get('personalized_summary', '')
+    
+    logger.info("LLM analysis completed successfully")
+    logger.info("Summary length: %s chars", len(personalized_summary))
+    logger.info("Risk score: %s", summary.get('overall_risk_score'))
+    logger.info("Maturity: %s", summary.get('ai_maturity_level'))
+    logger.info("Sections: %s", len(llm_response.get('sections', [])))
+    
+    # Check if it's a fallback response
+    if 'demonstrates foundational digital capabilities' in personalized_summary:
+        logger.warning("⚠️  Response appears to be FALLBACK (generic text)")
+    else:
+        logger.info("✓ Response appears customized")
+    
+    # Verify company name is in summary
+    if company_name.lower() in personalized_summary.lower():
+        logger.info("✓ Company name found in summary")
+    else:
+        logger.warning("⚠️  Company name NOT in summary - may be fallback")
+    
+    job.llm_response = llm_response
+    # If this worker stops before the audit is finished, the next one starts at the render stage
+    job_queue.save_checkpoint(request_id, {"llm_response": llm_response})
+
+
+async def run_render_stage(job: AuditJob):
+    """Stage 2: generate the PDF with visualizations (in a render worker process)"""
+    request_id = job.request_id
+    logger.info("Generating PDF report...")
+    with (
+        job_tracker.stage(request_id, "render"),
+        admission.rendering(),
+        metrics.RENDERS_IN_FLIGHT.track_inprogress(),
+        metrics.RENDER_LATENCY.time()
+    ):
+        job.pdf_path = await render_pool.render(
+            company_data=job.request_data,
+            llm_analysis=job.llm_response,
+            request_id=request_id,
+            progress=lambda index, total: job_tracker.publish(request_id, "section", index=index, total=total)
+        )
+    job_tracker.update(request_id, pdf_bytes=os.path.getsize(job.pdf_path))
+    
+    logger.info("PDF generated at: %s", job.pdf_path)
+
+
+async def run_mail_stage(job: AuditJob):
+    """Stage 3: send the email (the outbox keeps the report until delivery succeeds)"""
+    request_id, request_data, pdf_path = job.request_id, job.request_data, job.pdf_path
+    if email_service.enabled:
+        logger.info("Sending email to %s...", request_data['recipient_email'])
+        pdf_path = email_service.prepare_report(pdf_path, request_id, request_data['company_name'])
+        outbox_id = mail_outbox.enqueue(
+            request_id=request_id,
+            recipient_email=request_data['recipient_email'],
+            recipient_name=request_data['recipient_name'],
+            company_name=request_data['company_name'],
+            personalized_summary=job.llm_response['summary']['personalized_summary'],
+            pdf_path=pdf_path,
+            # Digest window, or a hold that keeps drain loops of other processes off it while deliver_now sends it
+            hold_seconds=email_service.digest_window_seconds or DELIVER_NOW_HOLD_SECONDS
+        )
+        # From here the outbox owns delivery; a resumed job must not send the report again
+        job_queue.save_checkpoint(request_id, {"outbox_id": outbox_id})
+        
+        if email_service.digest_window_seconds > 0:
+            # Sent by the outbox worker together with other reports for this recipient
+            logger.info("Email held for digest batching (item %s)", outbox_id)
+            job_tracker.update(request_id, email_status="batched")
+            job_tracker.publish(request_id, "mail_batched")
+        else:
+            with job_tracker.stage(request_id, "mail"):
+                email_sent = await outbox_worker.deliver_now(outbox_id)
+            job_tracker.update(request_id, email_status="sent" if email_sent else "queued_for_retry")
+            job_tracker.publish(request_id, "mailed" if email_sent else "mail_queued")
+            
+            if not email_sent:
+                logger.warning("Email not sent yet - queued in outbox for retry (item %s)", outbox_id)
+    else:
+        logger.warning("Email service is not enabled. Skipping email send.")
+        job_tracker.update(request_id, email_status="disabled")
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+            logger.info("Cleaned up PDF file")
+
+
+def _traced(name: str, handler):
+    """
+    Run a stage handler in a span of the job's trace, with the job's
+    request_id bound for logging (stage workers do not inherit the caller's context)
+    """
+    async def run(job: AuditJob):
+        with log_setup.bind_request_id(job.request_id), tracing.span(name, parent=job.trace):
+            await handler(job)
+    return run
+
+
+# LLM and SMTP stages are I/O-bound (high concurrency); rendering is CPU-bound (sized to cores)
+render_pool = RenderPool.from_env(output_dir=os.getenv("OUTPUT_DIR", "/tmp"))
+_stage_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+audit_pipeline = Pipeline([
+    Stage("llm", _traced("stage.llm", run_llm_stage), int(os.getenv("PIPELINE_LLM_WORKERS", "8")), _stage_queue_size),
+    Stage("render", _traced("stage.render", run_render_stage), max(1, render_pool.processes), _stage_queue_size),
+    Stage("mail", _traced("stage.mail", run_mail_stage), int(os.getenv("PIPELINE_MAIL_WORKERS", "8")), _stage_queue_size),
+])
+
+
+# Job Handler (run by job_worker)
+async def process_audit_request(
+    request_data: Dict[str, Any],
+    request_id: str,
+    created_at: Optional[float] = None,
+    lane: Optional[str] = None,
+    checkpoint: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    Process an audit request through the pipeline stages:
+    1. Call LLM to generate analysis
+    2. Create PDF with visualizations
+    3. Send email with PDF attachment
+    
+    Progress and per-stage timings are recorded in job_tracker.
+    
+    Args:
+        request_data: Validated audit request
+        request_id: Request/job ID
+        created_at: When the request was accepted (for queue wait time)
+        lane: Priority lane the job was queued in (for per-lane latency)
+        checkpoint: Progress saved by a worker that stopped during this job;
+            finished stages are skipped
+    
+    Returns:
+        True if the report was generated and handed to the mailer
+    """
+    job_tracker.start(request_id, created_at, lane)
+    admission.job_started()
+    metrics.JOBS_IN_FLIGHT.inc()
+    if created_at is not None:
+        metrics.QUEUE_WAIT.labels(lane or "unknown").observe(max(0.0, time.time() - created_at))
+    # The audit span starts at acceptance, so queue wait is part of the trace
+    with (
+        log_setup.bind_request_id(request_id),
+        tracing.span("audit", request_id, start=created_at, lane=lane) as audit_span
+    ):
+        if created_at is not None:
+            tracing.record("queue.wait", created_at, time.time(), lane=lane)
+        try:
+            checkpoint = checkpoint or {}
+            if checkpoint.get("outbox_id") is not None:
+                logger.info("Resumed after the report reached the outbox (item %s); nothing left to do", checkpoint["outbox_id"])
+                audit_span.set(resumed_from="outbox")
+            elif checkpoint.get("llm_response") is not None:
+                logger.info("Resuming from the render stage with the saved LLM analysis")
+                audit_span.set(resumed_from="render")
+                await audit_pipeline.run(AuditJob(
+                    request_id=request_id, request_data=request_data,
+                    llm_response=checkpoint["llm_response"], trace=tracing.current()
+                ), start="render")
+            else:
+                await audit_pipeline.run(AuditJob(request_id=request_id, request_data=request_data, trace=tracing.current()))
+            
+            logger.info("Audit processing completed successfully")
+            job_tracker.finish(request_id)
+            metrics.JOBS_FINISHED.labels(lane or "unknown", "done").inc()
+            return True
+            
+        except Exception as e:
+            logger.error("Error processing audit request: %s", e, exc_info=True)
+            job_tracker.finish(request_id, error=f"{type(e).__name__}: {str(e)}")
+            metrics.JOBS_FINISHED.labels(lane or "unknown", "failed").inc()
+            audit_span.fail(f"{type(e).__name__}: {str(e)}")
+            return False
+        except asyncio.CancelledError:
+            # Worker shutting down; the job goes back to the queue with its checkpoint
+            job_tracker.publish(request_id, "released")
+            metrics.JOBS_FINISHED.labels(lane or "unknown", "released").inc()
+            raise
+        finally:
+            admission.job_finished()
+            metrics.JOBS_IN_FLIGHT.dec()
+
+
+# Enough concurrent jobs to keep every stage busy; the stage queues apply backpressure
+job_worker = JobWorker.from_env(job_queue, process_audit_request, default_concurrency=audit_pipeline.capacity)
+
+# Warm up render processes and the LLM client at start instead of on the first audit
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "true").lower() == "true"
+_warm_up_task: Optional[asyncio.Task] = None
+
+# Time running audits get to finish on shutdown before they are released to the queue (resumed from their checkpoint)
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+
+
+async def warm_up():
+    """
+    Pay one-time costs before the first audit arrives: start the render
+    processes (Matplotlib/ReportLab imports, fonts, stylesheet) and import
+    openai and build its client. Jobs are consumed meanwhile.
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(render_pool.warm_up(), asyncio.to_thread(llm_client.warm_up))
+        logger.info("Warm-up finished in %.2fs", time.perf_counter() - started)
+    except Exception as e:
+        logger.warning("Warm-up failed (first audit pays the startup cost): %s", e)
+
+
+async def start():
+    """Start consuming the job queue and retrying the mail outbox on the running loop"""
+    global _warm_up_task
+    job_events.bind(asyncio.get_running_loop())
+    audit_pipeline.start()
+    job_worker.start()
+    outbox_worker.start()
+    if WARM_UP_ON_START:
+        _warm_up_task = asyncio.create_task(warm_up())
+
+
+async def stop():
+    """
+    Stop consuming and release resources.
+    Jobs in flight get SHUTDOWN_DRAIN_SECONDS to finish. The rest are cancelled
+    (their stage handlers first) and released to the queue, and the worker
+    that claims them next resumes from their checkpoint (e.g. at the render
+    stage when the LLM result was saved).
+    """
+    if _warm_up_task is not None:
+        _warm_up_task.cancel()
+        await asyncio.gather(_warm_up_task, return_exceptions=True)
+    await job_worker.stop(drain_timeout=SHUTDOWN_DRAIN_SECONDS)
+    await audit_pipeline.stop()
+    await asyncio.to_thread(render_pool.close)
+    await outbox_worker.stop()
+    await email_service.aclose()
+
+
+async def run_forever():
+    """Run the worker until SIGINT/SIGTERM"""
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    loop_monitor.start()
+    await start()
+    logger.info(
+        "Audit worker started (pid %d, %d concurrent jobs, %d render processes)",
+        os.getpid(), job_worker.concurrency, render_pool.processes
+    )
+    await stopping.wait()
+    logger.info("Audit worker stopping...")
+    await stop()
+    await loop_monitor.stop()
+    metrics.mark_process_dead()
+    tracing.flush()
+
+
+if __name__ == "__main__":
+    log_setup.configure_logging()
+    asyncio.run(run_forever())
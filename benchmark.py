@@ -0,0 +1,212 @@
+"""
+Micro-benchmarks for the AI Audit Agent hot paths.
+
+Runs offline against the sample data in docs/ - no Azure OpenAI or SMTP
+credentials are needed.
+
+Usage:
+    python benchmark.py            # run all benchmarks
+    python benchmark.py parse      # run a single benchmark
+    python benchmark.py memory     # peak memory of attaching a large PDF
+    python benchmark.py startup    # import time of the API (fails above IMPORT_BUDGET_MS)
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DOCS_DIR = os.path.join(ROOT_DIR, "docs")
+
+# Import budget of `import main` (cumulative, as reported by -X importtime)
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1000"))
+# Heavy modules only render workers / the LLM stage load, never the API at import
+DEFERRED_MODULES = ("matplotlib", "numpy", "reportlab", "openai", "pdf_builder")
+
+
+def _load_sample_response() -> str:
+    """Return the sample LLM analysis as a raw JSON string"""
+    with open(os.path.join(DOCS_DIR, "SAMPLE_OUTPUT.json"), encoding="utf-8") as f:
+        return json.dumps(json.load(f)["example_response"], indent=2)
+
+
+def _report(label: str, seconds: float, iterations: int):
+    """Print per-call cost in microseconds"""
+    print(f"  {label:<40} {seconds / iterations * 1e6:10.1f} us/call")
+
+
+def bench_parse(iterations: int = 5000):
+    """Cost of decoding + validating one LLM response"""
+    from analysis_schema import parse_analysis
+    from llm_client import LLMClient
+
+    raw = _load_sample_response()
+    fenced = f"```json\n{raw}\n```"
+    # _parse_llm_response does not touch instance state, so skip __init__ (no credentials needed)
+    client = LLMClient.__new__(LLMClient)
+
+    print(f"parse: {len(raw)} byte response, {iterations} iterations")
+    _report("json.loads (decode only, reference)", timeit.timeit(lambda: json.loads(raw), number=iterations), iterations)
+    _report("parse_analysis (orjson + pydantic)", timeit.timeit(lambda: parse_analysis(raw), number=iterations), iterations)
+    _report("LLMClient._parse_llm_response (fenced)", timeit.timeit(lambda: client._parse_llm_response(fenced), number=iterations), iterations)
+
+
+def bench_email(iterations: int = 5000):
+    """Cost of rendering the report email body (text + HTML) and its MIME framing"""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    from email_templates import ReportEmailTemplate, REPORT_TEXT, REPORT_HTML
+
+    summary = json.loads(_load_sample_response())["summary"]["personalized_summary"]
+    values = {
+        "recipient_name": "Ananya Mehta",
+        "company_name": "NovaTech Industries",
+        "personalized_summary": summary,
+    }
+    template = ReportEmailTemplate()
+
+    def email_mime_reference():
+        # Equivalent of the previous per-send construction through email.mime
+        message = MIMEMultipart("mixed")
+        message["From"] = "audit@example.com"
+        message["To"] = "ananya@novatech.com"
+        message["Subject"] = f"AI Audit Report — {values['company_name']}"
+        message.attach(MIMEText(REPORT_TEXT.render(values).decode(), "plain"))
+        message.attach(MIMEText(REPORT_HTML.render(values).decode(), "html"))
+        return message.as_bytes()
+
+    def prepared():
+        return template.build("audit@example.com", "ananya@novatech.com", **values).as_bytes()
+
+    print(f"email: {len(summary)} char summary, {iterations} iterations")
+    _report("REPORT_TEXT.render", timeit.timeit(lambda: REPORT_TEXT.render(values), number=iterations), iterations)
+    _report("REPORT_HTML.render", timeit.timeit(lambda: REPORT_HTML.render(values), number=iterations), iterations)
+    _report("email.mime build + serialize (reference)", timeit.timeit(email_mime_reference, number=iterations), iterations)
+    _report("ReportEmailTemplate.build + serialize", timeit.timeit(prepared, number=iterations), iterations)
+
+
+def _peak_memory(func) -> int:
+    """Peak Python heap allocation (bytes) while running func"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(size_mb: int = 20):
+    """Peak memory of sending a large PDF: email.mime (whole message in RAM) vs streamed"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.application import MIMEApplication
+    from email_templates import ReportEmailTemplate
+    from mime_stream import Base64Attachment, iter_data_chunks
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(os.urandom(size_mb * 1024 * 1024))
+        pdf_path = f.name
+
+    def email_mime_reference():
+        # Previous path: read the PDF, encode into the message tree, flatten
+        with open(pdf_path, "rb") as pdf_file:
+            pdf_data = pdf_file.read()
+        message = MIMEMultipart("mixed")
+        message.attach(MIMEApplication(pdf_data, _subtype="pdf"))
+        return len(message.as_bytes())
+
+    def streamed():
+        # Chunks are discarded as a socket would consume them
+        message = ReportEmailTemplate().build(
+            "audit@example.com", "ananya@novatech.com", "Ananya Mehta", "NovaTech Industries", "Summary",
+            attachment=Base64Attachment(path=pdf_path), attachment_filename="report.pdf"
+        )
+        return sum(len(chunk) for chunk in iter_data_chunks(message.iter_chunks()))
+
+    try:
+        print(f"memory: {size_mb} MB PDF attachment, peak traced allocation")
+        for label, func in (("email.mime read + serialize (reference)", email_mime_reference),
+                            ("Base64Attachment streamed to sink", streamed)):
+            print(f"  {label:<40} {_peak_memory(func) / 1024 / 1024:10.1f} MB")
+    finally:
+        os.remove(pdf_path)
+
+
+def _import_times(module: str, env: dict) -> dict:
+    """Run `import module` in a fresh interpreter; module name -> (self us, cumulative us)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def bench_startup(runs: int = 5) -> bool:
+    """Cold import time of the API module against IMPORT_BUDGET_MS, and heavy modules it must not import"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # Dummy settings: importing main builds the services, nothing connects
+        env = dict(os.environ)
+        env.setdefault("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com/")
+        env.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+        env.setdefault("AZURE_OPENAI_DEPLOYMENT_NAME", "benchmark")
+        env["STATE_DB_PATH"] = os.path.join(tmp, "state.db")
+        env["OUTPUT_DIR"] = tmp
+
+        # Best of several runs (the first one also writes bytecode caches)
+        times = min((_import_times("main", env) for _ in range(runs)), key=lambda t: t["main"][1])
+
+    total_ms = times["main"][1] / 1000
+    print(f"startup: import main, best of {runs} runs")
+    print(f"  {'import main (cumulative)':<40} {total_ms:10.1f} ms   (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    print("  slowest modules (self time):")
+    for name, (own, _) in sorted(times.items(), key=lambda item: -item[1][0])[:10]:
+        print(f"    {name:<38} {own / 1000:10.1f} ms")
+
+    deferred = sorted({name.split(".")[0] for name in times} & set(DEFERRED_MODULES))
+    ok = total_ms <= IMPORT_BUDGET_MS and not deferred
+    if deferred:
+        print(f"  FAIL: imported at startup: {', '.join(deferred)}")
+    if total_ms > IMPORT_BUDGET_MS:
+        print(f"  FAIL: over budget by {total_ms - IMPORT_BUDGET_MS:.1f} ms")
+    return ok
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "email": bench_email,
+    "memory": bench_memory,
+    "startup": bench_startup,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    failed = False
+    for name in args.names or BENCHMARKS:
+        # Benchmarks with a budget return False when it is exceeded
+        if BENCHMARKS[name]() is False:
+            failed = True
+        print()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
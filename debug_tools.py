@@ -0,0 +1,184 @@
+"""
+Debug Tools
+Sampling profiler, tracemalloc snapshots and live object counts behind the /debug endpoints
+"""
+
+import gc
+import os
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads waiting for work (event loop selector, locks, queues, pipes)
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("connection.py", "_recv"),
+    ("connection.py", "_poll"),
+    ("connection.py", "wait"),
+}
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, include_idle: bool = False) -> Dict[str, int]:
+    """
+    Sample the stacks of every thread of this process.
+
+    Runs in the calling thread (call it off the event loop) and skips itself.
+
+    Args:
+        seconds: Sampling duration
+        interval: Time between samples
+        include_idle: Keep samples of threads blocked waiting for work
+
+    Returns:
+        Collapsed stacks ("thread;outer (file:line);...;leaf (file:line)") -> sample count
+    """
+    me = threading.get_ident()
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            if not include_idle and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                # Function start line, so samples of one function merge
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            counts[";".join(reversed(stack))] += 1
+        del frame
+        time.sleep(interval)
+    return dict(counts)
+
+
+def format_collapsed(stacks: Dict[str, int]) -> str:
+    """Collapsed-stack text (flamegraph.pl, speedscope, inferno), most sampled first"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+
+class AllocationTracker:
+    """
+    tracemalloc snapshots of this process.
+
+    The first snapshot starts tracing; every following one returns the top
+    allocation sites and the growth since the previous snapshot.
+    """
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, top: int = 25, frames: int = 1) -> Dict[str, Any]:
+        """
+        Take a snapshot and compare it with the previous one.
+
+        Args:
+            top: Allocation sites returned
+            frames: Stack depth recorded per allocation when tracing starts
+                (more frames cost more memory and time)
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, frames))
+                self._previous = None
+                return {"tracing": True, "message": "Tracing started; take another snapshot after the workload ran"}
+
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            key = "traceback" if tracemalloc.get_traceback_limit() > 1 else "lineno"
+            current, peak = tracemalloc.get_traced_memory()
+            result = {
+                "tracing": True,
+                "traced_bytes": current,
+                "peak_bytes": peak,
+                "top": [_stat_dict(stat) for stat in snapshot.statistics(key)[:top]],
+                "growth": None,
+            }
+            if self._previous is not None:
+                result["growth"] = [
+                    _stat_dict(stat) for stat in snapshot.compare_to(self._previous, key)[:top]
+                ]
+            self._previous = snapshot
+            return result
+
+    def stop(self):
+        """Stop tracing and drop the stored snapshot"""
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+
+def _stat_dict(stat) -> Dict[str, Any]:
+    entry = {
+        "where": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+def object_census(top: int = 20) -> Dict[str, Any]:
+    """
+    Live Matplotlib figures and ReportLab objects in this process.
+
+    Module-level so it can also run in a render worker process. Walks every
+    GC-tracked object, which takes a noticeable fraction of a second on a
+    large heap.
+    """
+    figures = 0
+    reportlab: Counter = Counter()
+    Figure = None
+    if "matplotlib.figure" in sys.modules:
+        Figure = sys.modules["matplotlib.figure"].Figure
+    for obj in gc.get_objects():
+        # type() rather than isinstance(): lazy proxies resolve __class__ on access
+        kind = type(obj)
+        if Figure is not None and issubclass(kind, Figure):
+            figures += 1
+        elif kind.__module__.startswith("reportlab."):
+            reportlab[f"{kind.__module__}.{kind.__qualname__}"] += 1
+
+    pyplot_figures = None
+    if "matplotlib.pyplot" in sys.modules:
+        pyplot_figures = len(sys.modules["matplotlib.pyplot"].get_fignums())
+
+    return {
+        "pid": os.getpid(),
+        "matplotlib_figures": figures,
+        # Figures registered with pyplot stay alive until plt.close()
+        "pyplot_open_figures": pyplot_figures,
+        "reportlab_objects": sum(reportlab.values()),
+        "reportlab_by_type": dict(reportlab.most_common(top)),
+        "gc_counts": list(gc.get_count()),
+        "gc_uncollectable": len(gc.garbage),
+    }
+
+
+def top_stacks(stacks: Dict[str, int], limit: int = 20) -> List[Dict[str, Any]]:
+    """Most sampled leaf functions, with their share of all samples"""
+    total = sum(stacks.values()) or 1
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return [
+        {"function": leaf, "samples": count, "share": round(count / total, 3)}
+        for leaf, count in leaves.most_common(limit)
+    ]
@@ -0,0 +1,536 @@
+"""
+Email Templates for AI Audit Reports
+Templates are compiled once at import; MIME framing is pre-serialized to bytes
+"""
+
+import re
+import html
+import uuid
+import textwrap
+from dataclasses import dataclass
+from email.header import Header
+from email.utils import formatdate, make_msgid, encode_rfc2231
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Optional, Union
+
+from mime_stream import Base64Attachment
+
+CRLF = b"\r\n"
+
+# Lines in 8bit MIME parts must stay under the SMTP limit of 998 octets;
+# dynamic values are folded at whitespace well below that.
+_FOLD_WIDTH = 76
+
+_FIELD_PATTERN = re.compile(r"\$\{(\w+)\}")
+
+# Characters that must not reach a header verbatim: control characters
+# (including CR/LF) and the quoted-string delimiters
+_CONTROL_CHARS = re.compile(r"[\x00-\x1f\x7f]")
+_QUOTE_SPECIALS = re.compile(r'["\\]')
+
+
+def _fold(value: str) -> str:
+    """Wrap long lines at spaces (rendering is unaffected in HTML and plain text)"""
+    lines = []
+    for line in value.splitlines() or [""]:
+        while len(line) > _FOLD_WIDTH:
+            cut = line.rfind(" ", 0, _FOLD_WIDTH + 1)
+            if cut <= 0:
+                # A single long word (e.g. a URL): break at the next space instead
+                cut = line.find(" ", _FOLD_WIDTH)
+                if cut == -1:
+                    break
+            lines.append(line[:cut])
+            line = line[cut + 1:]
+        lines.append(line)
+    return "\r\n".join(lines)
+
+
+def _escape_html(value: str) -> str:
+    return _fold(html.escape(value, quote=True))
+
+
+class CompiledTemplate:
+    """
+    A `${field}` template parsed once into pre-encoded static segments.
+
+    Rendering only escapes and encodes the dynamic fields, then joins bytes.
+    """
+
+    def __init__(self, source: str, escape: Callable[[str], str], raw_fields: Collection[str] = ()):
+        """
+        Compile a template.
+
+        Args:
+            source: Template text with `${name}` placeholders
+            escape: Function applied to every dynamic value
+            raw_fields: Fields that take pre-rendered bytes (e.g. a list of
+                rendered fragments) inserted without escaping
+        """
+        source = textwrap.dedent(source).strip("\n").replace("\n", "\r\n") + "\r\n"
+        parts = _FIELD_PATTERN.split(source)
+
+        # parts alternates static text and field names: [static, field, static, ...]
+        self._static: List[bytes] = [part.encode("utf-8") for part in parts[0::2]]
+        self.fields: List[str] = parts[1::2]
+        self._escape = escape
+        self._raw = frozenset(raw_fields)
+
+    def render(self, values: Dict[str, Union[str, bytes]]) -> bytes:
+        """
+        Render the template.
+
+        Args:
+            values: Value for every field in the template
+
+        Returns:
+            UTF-8 encoded body with CRLF line endings
+        """
+        escape = self._escape
+        out = [self._static[0]]
+        for field, static in zip(self.fields, self._static[1:]):
+            if field in self._raw:
+                out.append(values[field])
+            else:
+                out.append(escape(str(values[field])).encode("utf-8"))
+            out.append(static)
+        return b"".join(out)
+
+
+# The HTML body is shared by both delivery modes; only the paragraphs that
+# mention the attachment differ.
+_HTML_HEAD = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {
+                font-family: Arial, sans-serif;
+                line-height: 1.6;
+                color: #333333;
+            }
+            .container {
+                max-width: 600px;
+                margin: 0 auto;
+                padding: 20px;
+            }
+            .header {
+                background-color: #3498db;
+                color: white;
+                padding: 20px;
+                text-align: center;
+                border-radius: 5px 5px 0 0;
+            }
+            .content {
+                background-color: #f9f9f9;
+                padding: 30px;
+                border: 1px solid #dddddd;
+            }
+            .summary-box {
+                background-color: #ecf0f1;
+                border-left: 4px solid #3498db;
+                padding: 15px;
+                margin: 20px 0;
+            }
+            .footer {
+                background-color: #2c3e50;
+                color: #ecf0f1;
+                padding: 20px;
+                text-align: center;
+                border-radius: 0 0 5px 5px;
+                font-size: 12px;
+            }
+            .button {
+                display: inline-block;
+                padding: 10px 20px;
+                background-color: #27ae60;
+                color: white;
+                text-decoration: none;
+                border-radius: 5px;
+                margin: 10px 0;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>AI Audit Report</h1>
+            </div>
+
+            <div class="content">
+                <p>Dear ${recipient_name},</p>
+"""
+
+_HTML_SUMMARY = """
+                <div class="summary-box">
+                    <h3>Executive Summary</h3>
+                    <p>${personalized_summary}</p>
+                </div>
+
+                <p>This report includes:</p>
+                <ul>
+                    <li>Detailed department-wise AI readiness analysis</li>
+                    <li>Identified gaps and limitations</li>
+                    <li>AI maturity visualizations and charts</li>
+                    <li>Overall risk assessment</li>
+                </ul>
+"""
+
+_HTML_TAIL = """
+                <p>If you have any questions or need further clarification, please don't hesitate to reach out.</p>
+
+                <p>Best regards,<br>
+                <strong>AI Audit Agent</strong><br>
+                Automated Audit &amp; Analysis System</p>
+            </div>
+
+            <div class="footer">
+                <p><strong>AI Audit Agent</strong></p>
+                <p>This is an automated report generated by our AI-powered audit system.</p>
+                <p>Confidential Document | For Internal Use Only</p>
+            </div>
+        </div>
+    </body>
+    </html>
+"""
+
+REPORT_HTML = CompiledTemplate(_HTML_HEAD + """
+                <p>Please find attached the comprehensive <strong>AI Audit Report</strong> for <strong>${company_name}</strong>.</p>
+""" + _HTML_SUMMARY + """
+                <p>The attached PDF contains comprehensive insights to help understand your organization's current AI maturity level and areas requiring attention.</p>
+""" + _HTML_TAIL, escape=_escape_html)
+
+REPORT_LINK_HTML = CompiledTemplate(_HTML_HEAD + """
+                <p>The comprehensive <strong>AI Audit Report</strong> for <strong>${company_name}</strong> is ready to download.</p>
+""" + _HTML_SUMMARY + """
+                <p>The PDF contains comprehensive insights to help understand your organization's current AI maturity level and areas requiring attention.</p>
+
+                <p><a class="button" href="${download_url}">Download Report (PDF)</a></p>
+
+                <p>This link is valid until ${link_expires}.</p>
+""" + _HTML_TAIL, escape=_escape_html)
+
+# Digest: several reports for the same recipient in one message
+DIGEST_HTML = CompiledTemplate(_HTML_HEAD + """
+                <p>Please find below <strong>${report_count} AI Audit Reports</strong> prepared for you.</p>
+
+                ${reports}
+                <p>Each report contains comprehensive insights into the organization's current AI maturity level and areas requiring attention.</p>
+""" + _HTML_TAIL, escape=_escape_html, raw_fields={"reports"})
+
+DIGEST_ITEM_HTML = CompiledTemplate("""
+    <div class="summary-box">
+        <h3>${company_name}</h3>
+        <p>${personalized_summary}</p>
+        <p><em>Attached: ${attachment_filename}</em></p>
+    </div>
+""", escape=_escape_html)
+
+DIGEST_LINK_ITEM_HTML = CompiledTemplate("""
+    <div class="summary-box">
+        <h3>${company_name}</h3>
+        <p>${personalized_summary}</p>
+        <p><a class="button" href="${download_url}">Download Report (PDF)</a><br>
+        Valid until ${link_expires}.</p>
+    </div>
+""", escape=_escape_html)
+
+REPORT_TEXT = CompiledTemplate("""
+    Hi ${recipient_name},
+
+    Please find attached the AI Audit Report for ${company_name}.
+
+    Summary:
+    ${personalized_summary}
+
+    This report includes detailed department-wise gaps and AI readiness visualizations.
+
+    Best regards,
+    AI Audit Agent
+    Automated Audit & Analysis System
+
+    ---
+    Confidential Document | For Internal Use Only
+""", escape=_fold)
+
+REPORT_LINK_TEXT = CompiledTemplate("""
+    Hi ${recipient_name},
+
+    The AI Audit Report for ${company_name} is ready to download:
+    ${download_url}
+
+    This link is valid until ${link_expires}.
+
+    Summary:
+    ${personalized_summary}
+
+    This report includes detailed department-wise gaps and AI readiness visualizations.
+
+    Best regards,
+    AI Audit Agent
+    Automated Audit & Analysis System
+
+    ---
+    Confidential Document | For Internal Use Only
+""", escape=_fold)
+
+DIGEST_TEXT = CompiledTemplate("""
+    Hi ${recipient_name},
+
+    Please find below ${report_count} AI Audit Reports prepared for you.
+
+    ${reports}
+    Each report includes detailed department-wise gaps and AI readiness visualizations.
+
+    Best regards,
+    AI Audit Agent
+    Automated Audit & Analysis System
+
+    ---
+    Confidential Document | For Internal Use Only
+""", escape=_fold, raw_fields={"reports"})
+
+DIGEST_ITEM_TEXT = CompiledTemplate("""
+    ${company_name}
+    Summary:
+    ${personalized_summary}
+    Attached: ${attachment_filename}
+""", escape=_fold)
+
+DIGEST_LINK_ITEM_TEXT = CompiledTemplate("""
+    ${company_name}
+    Summary:
+    ${personalized_summary}
+    Download (valid until ${link_expires}):
+    ${download_url}
+""", escape=_fold)
+
+
+@dataclass
+class DigestEntry:
+    """One report in a digest; set either attachment or download_url"""
+    company_name: str
+    personalized_summary: str
+    attachment: Optional[Base64Attachment] = None
+    attachment_filename: Optional[str] = None
+    download_url: Optional[str] = None
+    link_expires: Optional[str] = None
+
+
+class PreparedMessage:
+    """
+    A serialized message ready for SMTP DATA.
+
+    Chunks are pre-encoded bytes or streaming sources (attachments) that are
+    only encoded while the message is being written to the socket.
+    """
+
+    def __init__(self, from_addr: str, to_addrs: List[str], chunks: List[Union[bytes, Iterable[bytes]]]):
+        self.from_addr = from_addr
+        self.to_addrs = to_addrs
+        self.chunks = chunks
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yield the message in wire format (CRLF line endings, not dot-stuffed)"""
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                yield chunk
+            else:
+                yield from chunk
+
+    def as_bytes(self) -> bytes:
+        """Whole message in memory (prefer iter_chunks for large attachments)"""
+        return b"".join(self.iter_chunks())
+
+
+class ReportEmailTemplate:
+    """
+    Builds report emails from pre-encoded MIME framing.
+
+    Structure: multipart/mixed [ multipart/alternative [ text/plain, text/html ], application/pdf ]
+    The boundaries are fixed per process, so every header and separator
+    except From/To/Subject/Date/Message-ID is encoded once.
+    """
+
+    def __init__(
+        self,
+        text: CompiledTemplate = REPORT_TEXT,
+        html_template: CompiledTemplate = REPORT_HTML,
+        link_text: CompiledTemplate = REPORT_LINK_TEXT,
+        link_html: CompiledTemplate = REPORT_LINK_HTML
+    ):
+        self.text = text
+        self.html = html_template
+        self.link_text = link_text
+        self.link_html = link_html
+
+        token = uuid.uuid4().hex
+        mixed = f"=_mixed_{token}"
+        alternative = f"=_alt_{token}"
+
+        self._root_headers = (
+            "MIME-Version: 1.0\r\n"
+            f'Content-Type: multipart/mixed; boundary="{mixed}"\r\n'
+            "\r\n"
+        ).encode("ascii")
+        self._text_open = (
+            f"--{mixed}\r\n"
+            f'Content-Type: multipart/alternative; boundary="{alternative}"\r\n'
+            "\r\n"
+            f"--{alternative}\r\n"
+            'Content-Type: text/plain; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: 8bit\r\n"
+            "\r\n"
+        ).encode("ascii")
+        self._html_open = (
+            f"--{alternative}\r\n"
+            'Content-Type: text/html; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: 8bit\r\n"
+            "\r\n"
+        ).encode("ascii")
+        self._alternative_close = f"--{alternative}--\r\n".encode("ascii")
+        self._attachment_open = (
+            f"--{mixed}\r\n"
+            "Content-Type: application/pdf\r\n"
+            "Content-Transfer-Encoding: base64\r\n"
+        ).encode("ascii")
+        self._mixed_close = f"--{mixed}--\r\n".encode("ascii")
+
+    def build(
+        self,
+        sender_email: str,
+        recipient_email: str,
+        recipient_name: str,
+        company_name: str,
+        personalized_summary: str,
+        attachment: Optional[Base64Attachment] = None,
+        attachment_filename: Optional[str] = None,
+        download_url: Optional[str] = None,
+        link_expires: Optional[str] = None
+    ) -> PreparedMessage:
+        """
+        Assemble a report email.
+
+        Args:
+            sender_email: From address
+            recipient_email: To address
+            recipient_name: Recipient's name
+            company_name: Company name
+            personalized_summary: Summary from LLM
+            attachment: PDF to attach, streamed during DATA (omitted when None)
+            attachment_filename: Attachment filename
+            download_url: Report link; when set, the link bodies are used
+                instead of the attachment wording
+            link_expires: Human-readable link expiry (link bodies only)
+
+        Returns:
+            PreparedMessage in wire format
+        """
+        values = {
+            "recipient_name": recipient_name,
+            "company_name": company_name,
+            "personalized_summary": personalized_summary,
+        }
+        text, html_template = self.text, self.html
+        if download_url is not None:
+            values["download_url"] = download_url
+            values["link_expires"] = link_expires or ""
+            text, html_template = self.link_text, self.link_html
+
+        chunks = [
+            self._envelope_headers(sender_email, recipient_email, f"AI Audit Report — {company_name}"),
+            self._root_headers,
+            self._text_open,
+            text.render(values),
+            self._html_open,
+            html_template.render(values),
+            self._alternative_close,
+        ]
+        if attachment is not None:
+            chunks.append(self._attachment_open)
+            chunks.append(_content_disposition(attachment_filename or "report.pdf"))
+            chunks.append(attachment)
+        chunks.append(self._mixed_close)
+
+        return PreparedMessage(sender_email, [recipient_email], chunks)
+
+    def build_digest(
+        self,
+        sender_email: str,
+        recipient_email: str,
+        recipient_name: str,
+        entries: List[DigestEntry]
+    ) -> PreparedMessage:
+        """
+        Assemble one email carrying several reports for the same recipient.
+
+        Args:
+            sender_email: From address
+            recipient_email: To address
+            recipient_name: Recipient's name
+            entries: Reports to include, each attached or linked
+
+        Returns:
+            PreparedMessage in wire format
+        """
+        text_items, html_items = [], []
+        for entry in entries:
+            values = {
+                "company_name": entry.company_name,
+                "personalized_summary": entry.personalized_summary,
+                "attachment_filename": entry.attachment_filename or "report.pdf",
+                "download_url": entry.download_url or "",
+                "link_expires": entry.link_expires or "",
+            }
+            linked = entry.download_url is not None
+            text_items.append((DIGEST_LINK_ITEM_TEXT if linked else DIGEST_ITEM_TEXT).render(values))
+            html_items.append((DIGEST_LINK_ITEM_HTML if linked else DIGEST_ITEM_HTML).render(values))
+
+        values = {
+            "recipient_name": recipient_name,
+            "report_count": str(len(entries)),
+        }
+        companies = ", ".join(entry.company_name for entry in entries[:3])
+        if len(entries) > 3:
+            companies += f" and {len(entries) - 3} more"
+        chunks = [
+            self._envelope_headers(sender_email, recipient_email, f"AI Audit Reports — {companies}"),
+            self._root_headers,
+            self._text_open,
+            DIGEST_TEXT.render({**values, "reports": CRLF.join(text_items)}),
+            self._html_open,
+            DIGEST_HTML.render({**values, "reports": b"".join(html_items)}),
+            self._alternative_close,
+        ]
+        for entry in entries:
+            if entry.attachment is not None:
+                chunks.append(self._attachment_open)
+                chunks.append(_content_disposition(entry.attachment_filename or "report.pdf"))
+                chunks.append(entry.attachment)
+        chunks.append(self._mixed_close)
+
+        return PreparedMessage(sender_email, [recipient_email], chunks)
+
+    def _envelope_headers(self, sender_email: str, recipient_email: str, subject: str) -> bytes:
+        subject = Header(subject, "utf-8").encode(linesep="\r\n")
+        domain = sender_email.rsplit("@", 1)[-1]
+        return (
+            f"From: {sender_email}\r\n"
+            f"To: {recipient_email}\r\n"
+            f"Subject: {subject}\r\n"
+            f"Date: {formatdate(localtime=False)}\r\n"
+            f"Message-ID: {make_msgid(domain=domain)}\r\n"
+        ).encode("utf-8")
+
+
+def _content_disposition(filename: str) -> bytes:
+    """
+    Attachment header. Control characters (CR/LF would end the header) are
+    dropped; filenames that are non-ASCII or contain a quote or backslash are
+    RFC 2231 encoded, which percent-escapes them, instead of quoted.
+    """
+    filename = _CONTROL_CHARS.sub("", filename) or "report.pdf"
+    if filename.isascii() and not _QUOTE_SPECIALS.search(filename):
+        value = f'attachment; filename="{filename}"'
+    else:
+        value = f"attachment; filename*={encode_rfc2231(filename, 'utf-8')}"
+    return f"Content-Disposition: {value}\r\n\r\n".encode("ascii")
@@ -0,0 +1,194 @@
+"""
+Webhook Deduplication
+Maps repeated submissions (same payload, or same Idempotency-Key) to the request they first created
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+import state_db
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_dedup (
+    key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    request_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_dedup_created ON webhook_dedup (created_at);
+"""
+
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused with a different payload"""
+
+    def __init__(self, key: str, request_id: str):
+        self.key = key
+        self.request_id = request_id
+        super().__init__(f"Idempotency-Key {key!r} was already used for a different payload ({request_id})")
+
+
+def content_hash(payload: Dict[str, Any]) -> str:
+    """SHA-256 of the canonical JSON form (sorted keys, compact separators)"""
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Bounded TTL store of recent submissions, kept in the state database so
+    duplicates are still recognized after a restart.
+
+    Payload hashes are remembered for a short window (repeated onEdit
+    triggers); explicit Idempotency-Keys for longer (client retries).
+    The oldest entries are evicted beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 300.0,
+        key_ttl_seconds: float = 86400.0,
+        max_entries: int = 10000,
+        db_path: Optional[str] = None
+    ):
+        """
+        Open (and create if needed) the dedup table.
+
+        Args:
+            window_seconds: How long an identical payload is treated as a duplicate (0 disables)
+            key_ttl_seconds: How long an Idempotency-Key is remembered
+            max_entries: Upper bound on stored entries
+            db_path: State database file (defaults to STATE_DB_PATH)
+        """
+        self.window_seconds = window_seconds
+        self.key_ttl_seconds = key_ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = state_db.connect(db_path)
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "IdempotencyStore":
+        """Build a store configured from DEDUP_* environment variables"""
+        return cls(
+            window_seconds=float(os.getenv("DEDUP_WINDOW_SECONDS", "300")),
+            key_ttl_seconds=float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")) * 3600,
+            max_entries=int(os.getenv("DEDUP_MAX_ENTRIES", "10000"))
+        )
+
+    def register(
+        self,
+        payload: Dict[str, Any],
+        request_id: str,
+        idempotency_key: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Record a submission unless it duplicates a recent one.
+
+        With an Idempotency-Key the key alone decides; otherwise the payload
+        hash is compared within the dedup window.
+
+        Args:
+            payload: Validated request payload
+            request_id: ID to record if this is a new submission
+            idempotency_key: Optional client-supplied key
+
+        Returns:
+            The existing request ID for a duplicate, or None if the submission
+            was recorded as new
+
+        Raises:
+            IdempotencyConflict: If the key was used for a different payload
+        """
+        digest = content_hash(payload)
+        key, ttl = self._key(digest, idempotency_key)
+        if key is None:
+            return None
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT content_hash, request_id FROM webhook_dedup WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO webhook_dedup (key, content_hash, request_id, created_at, expires_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, digest, request_id, now, now + ttl)
+                    )
+                    self._evict(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        if row["content_hash"] != digest:
+            raise IdempotencyConflict(idempotency_key, row["request_id"])
+        return row["request_id"]
+
+    def release(
+        self,
+        payload: Dict[str, Any],
+        request_id: str,
+        idempotency_key: Optional[str] = None
+    ):
+        """
+        Forget a submission recorded by register, so a retry is accepted as new.
+
+        Called when the request could not be queued after registering. The
+        entry is only removed while it still points at request_id.
+
+        Args:
+            payload: Payload passed to register
+            request_id: ID passed to register
+            idempotency_key: Key passed to register
+        """
+        key, _ = self._key(content_hash(payload), idempotency_key)
+        if key is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM webhook_dedup WHERE key = ? AND request_id = ?", (key, request_id)
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Number of remembered submissions"""
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM webhook_dedup WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return {"entries": entries, "max_entries": self.max_entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _key(self, digest: str, idempotency_key: Optional[str]) -> Tuple[Optional[str], float]:
+        """Dedup key and TTL for a submission (key is None when dedup is off)"""
+        if idempotency_key:
+            return f"key:{idempotency_key}", self.key_ttl_seconds
+        if self.window_seconds > 0:
+            return f"hash:{digest}", self.window_seconds
+        return None, 0.0
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the oldest ones beyond max_entries"""
+        self._conn.execute("DELETE FROM webhook_dedup WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM webhook_dedup WHERE key IN ("
+            "SELECT key FROM webhook_dedup ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
@@ -0,0 +1,204 @@
+"""
+Job Event Hub
+In-process pub/sub of audit progress events, streamed to clients as Server-Sent Events
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Events after which a job's stream ends
+TERMINAL_EVENTS = frozenset({"done", "failed"})
+
+
+@dataclass(slots=True)
+class JobEvent:
+    """One progress event; id is a per-job sequence number (SSE Last-Event-ID)"""
+    id: int
+    event: str
+    data: Dict[str, Any]
+
+    def encode(self) -> bytes:
+        """SSE wire format"""
+        payload = orjson.dumps({"event": self.event, **self.data})
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (self.id, self.event.encode("ascii"), payload)
+
+
+@dataclass(slots=True)
+class _Channel:
+    """Recent events and live subscribers of one job"""
+    history: Deque[JobEvent]
+    subscribers: Set["_Subscriber"] = field(default_factory=set)
+    next_id: int = 1
+    closed: bool = False
+
+
+class _Subscriber:
+    """Bounded mailbox of one client; the oldest events are dropped when it falls behind"""
+
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, max_pending: int):
+        self.queue: "asyncio.Queue[JobEvent]" = asyncio.Queue(maxsize=max_pending)
+        self.dropped = 0
+
+    def offer(self, event: JobEvent):
+        if self.queue.full():
+            # Slow consumer: keep the newest state instead of blocking the publisher
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class JobEventHub:
+    """
+    Fan-out of job progress events.
+
+    Publishing never blocks: every subscriber has a small bounded queue and
+    loses its oldest events when it cannot keep up (the terminal event is
+    always the newest, so it is never lost). An idle subscriber is one
+    queue and one suspended coroutine, so thousands of them are cheap.
+    A short per-job history lets late or reconnecting clients catch up.
+    """
+
+    def __init__(
+        self,
+        history_size: int = 32,
+        max_pending: int = 64,
+        max_jobs: int = 10000,
+        keepalive_seconds: float = 15.0
+    ):
+        """
+        Initialize the hub.
+
+        Args:
+            history_size: Events kept per job for replay
+            max_pending: Undelivered events buffered per subscriber
+            max_jobs: Jobs with retained history (oldest are dropped first)
+            keepalive_seconds: Interval of SSE comment lines on idle streams
+        """
+        self.history_size = history_size
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.keepalive_seconds = keepalive_seconds
+        self._channels: "OrderedDict[str, _Channel]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Set the loop that owns subscriber queues (needed for publishing from threads)"""
+        self._loop = loop
+
+    def publish(self, job_id: str, event: str, /, **data: Any):
+        """
+        Publish an event for a job. Safe to call from any thread.
+
+        Args:
+            job_id: Job/request ID
+            event: Event name (queued, llm, section, render, mailed, done, failed, ...)
+            data: JSON-serializable event fields
+        """
+        data.setdefault("ts", round(time.time(), 3))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if self._loop is not None and running is not self._loop:
+            self._loop.call_soon_threadsafe(self._publish, job_id, event, data)
+        else:
+            self._publish(job_id, event, data)
+
+    async def subscribe(self, job_id: str, last_event_id: int = 0) -> AsyncIterator[bytes]:
+        """
+        Stream a job's events in SSE format, ending after a terminal event.
+
+        Args:
+            job_id: Job/request ID
+            last_event_id: Replay only events after this ID (SSE reconnect)
+
+        Yields:
+            Encoded SSE frames, including keep-alive comments
+        """
+        subscriber = _Subscriber(self.max_pending)
+        with self._lock:
+            channel = self._channel(job_id)
+            backlog = [event for event in channel.history if event.id > last_event_id]
+            closed = channel.closed
+            if not closed:
+                channel.subscribers.add(subscriber)
+
+        try:
+            for event in backlog:
+                yield event.encode()
+            if closed:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if subscriber.dropped:
+                    yield b": %d event(s) dropped (slow consumer)\n\n" % subscriber.dropped
+                    subscriber.dropped = 0
+                yield event.encode()
+                if event.event in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                channel = self._channels.get(job_id)
+                if channel is not None:
+                    channel.subscribers.discard(subscriber)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Tracked jobs and connected subscribers"""
+        with self._lock:
+            return {
+                "jobs": len(self._channels),
+                "subscribers": sum(len(channel.subscribers) for channel in self._channels.values()),
+            }
+
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]):
+        with self._lock:
+            channel = self._channel(job_id)
+            job_event = JobEvent(id=channel.next_id, event=event, data=data)
+            channel.next_id += 1
+            channel.history.append(job_event)
+            channel.closed = event in TERMINAL_EVENTS
+            subscribers = list(channel.subscribers)
+
+        for subscriber in subscribers:
+            subscriber.offer(job_event)
+
+    def _channel(self, job_id: str) -> _Channel:
+        """Get or create a job's channel (caller holds the lock)"""
+        channel = self._channels.get(job_id)
+        if channel is None:
+            channel = _Channel(history=deque(maxlen=self.history_size))
+            self._channels[job_id] = channel
+            self._evict()
+        return channel
+
+    def _evict(self):
+        """Drop the oldest channels without subscribers beyond max_jobs"""
+        excess = len(self._channels) - self.max_jobs
+        if excess <= 0:
+            return
+        stale = []
+        for job_id, channel in self._channels.items():
+            if not channel.subscribers:
+                stale.append(job_id)
+                if len(stale) == excess:
+                    break
+        for job_id in stale:
+            del self._channels[job_id]
@@ -0,0 +1,554 @@
+"""
+Durable Job Queue
+Audit requests accepted by the webhooks, persisted until a worker has processed them
+"""
+
+import os
+import time
+import asyncio
+import logging
+import secrets
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+import state_db
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lane TEXT NOT NULL DEFAULT 'bulk',
+    source TEXT NOT NULL DEFAULT '',
+    checkpoint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, created_at);
+"""
+
+# Columns added after the table was first released
+_COLUMNS = {
+    "lane": "TEXT NOT NULL DEFAULT 'bulk'",
+    "source": "TEXT NOT NULL DEFAULT ''",
+    "checkpoint": "TEXT",
+}
+
+_LANE_INDEX = "CREATE INDEX IF NOT EXISTS idx_jobs_lane_source ON jobs (state, lane, source, created_at)"
+
+# Priority classes: live form submissions vs. backfills/batches
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+# Claimable: never claimed, or claimed by a worker whose lease ran out
+_CLAIMABLE = "(state = 'pending' OR (state = 'running' AND lease_until <= ?))"
+
+
+# Crockford base32, as used by ULID
+_ULID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ulid_lock = threading.Lock()
+_ulid_last = (0, 0)
+
+
+def new_ulid() -> str:
+    """
+    26 character ULID: 48-bit millisecond timestamp + 80 random bits.
+
+    IDs sort by creation time; within one millisecond the random part is
+    incremented, so IDs from this process stay strictly increasing.
+    """
+    global _ulid_last
+    with _ulid_lock:
+        millis = time.time_ns() // 1_000_000
+        last_millis, last_random = _ulid_last
+        if millis <= last_millis:
+            millis, randomness = last_millis, (last_random + 1) & ((1 << 80) - 1)
+        else:
+            randomness = secrets.randbits(80)
+        _ulid_last = (millis, randomness)
+
+    value = (millis << 80) | randomness
+    return "".join(_ULID_ALPHABET[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+
+def new_job_id() -> str:
+    """Unique, sortable job ID (also used as the request ID in logs)"""
+    return f"audit_{new_ulid()}"
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "name=weight,name=weight" (as used by JOB_*_WEIGHTS) into a dict"""
+    weights = {}
+    for item in spec.split(","):
+        name, sep, value = item.strip().rpartition("=")
+        if sep and name:
+            weights[name.strip()] = float(value)
+    return weights
+
+
+class StrideScheduler:
+    """
+    Weighted fair choice between keys that currently have work.
+
+    Each key's next virtual finish time is its pass value plus 1/weight, and
+    the earliest finish wins, so backlogged keys are served in proportion to
+    their weights. A key that was idle restarts at the current virtual time
+    instead of cashing in credit for the time it had nothing queued.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, default_weight: float = 1.0):
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self._pass: Dict[str, float] = {}
+        self._vtime = 0.0
+
+    def pick(self, candidates: Dict[str, float]) -> str:
+        """
+        Choose one key.
+
+        Args:
+            candidates: Keys with queued work -> creation time of their oldest
+                item (ties go to the oldest)
+
+        Returns:
+            The chosen key
+        """
+        finish = {key: self._finish(key) for key in candidates}
+        key = min(candidates, key=lambda k: (finish[k], candidates[k]))
+        self._vtime = max(self._pass.get(key, 0.0), self._vtime)
+        self._pass[key] = finish[key]
+        if len(self._pass) > 10000:
+            # Keys at or behind virtual time carry no state worth keeping
+            self._pass = {k: v for k, v in self._pass.items() if v > self._vtime}
+        return key
+
+    def _finish(self, key: str) -> float:
+        weight = max(self.weights.get(key, self.default_weight), 1e-6)
+        return max(self._pass.get(key, 0.0), self._vtime) + 1.0 / weight
+
+
+@dataclass
+class Job:
+    """A claimed audit request"""
+    id: str
+    payload: Dict[str, Any]
+    attempts: int
+    created_at: float
+    lane: str = LANE_BULK
+    source: str = ""
+    # Progress saved by an earlier attempt (e.g. the LLM result), to resume from
+    checkpoint: Optional[Dict[str, Any]] = None
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by every process using the same STATE_DB_PATH.
+
+    Jobs carry a lane (priority class) and a source (sheet ID or company
+    domain). Claims pick a lane by weight, then a source within the lane by
+    weight, then that source's oldest job, so one source backfilling
+    hundreds of rows cannot starve live submissions or other sources.
+    Fairness state is per process.
+
+    Contract between producers (webhooks) and consumers (JobWorker, in the
+    API process or `python -m audit_worker`):
+    - enqueue/enqueue_many commit jobs as 'pending'; once they return the
+      jobs are durable.
+    - claim moves jobs to 'running' under a lease of lease_seconds; the
+      consumer renews it while working.
+    - complete/fail are the ack: 'done' or 'failed' (with last_error),
+      final and never retried.
+    - save_checkpoint stores progress of a running job; whoever claims the
+      job next gets it back and can skip the finished steps.
+    - release hands a running job back as 'pending' (consumer shutting
+      down), so it is claimed again right away instead of after its lease.
+    - A job whose lease lapses (crashed or stopped consumer) is claimed
+      again, so delivery is at-least-once. After max_attempts claims it is
+      marked 'failed' instead, so a job that kills its worker every time
+      is not retried forever. Releasing a job gives its attempt back.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        lease_seconds: float = 900.0,
+        lane_weights: Optional[Dict[str, float]] = None,
+        source_weights: Optional[Dict[str, float]] = None,
+        max_attempts: int = 5
+    ):
+        """
+        Open (and create if needed) the jobs table.
+
+        Args:
+            db_path: State database file (defaults to STATE_DB_PATH)
+            lease_seconds: How long a claimed job stays reserved before another
+                worker may pick it up again (covers crashed workers)
+            lane_weights: Share of claims per lane while several lanes have
+                work (default interactive=8, bulk=1)
+            source_weights: Share of claims per source within a lane (default 1 each)
+            max_attempts: Claims after which an unfinished job is failed
+                instead of claimed again (0 = no limit)
+        """
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lanes = StrideScheduler(lane_weights or {LANE_INTERACTIVE: 8.0, LANE_BULK: 1.0})
+        self._source_weights = source_weights or {}
+        self._sources: Dict[str, StrideScheduler] = {}
+        self._lock = threading.Lock()
+        self._conn = state_db.connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        state_db.ensure_columns(self._conn, "jobs", _COLUMNS)
+        self._conn.execute(_LANE_INDEX)
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """Build a queue configured from JOB_* environment variables"""
+        return cls(
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "900")),
+            lane_weights=parse_weights(os.getenv("JOB_LANE_WEIGHTS", "interactive=8,bulk=1")),
+            source_weights=parse_weights(os.getenv("JOB_SOURCE_WEIGHTS", "")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+        )
+
+    def enqueue(self, payload: Dict[str, Any], job_id: str, lane: str = LANE_INTERACTIVE, source: str = ""):
+        """Add one job under a caller-chosen ID"""
+        self._insert([(job_id, payload, source)], lane)
+
+    def enqueue_many(
+        self,
+        payloads: List[Dict[str, Any]],
+        lane: str = LANE_BULK,
+        sources: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Add several jobs in a single transaction (all or none are queued).
+
+        Args:
+            payloads: Job payloads
+            lane: Priority class of every job
+            sources: Source of each job (same order as payloads)
+
+        Returns:
+            Job IDs, in the same order as payloads
+        """
+        job_ids = [new_job_id() for _ in payloads]
+        sources = sources or [""] * len(payloads)
+        self._insert(list(zip(job_ids, payloads, sources)), lane)
+        return job_ids
+
+    def claim(self, limit: int = 1, lanes: Iterable[str] = LANES) -> List[Job]:
+        """
+        Reserve up to `limit` pending jobs (or jobs whose lease expired),
+        chosen by weighted fair queuing across lanes and sources. Claimable
+        jobs that already used max_attempts are failed first.
+
+        Args:
+            limit: Maximum jobs to claim
+            lanes: Lanes that may be claimed from
+        """
+        lanes = tuple(lanes)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.max_attempts > 0:
+                    self._give_up(now)
+                heads = {
+                    (row["lane"], row["source"]): row["head"]
+                    for row in self._conn.execute(
+                        f"SELECT lane, source, MIN(created_at) AS head FROM jobs WHERE {_CLAIMABLE} "
+                        f"AND lane IN ({', '.join('?' * len(lanes))}) GROUP BY lane, source",
+                        (now, *lanes)
+                    )
+                }
+                rows = []
+                while heads and len(rows) < limit:
+                    lane, source = self._pick(heads)
+                    row = self._conn.execute(
+                        "SELECT id, payload, attempts, created_at, lane, source, checkpoint FROM jobs "
+                        f"WHERE {_CLAIMABLE} AND lane = ? AND source = ? ORDER BY created_at LIMIT 1",
+                        (now, lane, source)
+                    ).fetchone()
+                    if row is None:
+                        del heads[(lane, source)]
+                        continue
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'running', lease_until = ?, attempts = attempts + 1, "
+                        "updated_at = ? WHERE id = ?",
+                        (now + self.lease_seconds, now, row["id"])
+                    )
+                    rows.append(row)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [Job(id=row["id"], payload=orjson.loads(row["payload"]), attempts=row["attempts"] + 1,
+                    created_at=row["created_at"], lane=row["lane"], source=row["source"],
+                    checkpoint=orjson.loads(row["checkpoint"]) if row["checkpoint"] else None)
+                for row in rows]
+
+    def renew(self, job_id: str):
+        """Extend the lease of a job that is still being processed"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND state = 'running'",
+                (now + self.lease_seconds, now, job_id)
+            )
+
+    def save_checkpoint(self, job_id: str, checkpoint: Dict[str, Any]):
+        """Store the progress of a job (replaces any earlier checkpoint)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET checkpoint = ?, updated_at = ? WHERE id = ?",
+                (orjson.dumps(checkpoint).decode("utf-8"), time.time(), job_id)
+            )
+
+    def release(self, job_id: str):
+        """
+        Give a running job back to the queue unfinished (its checkpoint is
+        kept). The claim does not count towards max_attempts.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'pending', lease_until = NULL, attempts = MAX(attempts - 1, 0), "
+                "updated_at = ? WHERE id = ? AND state = 'running'",
+                (time.time(), job_id)
+            )
+
+    def complete(self, job_id: str):
+        """Mark a job as processed"""
+        self._finish(job_id, "done", None)
+
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed (it is not retried)"""
+        self._finish(job_id, "failed", error)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Durable state of a job (without its payload), or None if unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, state, lane, attempts, last_error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting to be claimed"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'pending'").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Job counts by state, and pending jobs per lane"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, lane, COUNT(*) AS n FROM jobs GROUP BY state, lane"
+            ).fetchall()
+        stats: Dict[str, Any] = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        pending_by_lane = {lane: 0 for lane in LANES}
+        for row in rows:
+            stats[row["state"]] = stats.get(row["state"], 0) + row["n"]
+            if row["state"] == "pending":
+                pending_by_lane[row["lane"]] = row["n"]
+        stats["pending_by_lane"] = pending_by_lane
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, jobs: List[Tuple[str, Dict[str, Any], str]], lane: str):
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane {lane!r} (expected one of {', '.join(LANES)})")
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO jobs (id, payload, lane, source, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(job_id, orjson.dumps(payload).decode("utf-8"), lane, source, now, now)
+                     for job_id, payload, source in jobs]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _give_up(self, now: float):
+        """Fail claimable jobs that were already claimed max_attempts times (caller holds the lock)"""
+        rows = self._conn.execute(
+            f"SELECT id, attempts FROM jobs WHERE {_CLAIMABLE} AND attempts >= ?",
+            (now, self.max_attempts)
+        ).fetchall()
+        for row in rows:
+            logger.warning("Job abandoned after %d attempts", row["attempts"], extra={"request_id": row["id"]})
+            self._conn.execute(
+                "UPDATE jobs SET state = 'failed', lease_until = NULL, last_error = ?, checkpoint = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (f"Gave up after {row['attempts']} attempts (worker lost each time)", now, row["id"])
+            )
+
+    def _pick(self, heads: Dict[Tuple[str, str], float]) -> Tuple[str, str]:
+        """Weighted choice of lane, then of source within that lane (caller holds the lock)"""
+        lane_heads: Dict[str, float] = {}
+        for (lane, _), head in heads.items():
+            lane_heads[lane] = min(head, lane_heads.get(lane, head))
+        lane = self._lanes.pick(lane_heads)
+
+        scheduler = self._sources.get(lane)
+        if scheduler is None:
+            scheduler = self._sources[lane] = StrideScheduler(self._source_weights)
+        source = scheduler.pick({source: head for (l, source), head in heads.items() if l == lane})
+        return lane, source
+
+    def _finish(self, job_id: str, state: str, error: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, lease_until = NULL, last_error = ?, checkpoint = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (state, error, time.time(), job_id)
+            )
+
+
+# Called with (payload, job_id, created_at, lane, checkpoint); returns True on success
+JobHandler = Callable[[Dict[str, Any], str, float, str, Optional[Dict[str, Any]]], Awaitable[bool]]
+
+
+class JobWorker:
+    """Runs queued jobs on the event loop, a few at a time"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: JobHandler,
+        concurrency: int = 2,
+        poll_interval: float = 2.0,
+        reserved_interactive: int = 0
+    ):
+        """
+        Initialize the worker.
+
+        Args:
+            queue: Queue to consume
+            handler: Coroutine called with (payload, job_id, created_at, lane, checkpoint);
+                returns True on success
+            concurrency: Jobs processed at the same time
+            poll_interval: Seconds between queue scans when idle
+            reserved_interactive: Slots that only take interactive jobs, so a
+                live submission never waits for a bulk job to finish
+        """
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.reserved_interactive = min(reserved_interactive, concurrency)
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._bulk_running = 0
+        self._processing = 0
+        self._stopping = False
+
+    @classmethod
+    def from_env(cls, queue: JobQueue, handler: JobHandler, default_concurrency: int = 2) -> "JobWorker":
+        """Build a worker configured from JOB_* environment variables"""
+        return cls(
+            queue,
+            handler,
+            concurrency=int(os.getenv("JOB_CONCURRENCY", str(default_concurrency))),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2")),
+            reserved_interactive=int(os.getenv("JOB_RESERVED_INTERACTIVE_SLOTS", "0"))
+        )
+
+    def notify(self):
+        """Wake idle consumers after jobs were enqueued"""
+        self._wakeup.set()
+
+    def start(self):
+        """Start the consumers on the running event loop"""
+        if not self._tasks:
+            self._stopping = False
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self, drain_timeout: float = 0.0):
+        """
+        Stop the consumers. No further jobs are claimed; jobs in progress get
+        up to drain_timeout seconds to finish. The rest are cancelled and
+        released to the queue with their checkpoint, for another worker.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if drain_timeout > 0 and self._processing:
+            logger.info("Draining %d running job(s) for up to %gs", self._processing, drain_timeout)
+            _, pending = await asyncio.wait(self._tasks, timeout=drain_timeout)
+            if pending:
+                logger.warning("%d job(s) still running after %gs; releasing them", len(pending), drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                # Clear before claiming so an enqueue that races the claim still wakes us
+                self._wakeup.clear()
+                bulk_allowed = self._bulk_running < self.concurrency - self.reserved_interactive
+                jobs = self.queue.claim(1, LANES if bulk_allowed else (LANE_INTERACTIVE,))
+                if not jobs:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._process(jobs[0])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job worker error: %s", e, exc_info=True)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _process(self, job: Job):
+        if job.lane == LANE_BULK:
+            self._bulk_running += 1
+        self._processing += 1
+        heartbeat = asyncio.create_task(self._renew_lease(job.id))
+        try:
+            succeeded = await self.handler(job.payload, job.id, job.created_at, job.lane, job.checkpoint)
+        except asyncio.CancelledError:
+            # Shutting down mid-job: hand it back now rather than after the lease expires
+            self.queue.release(job.id)
+            logger.info("Job released to the queue", extra={"request_id": job.id})
+            raise
+        except Exception as e:
+            logger.error("Job failed: %s", e, exc_info=True, extra={"request_id": job.id})
+            self.queue.fail(job.id, f"{type(e).__name__}: {str(e)}")
+            return
+        finally:
+            heartbeat.cancel()
+            self._processing -= 1
+            if job.lane == LANE_BULK:
+                self._bulk_running -= 1
+
+        if succeeded:
+            self.queue.complete(job.id)
+        else:
+            self.queue.fail(job.id, "Processing failed (see logs)")
+
+    async def _renew_lease(self, job_id: str):
+        """Keep a long-running job leased so no other worker claims it meanwhile"""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                self.queue.renew(job_id)
+            except Exception as e:
+                logger.warning("Lease renewal failed: %s", e, extra={"request_id": job_id})
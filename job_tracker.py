@@ -0,0 +1,193 @@
+"""
+Job Status Tracker
+In-process record of each audit's state and per-stage timings, with bounded retention
+"""
+
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from job_events import JobEventHub
+
+
+@dataclass(slots=True)
+class JobRecord:
+    """State and timings of one audit request"""
+    request_id: str
+    state: str
+    created_at: float
+    lane: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Stage name -> duration in seconds (llm, render, mail)
+    stages: Dict[str, float] = field(default_factory=dict)
+    tokens: Dict[str, int] = field(default_factory=dict)
+    pdf_bytes: Optional[int] = None
+    email_status: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        queue_wait = None
+        if self.started_at is not None:
+            queue_wait = round(self.started_at - self.created_at, 3)
+        total = None
+        if self.finished_at is not None:
+            total = round(self.finished_at - self.created_at, 3)
+        return {
+            "request_id": self.request_id,
+            "state": self.state,
+            "lane": self.lane,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait_seconds": queue_wait,
+            "llm_seconds": self.stages.get("llm"),
+            "render_seconds": self.stages.get("render"),
+            "send_seconds": self.stages.get("mail"),
+            "total_seconds": total,
+            "tokens": dict(self.tokens),
+            "pdf_bytes": self.pdf_bytes,
+            "email_status": self.email_status,
+            "error": self.error,
+        }
+
+
+class JobTracker:
+    """
+    Bounded map of recent jobs, oldest first.
+
+    Records are dropped once older than the retention period or when the
+    map exceeds max_entries, so memory stays flat under sustained load.
+    State transitions and stage starts are also published to an event hub
+    when one is given.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        retention_seconds: float = 86400.0,
+        events: Optional[JobEventHub] = None
+    ):
+        """
+        Initialize the tracker.
+
+        Args:
+            max_entries: Maximum jobs remembered
+            retention_seconds: How long a job stays visible after it was created
+            events: Hub receiving queued/running/<stage>/done/failed events
+        """
+        self.max_entries = max_entries
+        self.retention_seconds = retention_seconds
+        self.events = events
+        self._jobs: "OrderedDict[str, JobRecord]" = OrderedDict()
+        # Lane -> (queue wait, total latency) of recently finished jobs
+        self._latencies: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, request_id: str, created_at: Optional[float] = None, lane: Optional[str] = None) -> JobRecord:
+        """Register a newly accepted job in the 'queued' state"""
+        record = JobRecord(request_id=request_id, state="queued", created_at=created_at or time.time(), lane=lane)
+        with self._lock:
+            self._jobs[request_id] = record
+            self._evict(time.time())
+        self._publish(request_id, "queued")
+        return record
+
+    def start(self, request_id: str, created_at: Optional[float] = None, lane: Optional[str] = None):
+        """Mark a job as running (registers it first if this process has not seen it)"""
+        with self._lock:
+            record = self._jobs.get(request_id)
+        if record is None:
+            record = self.create(request_id, created_at, lane)
+        record.state = "running"
+        record.started_at = time.time()
+        self._publish(request_id, "running", queue_wait_seconds=record.to_dict()["queue_wait_seconds"])
+
+    @contextmanager
+    def stage(self, request_id: str, name: str) -> Iterator[None]:
+        """Time a processing stage (llm, render, mail) of a job"""
+        self._publish(request_id, name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = self._jobs.get(request_id)
+            if record is not None:
+                record.stages[name] = round(time.perf_counter() - started, 3)
+
+    def update(self, request_id: str, **fields: Any):
+        """Set result fields (tokens, pdf_bytes, email_status)"""
+        record = self._jobs.get(request_id)
+        if record is not None:
+            for name, value in fields.items():
+                setattr(record, name, value)
+
+    def finish(self, request_id: str, error: Optional[str] = None):
+        """Mark a job as done, or failed when an error is given"""
+        record = self._jobs.get(request_id)
+        if record is not None:
+            record.state = "failed" if error else "done"
+            record.error = error
+            record.finished_at = time.time()
+            if record.started_at is not None:
+                with self._lock:
+                    samples = self._latencies.setdefault(record.lane or "default", deque(maxlen=1000))
+                    samples.append((record.started_at - record.created_at, record.finished_at - record.created_at))
+            self._publish(request_id, record.state, **record.to_dict())
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, or None if unknown or no longer retained"""
+        record = self._jobs.get(request_id)
+        return record.to_dict() if record is not None else None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Tracked job counts by state"""
+        with self._lock:
+            records = list(self._jobs.values())
+        stats = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for record in records:
+            stats[record.state] = stats.get(record.state, 0) + 1
+        return stats
+
+    def get_lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue wait and end-to-end latency percentiles of the last 1000 jobs per lane"""
+        with self._lock:
+            lanes = {lane: list(samples) for lane, samples in self._latencies.items()}
+        stats = {}
+        for lane, samples in lanes.items():
+            waits = sorted(wait for wait, _ in samples)
+            totals = sorted(total for _, total in samples)
+            stats[lane] = {
+                "completed": len(samples),
+                "queue_wait_p50": _percentile(waits, 0.50),
+                "queue_wait_p95": _percentile(waits, 0.95),
+                "total_p50": _percentile(totals, 0.50),
+                "total_p95": _percentile(totals, 0.95),
+                "total_max": round(totals[-1], 3),
+            }
+        return stats
+
+    def publish(self, request_id: str, event: str, /, **data: Any):
+        """Publish a custom progress event (e.g. section k of n)"""
+        self._publish(request_id, event, **data)
+
+    def _publish(self, request_id: str, event: str, /, **data: Any):
+        if self.events is not None:
+            self.events.publish(request_id, event, **data)
+
+    def _evict(self, now: float):
+        cutoff = now - self.retention_seconds
+        while self._jobs:
+            oldest = next(iter(self._jobs.values()))
+            if len(self._jobs) <= self.max_entries and oldest.created_at > cutoff:
+                break
+            self._jobs.popitem(last=False)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return round(sorted_values[index], 3)
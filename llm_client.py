@@ -4,15 +4,18 @@ Configured for Cloud9AI Project Resource
 """
 
 import os
-import json
+import time
 import logging
 import asyncio
+import threading
 from typing import Dict, Any, Optional
+import orjson
 from dotenv import load_dotenv
-from openai import AsyncAzureOpenAI
-from openai import APIError, APITimeoutError, APIConnectionError
 
 from prompt_templates import get_audit_analysis_prompt
+from analysis_schema import parse_analysis, AnalysisValidationError
+import metrics
+import tracing
 
 # Load environment variables
 load_dotenv()
@@ -39,59 +42,102 @@ class LLMClient:
         if not self.deployment_name:
             raise ValueError("AZURE_OPENAI_DEPLOYMENT_NAME is required in environment variables")
         
-        # Initialize Azure OpenAI client
-        # Using AsyncAzureOpenAI for FastAPI async compatibility
-        self.client = AsyncAzureOpenAI(
-            azure_endpoint=self.azure_endpoint,
-            api_key=self.api_key,
-            api_version=self.api_version
-        )
-        
-        logger.info(f"Azure OpenAI Client Initialized")
-        logger.info(f"  Endpoint: {self.azure_endpoint}")
-        logger.info(f"  Deployment: {self.deployment_name}")
-        logger.info(f"  API Version: {self.api_version}")
+        # The openai package takes a sizeable share of startup; it is imported
+        # and the client built on first use (or by warm_up)
+        self._client = None
+        self._client_lock = threading.Lock()
         
         self.max_retries = 3
         self.timeout = 120  # 2 minutes timeout
     
-    async def generate_audit_analysis(self, company_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    @property
+    def client(self):
+        """AsyncAzureOpenAI client (FastAPI async compatible), created on first access"""
+        if self._client is None:
+            # warm_up may be building it in a thread at the same time
+            with self._client_lock:
+                if self._client is None:
+                    from openai import AsyncAzureOpenAI
+                    self._client = AsyncAzureOpenAI(
+                        azure_endpoint=self.azure_endpoint,
+                        api_key=self.api_key,
+                        api_version=self.api_version
+                    )
+                    
+                    logger.info("Azure OpenAI Client Initialized")
+                    logger.info("  Endpoint: %s", self.azure_endpoint)
+                    logger.info("  Deployment: %s", self.deployment_name)
+                    logger.info("  API Version: %s", self.api_version)
+        return self._client
+    
+    def warm_up(self):
+        """Import openai and build the client ahead of the first audit (blocking; run in a thread)"""
+        self.client
+    
+    async def check_connection(self, timeout: float = 10.0) -> Dict[str, Any]:
+        """
+        Check that the endpoint is reachable and accepts the API key by
+        listing models (no completion, no tokens billed).
+        
+        Raises:
+            openai.APIError: If the endpoint cannot be reached or rejects the key
+        """
+        models = await self.client.models.list(timeout=timeout)
+        return {
+            "endpoint": self.azure_endpoint,
+            "deployment": self.deployment_name,
+            "models": len(models.data)
+        }
+    
+    async def generate_audit_analysis(
+        self,
+        company_data: Dict[str, Any],
+        usage: Optional[Dict[str, int]] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Generate AI audit analysis using Azure OpenAI.
         
         Args:
             company_data: Dictionary containing company and department information
+            usage: Optional dict that receives token counts (prompt_tokens,
+                completion_tokens, total_tokens), summed over all attempts
             
         Returns:
             Dictionary containing LLM analysis or None if failed
         """
         try:
             # Generate prompt
-            prompt = get_audit_analysis_prompt(company_data)
+            with tracing.span("llm.prompt_build"):
+                prompt = get_audit_analysis_prompt(company_data)
             
-            logger.info(f"Sending request to Azure OpenAI...")
+            logger.info("Sending request to Azure OpenAI...")
             
             # Call Azure OpenAI API with retries
             for attempt in range(self.max_retries):
+                if attempt > 0:
+                    metrics.LLM_RETRIES.inc()
                 try:
-                    response_text = await self._call_azure_openai_api(prompt, attempt + 1)
+                    response_text = await self._call_azure_openai_api(prompt, attempt + 1, usage)
                     
                     if response_text:
                         # Parse and validate JSON response
-                        parsed_response = self._parse_llm_response(response_text)
+                        with tracing.span("llm.parse", attempt=attempt + 1) as parse_span:
+                            parsed_response = self._parse_llm_response(response_text)
+                            parse_span.set(valid=parsed_response is not None)
                         
                         if parsed_response:
                             logger.info("Successfully generated audit analysis")
                             return parsed_response
                         else:
-                            logger.warning(f"Attempt {attempt + 1}: Failed to parse LLM response")
+                            metrics.LLM_PARSE_FAILURES.inc()
+                            logger.warning("Attempt %d: Failed to parse LLM response", attempt + 1)
                     
                 except Exception as e:
-                    logger.error(f"Attempt {attempt + 1} failed: {str(e)}")
+                    logger.error("Attempt %d failed: %s", attempt + 1, e)
                     
                     if attempt < self.max_retries - 1:
                         wait_time = 2 ** attempt  # Exponential backoff
-                        logger.info(f"Retrying in {wait_time} seconds...")
+                        logger.info("Retrying in %s seconds...", wait_time)
                         await asyncio.sleep(wait_time)
             
             # If all retries failed, return fallback response
@@ -99,22 +145,31 @@ class LLMClient:
             return self._generate_fallback_response(company_data)
             
         except Exception as e:
-            logger.error(f"Error in generate_audit_analysis: {str(e)}", exc_info=True)
+            logger.error("Error in generate_audit_analysis: %s", e, exc_info=True)
             return self._generate_fallback_response(company_data)
     
-    async def _call_azure_openai_api(self, prompt: str, attempt: int) -> Optional[str]:
+    async def _call_azure_openai_api(
+        self,
+        prompt: str,
+        attempt: int,
+        usage: Optional[Dict[str, int]] = None
+    ) -> Optional[str]:
         """
         Make API call to Azure OpenAI.
         
         Args:
             prompt: The prompt to send to the LLM
             attempt: Current attempt number
+            usage: Optional dict to add this call's token counts to
             
         Returns:
             Response text from LLM or None
         """
+        from openai import APIError, APITimeoutError, APIConnectionError
+        
+        started = time.perf_counter()
         try:
-            logger.info(f"Azure OpenAI API call attempt {attempt}")
+            logger.info("Azure OpenAI API call attempt %d", attempt)
             
             # Call Azure OpenAI Chat Completions API
             response = await self.client.chat.completions.create(
@@ -140,32 +195,53 @@ class LLMClient:
             # Extract the response text
             if response.choices and len(response.choices) > 0:
                 response_text = response.choices[0].message.content
-                logger.info(f"Received response from Azure OpenAI (length: {len(response_text)} chars)")
+                logger.info("Received response from Azure OpenAI (length: %d chars)", len(response_text))
                 
                 # Log token usage if available
                 if response.usage:
-                    logger.info(f"Token usage - Prompt: {response.usage.prompt_tokens}, "
-                              f"Completion: {response.usage.completion_tokens}, "
-                              f"Total: {response.usage.total_tokens}")
+                    logger.info("Token usage - Prompt: %s, Completion: %s, Total: %s",
+                                response.usage.prompt_tokens, response.usage.completion_tokens,
+                                response.usage.total_tokens)
+                    metrics.LLM_TOKENS.labels("prompt").inc(response.usage.prompt_tokens or 0)
+                    metrics.LLM_TOKENS.labels("completion").inc(response.usage.completion_tokens or 0)
+                    if usage is not None:
+                        for name in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                            usage[name] = usage.get(name, 0) + (getattr(response.usage, name, 0) or 0)
                 
+                self._observe_call(
+                    attempt, "ok", started, tokens=response.usage.total_tokens if response.usage else 0
+                )
                 return response_text
             else:
                 logger.error("No choices in Azure OpenAI response")
+                self._observe_call(attempt, "empty", started)
                 return None
                 
         except APITimeoutError:
-            logger.error(f"Azure OpenAI request timeout on attempt {attempt}")
+            logger.error("Azure OpenAI request timeout on attempt %d", attempt)
+            self._observe_call(attempt, "timeout", started)
             return None
         except APIConnectionError as e:
-            logger.error(f"Cannot connect to Azure OpenAI: {str(e)}")
+            logger.error("Cannot connect to Azure OpenAI: %s", e)
+            self._observe_call(attempt, "connection_error", started)
             return None
         except APIError as e:
-            logger.error(f"Azure OpenAI API error on attempt {attempt}: {str(e)}")
+            logger.error("Azure OpenAI API error on attempt %d: %s", attempt, e)
+            self._observe_call(attempt, "api_error", started)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error on attempt {attempt}: {str(e)}", exc_info=True)
+            logger.error("Unexpected error on attempt %d: %s", attempt, e, exc_info=True)
+            self._observe_call(attempt, "error", started)
             return None
     
+    @staticmethod
+    def _observe_call(attempt: int, outcome: str, started: float, **attributes: Any):
+        """Record the latency of one API call in the per-attempt histogram and as a span"""
+        elapsed = time.perf_counter() - started
+        metrics.LLM_CALL_LATENCY.labels(str(attempt), outcome).observe(elapsed)
+        now = time.time()
+        tracing.record("llm.attempt", now - elapsed, now, attempt=attempt, outcome=outcome, **attributes)
+    
     def _parse_llm_response(self, response_text: str) -> Optional[Dict[str, Any]]:
         """
         Parse and validate LLM response.
@@ -200,67 +276,21 @@ class LLMClient:
             
             json_text = response_text[start_idx:end_idx + 1]
             
-            # Parse JSON
-            parsed = json.loads(json_text)
+            # Decode (orjson) and validate against the analysis schema
+            return parse_analysis(json_text)
             
-            # Validate structure
-            if not self._validate_response_structure(parsed):
-                logger.error("Response structure validation failed")
-                return None
-            
-            return parsed
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
-            logger.debug(f"Response text: {response_text[:500]}")
+        except orjson.JSONDecodeError as e:
+            logger.error("JSON decode error: %s", e)
+            logger.debug("Response text: %s", response_text[:500])
             return None
-        except Exception as e:
-            logger.error(f"Error parsing response: {str(e)}")
+        except AnalysisValidationError as e:
+            logger.error("Response structure validation failed")
+            for error in e.errors:
+                logger.error("  Invalid field - %s", error)
             return None
-    
-    def _validate_response_structure(self, response: Dict[str, Any]) -> bool:
-        """
-        Validate that the response has required fields.
-        
-        Args:
-            response: Parsed response dictionary
-            
-        Returns:
-            True if valid, False otherwise
-        """
-        try:
-            # Check summary section
-            if "summary" not in response:
-                logger.error("Missing 'summary' field")
-                return False
-            
-            summary = response["summary"]
-            required_summary_fields = ["personalized_summary", "overall_risk_score", "ai_maturity_level"]
-            for field in required_summary_fields:
-                if field not in summary:
-                    logger.error(f"Missing '{field}' in summary")
-                    return False
-            
-            # Check sections
-            if "sections" not in response or not isinstance(response["sections"], list):
-                logger.error("Missing or invalid 'sections' field")
-                return False
-            
-            # Validate each section
-            for section in response["sections"]:
-                if not all(key in section for key in ["section_name", "level", "drawbacks"]):
-                    logger.error("Section missing required fields")
-                    return False
-                
-                if not isinstance(section["drawbacks"], list):
-                    logger.error("Drawbacks must be a list")
-                    return False
-            
-            return True
-            
         except Exception as e:
-            logger.error(f"Validation error: {str(e)}")
-            return False
+            logger.error("Error parsing response: %s", e)
+            return None
     
     def _generate_fallback_response(self, company_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -272,6 +302,7 @@ class LLMClient:
         Returns:
             Fallback audit analysis
         """
+        metrics.LLM_FALLBACKS.inc()
         company_name = company_data.get('company_name', 'the organization')
         industry = company_data.get('industry', 'their industry')
         departments = company_data.get('departments', {})
@@ -0,0 +1,167 @@
+"""
+Logging Setup
+Structured (JSON) logs written by a background listener, with the request_id bound per task via contextvars
+"""
+
+import os
+import sys
+import zlib
+import atexit
+import queue
+import random
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+import orjson
+from pythonjsonlogger import jsonlogger
+
+# Audit the current task/thread works on; stamped on every record logged there
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@contextmanager
+def bind_request_id(request_id: Optional[str]) -> Iterator[None]:
+    """Tag records logged inside the block (and in tasks/threads started from it) with request_id"""
+    token = request_id_var.set(request_id)
+    try:
+        yield
+    finally:
+        request_id_var.reset(token)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "audit_worker=0.1,pdf_builder=0.25" into logger name -> fraction kept"""
+    rates = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(value)))
+    return rates
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds record.request_id from the context (unless passed via extra=)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the INFO/DEBUG records of chatty loggers (warnings
+    and errors always pass). Records of an audit are kept or dropped
+    together, based on its request_id, so sampled audits stay complete.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            return (zlib.crc32(request_id.encode("utf-8")) & 0xFFFF) < rate * 0x10000
+        return random.random() < rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records as they are. The stock QueueHandler formats the message
+    in the logging thread; here the listener thread does it, so a log call
+    on the event loop costs the record creation and a queue put.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """Classic text lines, with the bound request_id as a [prefix]"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        request_id = getattr(record, "request_id", None)
+        record.request_tag = f"[{request_id}] " if request_id else ""
+        return super().formatMessage(record)
+
+
+def _orjson_dumps(obj, default=None, **_) -> str:
+    return orjson.dumps(obj, default=default).decode("utf-8")
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    sample_rates: Optional[Dict[str, float]] = None
+) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue to a background listener writing to stderr.
+
+    Safe to call more than once per process (later calls are no-ops).
+
+    Args:
+        level: Root level (default LOG_LEVEL, INFO)
+        log_format: "json" or "text" (default LOG_FORMAT, json)
+        sample_rates: Logger name -> fraction of INFO/DEBUG records kept (default LOG_SAMPLE_RATES)
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_format = (log_format or os.getenv("LOG_FORMAT", "json")).lower()
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+    if log_format == "json":
+        formatter: logging.Formatter = jsonlogger.JsonFormatter(
+            "%(asctime)s %(levelname)s %(name)s %(message)s %(request_id)s",
+            rename_fields={"asctime": "timestamp", "levelname": "level", "name": "logger"},
+            json_serializer=_orjson_dumps
+        )
+    else:
+        formatter = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(request_tag)s%(message)s')
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(formatter)
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # Server logs go the same way (uvicorn installs its own stream handlers)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        server_logger = logging.getLogger(name)
+        server_logger.handlers.clear()
+        server_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and stop the listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
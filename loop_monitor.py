@@ -0,0 +1,177 @@
+"""
+Event Loop Monitor
+Measures event-loop lag and logs the stack of code that blocks the loop past a threshold
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from types import FrameType
+from typing import Any, Deque, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Locals naming the audit a blocked frame was working on
+_REQUEST_ID_NAMES = ("request_id", "job_id")
+
+
+class LoopMonitor:
+    """
+    Lag monitor for one asyncio event loop.
+
+    A heartbeat task sleeps `interval` seconds at a time; how late it wakes
+    up is the loop lag (time other callbacks held the loop), recorded in the
+    lag histogram. A watchdog thread checks the heartbeat: once the loop has
+    not ticked for `block_threshold` seconds it captures the loop thread's
+    stack, i.e. the code blocking the loop caught in the act, and logs it with
+    the request_id found in that stack.
+    """
+
+    def __init__(self, interval: float = 0.25, block_threshold: float = 1.0, max_stalls: int = 20):
+        """
+        Initialize the monitor.
+
+        Args:
+            interval: Heartbeat period in seconds
+            block_threshold: Lag in seconds reported as a stall (0 disables the monitor)
+            max_stalls: Recent stalls kept for /stats
+        """
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+        self._lags: Deque[float] = deque(maxlen=max(1, int(60 / interval)))
+        self._stall_count = 0
+        self._last_tick = 0.0
+        self._reported_tick = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LoopMonitor":
+        """Build a monitor configured from LOOP_MONITOR_INTERVAL_SECONDS and LOOP_BLOCK_THRESHOLD_SECONDS"""
+        return cls(
+            interval=float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.25")),
+            block_threshold=float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "1.0"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.block_threshold > 0
+
+    def start(self):
+        """Start monitoring the running loop"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._watchdog.join(timeout=5)
+        self._watchdog = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Lag percentiles over the last minute and recent stalls"""
+        with self._lock:
+            lags = sorted(self._lags)
+            stalls = list(self._stalls)
+            stall_count = self._stall_count
+        stats: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "block_threshold_seconds": self.block_threshold,
+            "stalls": stall_count,
+            "recent_stalls": stalls,
+        }
+        if lags:
+            stats.update({
+                "lag_p50_ms": round(lags[len(lags) // 2] * 1000, 1),
+                "lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 1),
+                "lag_max_ms": round(lags[-1] * 1000, 1),
+            })
+        return stats
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_tick = now
+            metrics.LOOP_LAG.observe(lag)
+            with self._lock:
+                self._lags.append(lag)
+                if lag < self.block_threshold:
+                    continue
+                self._stall_count += 1
+                stall = self._stalls[-1] if self._stalls and self._stalls[-1]["resumed"] is None else None
+                if stall is not None:
+                    stall["blocked_seconds"] = round(lag, 3)
+                    stall["resumed"] = time.time()
+            metrics.LOOP_STALLS.inc()
+            if stall is None:
+                # Ended before the watchdog looked; no stack available
+                logger.warning("Event loop blocked for %.2fs", lag)
+            else:
+                logger.warning(
+                    "Event loop resumed after %.2fs (blocked in %s)", lag, stall["where"],
+                    extra={"request_id": stall["request_id"]}
+                )
+
+    def _watch(self):
+        while not self._stopping.wait(min(self.interval, self.block_threshold / 2)):
+            last_tick = self._last_tick
+            blocked = time.monotonic() - last_tick - self.interval
+            if blocked < self.block_threshold or last_tick == self._reported_tick:
+                continue
+            # One report per stall
+            self._reported_tick = last_tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            request_id = _find_request_id(frame)
+            stack = "".join(traceback.format_stack(frame))
+            code = frame.f_code
+            where = f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+            del frame
+            with self._lock:
+                self._stalls.append({
+                    "at": time.time() - blocked,
+                    "blocked_seconds": round(blocked, 3),
+                    "resumed": None,
+                    "request_id": request_id,
+                    "where": where,
+                })
+            logger.warning(
+                "Event loop blocked for %.2fs so far in %s:\n%s", blocked, where, stack,
+                extra={"request_id": request_id}
+            )
+
+
+def _find_request_id(frame: Optional[FrameType]) -> Optional[str]:
+    """request_id local of the innermost frame on the stack that has one"""
+    while frame is not None:
+        for name in _REQUEST_ID_NAMES:
+            value = frame.f_locals.get(name)
+            if isinstance(value, str):
+                return value
+        frame = frame.f_back
+    return None
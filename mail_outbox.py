@@ -0,0 +1,445 @@
+"""
+Durable Mail Outbox
+Persists finished reports until they are delivered, with retry/backoff and a dead-letter table
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+import state_db
+from mailer import EmailService
+from send_scheduler import SendDeferred
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mail_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id TEXT NOT NULL,
+    recipient_email TEXT NOT NULL,
+    recipient_name TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    personalized_summary TEXT NOT NULL,
+    pdf_path TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mail_outbox_due ON mail_outbox (state, next_attempt_at);
+CREATE TABLE IF NOT EXISTS mail_dead_letter (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id TEXT NOT NULL,
+    recipient_email TEXT NOT NULL,
+    recipient_name TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    personalized_summary TEXT NOT NULL,
+    pdf_path TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    dead_at REAL NOT NULL
+);
+"""
+
+_ITEM_COLUMNS = (
+    "request_id, recipient_email, recipient_name, company_name, "
+    "personalized_summary, pdf_path"
+)
+
+# Hold for items about to be sent with OutboxWorker.deliver_now: drain loops
+# (in any process sharing the outbox) leave them alone for this long, so
+# only deliver_now sends them; after a crash they are picked up once it ends
+DELIVER_NOW_HOLD_SECONDS = 60.0
+
+
+@dataclass
+class OutboxItem:
+    """A report waiting to be mailed"""
+    id: int
+    request_id: str
+    recipient_email: str
+    recipient_name: str
+    company_name: str
+    personalized_summary: str
+    pdf_path: str
+    attempts: int
+    created_at: float
+
+
+class MailOutbox:
+    """SQLite-backed outbox shared by every process using the same STATE_DB_PATH"""
+
+    def __init__(self, db_path: Optional[str] = None, lease_seconds: float = 300.0):
+        """
+        Open (and create if needed) the outbox tables.
+
+        Args:
+            db_path: State database file (defaults to STATE_DB_PATH)
+            lease_seconds: How long a claimed item stays reserved before another
+                worker may pick it up again (covers crashed senders)
+        """
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = state_db.connect(db_path)
+        self._conn.executescript(_SCHEMA)
+
+    def enqueue(
+        self,
+        request_id: str,
+        recipient_email: str,
+        recipient_name: str,
+        company_name: str,
+        personalized_summary: str,
+        pdf_path: str,
+        hold_seconds: float = 0.0
+    ) -> int:
+        """
+        Add a finished report to the outbox.
+
+        Args:
+            hold_seconds: Delay before the first attempt (digest batching window)
+
+        Returns:
+            Outbox item ID
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"INSERT INTO mail_outbox ({_ITEM_COLUMNS}, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (request_id, recipient_email, recipient_name, company_name,
+                 personalized_summary, pdf_path, now + hold_seconds, now)
+            )
+        return cursor.lastrowid
+
+    def claim(self, item_id: int) -> Optional[OutboxItem]:
+        """Reserve a specific pending item for immediate delivery"""
+        items = self._claim("id = ? AND state = 'pending'", (item_id,), 1)
+        return items[0] if items else None
+
+    def claim_due(self, limit: int = 10) -> List[OutboxItem]:
+        """Reserve up to `limit` items whose retry time has come"""
+        now = time.time()
+        return self._claim(
+            "(state = 'pending' AND next_attempt_at <= ?) OR (state = 'sending' AND lease_until <= ?)",
+            (now, now),
+            limit
+        )
+
+    def claim_held_for(self, recipient_email: str, limit: int) -> List[OutboxItem]:
+        """
+        Reserve fresh items for a recipient that are still inside their
+        batching window, so they can join a digest that is going out now.
+        """
+        return self._claim(
+            "state = 'pending' AND attempts = 0 AND recipient_email = ? COLLATE NOCASE",
+            (recipient_email,),
+            limit
+        )
+
+    def mark_sent(self, item_id: int):
+        """Remove a delivered item"""
+        with self._lock:
+            self._conn.execute("DELETE FROM mail_outbox WHERE id = ?", (item_id,))
+
+    def defer(self, item_id: int, retry_at: float):
+        """Put a claimed item back without counting the attempt (quota deferral)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE mail_outbox SET state = 'pending', lease_until = NULL, "
+                "attempts = attempts - 1, next_attempt_at = ? WHERE id = ?",
+                (retry_at, item_id)
+            )
+
+    def mark_failed(self, item_id: int, error: str, retry_at: Optional[float]):
+        """
+        Record a failed attempt.
+
+        Args:
+            item_id: Outbox item ID
+            error: Failure reason
+            retry_at: Epoch time of the next attempt, or None to dead-letter the item
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if retry_at is None:
+                    self._conn.execute(
+                        f"INSERT INTO mail_dead_letter ({_ITEM_COLUMNS}, attempts, last_error, created_at, dead_at) "
+                        f"SELECT {_ITEM_COLUMNS}, attempts, ?, created_at, ? FROM mail_outbox WHERE id = ?",
+                        (error, time.time(), item_id)
+                    )
+                    self._conn.execute("DELETE FROM mail_outbox WHERE id = ?", (item_id,))
+                else:
+                    self._conn.execute(
+                        "UPDATE mail_outbox SET state = 'pending', lease_until = NULL, "
+                        "last_error = ?, next_attempt_at = ? WHERE id = ?",
+                        (error, retry_at, item_id)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recent dead-lettered items"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, request_id, recipient_email, company_name, attempts, last_error, "
+                "created_at, dead_at FROM mail_dead_letter ORDER BY id DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_dead_letter(self, dead_letter_id: int) -> Optional[int]:
+        """
+        Move a dead-lettered item back into the outbox with a fresh attempt budget.
+
+        Returns:
+            New outbox item ID, or None if the dead letter does not exist
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    f"INSERT INTO mail_outbox ({_ITEM_COLUMNS}, next_attempt_at, created_at) "
+                    f"SELECT {_ITEM_COLUMNS}, ?, created_at FROM mail_dead_letter WHERE id = ?",
+                    (now, dead_letter_id)
+                )
+                if cursor.rowcount == 0:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                item_id = cursor.lastrowid
+                self._conn.execute("DELETE FROM mail_dead_letter WHERE id = ?", (dead_letter_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return item_id
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Outbox depth by state and dead-letter count"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) AS n FROM mail_outbox GROUP BY state"
+            ).fetchall()
+            dead = self._conn.execute("SELECT COUNT(*) FROM mail_dead_letter").fetchone()[0]
+        stats = {"pending": 0, "sending": 0}
+        stats.update({row["state"]: row["n"] for row in rows})
+        stats["dead_letter"] = dead
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _claim(self, where: str, params: tuple, limit: int) -> List[OutboxItem]:
+        """Atomically move matching items to 'sending' and return them"""
+        lease_until = time.time() + self.lease_seconds
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT id, {_ITEM_COLUMNS}, attempts, created_at FROM mail_outbox "
+                    f"WHERE {where} ORDER BY next_attempt_at LIMIT ?",
+                    (*params, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE mail_outbox SET state = 'sending', lease_until = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    [(lease_until, row["id"]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [OutboxItem(**{**dict(row), "attempts": row["attempts"] + 1}) for row in rows]
+
+
+class OutboxWorker:
+    """Drains the outbox, retrying failed sends with exponential backoff"""
+
+    def __init__(
+        self,
+        outbox: MailOutbox,
+        email_service: EmailService,
+        max_attempts: int = 6,
+        retry_base_seconds: float = 30.0,
+        retry_max_seconds: float = 3600.0,
+        poll_interval: float = 5.0,
+        batch_size: int = 10
+    ):
+        """
+        Initialize the sender worker.
+
+        Args:
+            outbox: Outbox to drain
+            email_service: Service used for delivery
+            max_attempts: Attempts before an item is dead-lettered
+            retry_base_seconds: Delay after the first failure (doubles per attempt)
+            retry_max_seconds: Upper bound on the retry delay
+            poll_interval: Seconds between outbox scans
+            batch_size: Items claimed per scan
+        """
+        self.outbox = outbox
+        self.email_service = email_service
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, outbox: MailOutbox, email_service: EmailService) -> "OutboxWorker":
+        """Build a worker configured from OUTBOX_* environment variables"""
+        return cls(
+            outbox,
+            email_service,
+            max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6")),
+            retry_base_seconds=float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30")),
+            retry_max_seconds=float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600")),
+            poll_interval=float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "5"))
+        )
+
+    async def deliver_now(self, item_id: int) -> bool:
+        """
+        Try to deliver a freshly enqueued item immediately.
+
+        Enqueue the item with hold_seconds=DELIVER_NOW_HOLD_SECONDS; claiming
+        it by ID bypasses the hold, while drain loops (here or in another
+        process) skip it, so it is never sent twice.
+
+        Returns:
+            True if sent; False if the item stays in the outbox for retry
+        """
+        item = self.outbox.claim(item_id)
+        if item is None:
+            logger.warning("Outbox item %s was no longer pending; not sent from here", item_id)
+            return False
+        return await self._deliver([item])
+
+    async def drain_once(self) -> int:
+        """Deliver all currently due items; returns the number sent"""
+        sent = 0
+        while True:
+            items = self.outbox.claim_due(self.batch_size)
+            if not items:
+                return sent
+            for batch in self._batches(items):
+                if await self._deliver(batch):
+                    sent += len(batch)
+
+    def start(self):
+        """Start the background drain loop on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background drain loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        logger.info("Mail outbox worker started")
+        while True:
+            try:
+                await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Mail outbox worker error: %s", e, exc_info=True)
+            await asyncio.sleep(self.poll_interval)
+
+    def _batches(self, items: List[OutboxItem]) -> List[List[OutboxItem]]:
+        """
+        Group claimed items into messages.
+
+        Without digest batching every item is its own message. With it, items
+        for the same recipient (plus any of their reports still held in the
+        window) are merged, then split by the email service's digest caps.
+        """
+        if self.email_service.digest_window_seconds <= 0:
+            return [[item] for item in items]
+
+        by_recipient: Dict[str, List[OutboxItem]] = {}
+        for item in items:
+            by_recipient.setdefault(item.recipient_email.lower(), []).append(item)
+
+        batches = []
+        for group in by_recipient.values():
+            room = self.email_service.digest_max_reports - len(group)
+            if room > 0:
+                group += self.outbox.claim_held_for(group[0].recipient_email, room)
+            plan = self.email_service.plan_digests([item.pdf_path for item in group])
+            batches.extend([group[index] for index in indexes] for indexes in plan)
+        return batches
+
+    async def _deliver(self, batch: List[OutboxItem]) -> bool:
+        """Send one message (a single report or a digest) and record the outcome"""
+        first = batch[0]
+        try:
+            if len(batch) == 1:
+                await self.email_service.deliver_report_async(
+                    recipient_email=first.recipient_email,
+                    recipient_name=first.recipient_name,
+                    company_name=first.company_name,
+                    personalized_summary=first.personalized_summary,
+                    pdf_path=first.pdf_path,
+                    wait_for_slot=False
+                )
+            else:
+                await self.email_service.deliver_digest_async(
+                    recipient_email=first.recipient_email,
+                    recipient_name=first.recipient_name,
+                    reports=[(item.company_name, item.personalized_summary, item.pdf_path) for item in batch],
+                    wait_for_slot=False
+                )
+        except SendDeferred as e:
+            # Quota exhausted: move to the next window instead of failing
+            logger.info(
+                "Email (%s report(s)) deferred %.0fs by send quota", len(batch), e.retry_after,
+                extra={"request_id": first.request_id}
+            )
+            for item in batch:
+                self.outbox.defer(item.id, retry_at=time.time() + e.retry_after)
+            return False
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            for item in batch:
+                if item.attempts >= self.max_attempts:
+                    logger.error(
+                        "Email to %s dead-lettered after %s attempts: %s", item.recipient_email, item.attempts, error,
+                        extra={"request_id": item.request_id}
+                    )
+                    self.outbox.mark_failed(item.id, error, retry_at=None)
+                else:
+                    delay = min(self.retry_base_seconds * 2 ** (item.attempts - 1), self.retry_max_seconds)
+                    logger.warning(
+                        "Email attempt %s failed (%s), retrying in %.0fs", item.attempts, error, delay,
+                        extra={"request_id": item.request_id}
+                    )
+                    self.outbox.mark_failed(item.id, error, retry_at=time.time() + delay)
+            return False
+
+        for item in batch:
+            self.outbox.mark_sent(item.id)
+            logger.info("Email sent successfully to %s", item.recipient_email, extra={"request_id": item.request_id})
+
+            # The PDF is only needed until delivery succeeds (unless it is served as a link)
+            self.email_service.release_report(item.pdf_path)
+        return True
@@ -4,14 +4,22 @@ Supports SMTP (Gmail) for sending PDF attachments
 """
 
 import os
+import re
+import time
+import asyncio
 import logging
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
 from dotenv import load_dotenv
 
+from smtp_pool import SMTPConnectionPool, AsyncSMTPConnectionPool
+from send_scheduler import SendScheduler, SendDeferred
+from email_templates import ReportEmailTemplate, PreparedMessage, DigestEntry
+from mime_stream import Base64Attachment
+from report_store import ReportStore, StoredReport
+import tracing
+
 # Load environment variables
 load_dotenv()
 
@@ -21,19 +29,50 @@ logger = logging.getLogger(__name__)
 class EmailService:
     """Service for sending emails with PDF attachments"""
     
-    def __init__(self):
-        """Initialize email service with SMTP configuration"""
+    def __init__(self, report_store: Optional[ReportStore] = None):
+        """
+        Initialize email service with SMTP configuration.
+        
+        Args:
+            report_store: When given, reports are delivered as signed download
+                links to the stored PDF instead of as attachments
+        """
         self.sender_email = os.getenv("SENDER_EMAIL")
         self.smtp_password = os.getenv("SMTP_PASSWORD")
         self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", "465"))
+        self.pool: Optional[SMTPConnectionPool] = None
+        self.async_pool: Optional[AsyncSMTPConnectionPool] = None
+        self.scheduler: Optional[SendScheduler] = None
+        self.report_store = report_store
+        # Digest batching (opt-in): reports for the same recipient within the
+        # window are sent as one message, capped by report count and size
+        self.digest_window_seconds = float(os.getenv("EMAIL_DIGEST_WINDOW_MINUTES", "0")) * 60
+        self.digest_max_reports = int(os.getenv("EMAIL_DIGEST_MAX_REPORTS", "10"))
+        self.digest_max_bytes = int(os.getenv("EMAIL_DIGEST_MAX_BYTES", str(20 * 1024 * 1024)))
+        # Templates and MIME framing are compiled once, not per send
+        self.template = ReportEmailTemplate()
         
         if not self.sender_email or not self.smtp_password:
             logger.warning("Email credentials not configured. Email sending will be disabled.")
             self.enabled = False
         else:
             self.enabled = True
-            logger.info(f"Email service initialized with sender: {self.sender_email}")
+            # Authenticated sessions are reused across sends
+            pool_config = dict(
+                host=self.smtp_host,
+                port=self.smtp_port,
+                username=self.sender_email,
+                password=self.smtp_password,
+                max_connections=int(os.getenv("SMTP_POOL_SIZE", "2")),
+                max_messages_per_connection=int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100")),
+                noop_interval=float(os.getenv("SMTP_NOOP_INTERVAL_SECONDS", "30"))
+            )
+            self.pool = SMTPConnectionPool(**pool_config)
+            self.async_pool = AsyncSMTPConnectionPool(**pool_config)
+            # Provider quotas (per-minute/per-day/per-domain), persisted across restarts
+            self.scheduler = SendScheduler.from_env()
+            logger.info("Email service initialized with sender: %s", self.sender_email)
     
     def send_report(
         self,
@@ -61,229 +100,279 @@ class EmailService:
             return False
         
         try:
-            # Create message
-            message = self._create_email_message(
+            message = self._build_report_message(
                 recipient_email,
                 recipient_name,
                 company_name,
-                personalized_summary
+                personalized_summary,
+                pdf_path
             )
-            
-            # Attach PDF
-            if not self._attach_pdf(message, pdf_path, company_name):
-                logger.error("Failed to attach PDF to email")
+            if message is None:
                 return False
             
+            # Wait for a send slot within the provider quotas
+            while True:
+                wait = self.scheduler.reserve(recipient_email)
+                if wait == 0:
+                    break
+                logger.info("Send quota reached, waiting %.0fs", wait)
+                time.sleep(wait)
+            
             # Send email
             success = self._send_email(message, recipient_email)
             
             if success:
-                logger.info(f"Email sent successfully to {recipient_email}")
+                logger.info("Email sent successfully to %s", recipient_email)
             else:
-                logger.error(f"Failed to send email to {recipient_email}")
+                logger.error("Failed to send email to %s", recipient_email)
             
             return success
             
         except Exception as e:
-            logger.error(f"Error sending email: {str(e)}", exc_info=True)
+            logger.error("Error sending email: %s", e, exc_info=True)
             return False
     
-    def _create_email_message(
+    async def deliver_report_async(
         self,
         recipient_email: str,
         recipient_name: str,
         company_name: str,
-        personalized_summary: str
-    ) -> MIMEMultipart:
+        personalized_summary: str,
+        pdf_path: str,
+        wait_for_slot: bool = True
+    ) -> float:
         """
-        Create email message with HTML body.
+        Send AI audit report, raising on failure.
+        
+        Used by callers that need the failure reason (e.g. the mail outbox).
         
         Args:
-            recipient_email: Recipient's email address
-            recipient_name: Recipient's name
-            company_name: Company name
-            personalized_summary: Summary from LLM
-            
+            wait_for_slot: Sleep until the send quota allows the message; when
+                False, raise SendDeferred instead so the caller can reschedule
+        
         Returns:
-            MIMEMultipart message object
+            Send latency in seconds
+            
+        Raises:
+            SendDeferred: If wait_for_slot is False and no quota is available
+            RuntimeError: If email is disabled or the PDF could not be attached
+            AsyncSMTPError: If the SMTP server rejected the message
         """
-        message = MIMEMultipart('mixed')
-        message['From'] = self.sender_email
-        message['To'] = recipient_email
-        message['Subject'] = f"AI Audit Report — {company_name}"
+        if not self.enabled:
+            raise RuntimeError("Email service is not enabled")
         
-        # Create HTML body
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #333333;
-                }}
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }}
-                .header {{
-                    background-color: #3498db;
-                    color: white;
-                    padding: 20px;
-                    text-align: center;
-                    border-radius: 5px 5px 0 0;
-                }}
-                .content {{
-                    background-color: #f9f9f9;
-                    padding: 30px;
-                    border: 1px solid #dddddd;
-                }}
-                .summary-box {{
-                    background-color: #ecf0f1;
-                    border-left: 4px solid #3498db;
-                    padding: 15px;
-                    margin: 20px 0;
-                }}
-                .footer {{
-                    background-color: #2c3e50;
-                    color: #ecf0f1;
-                    padding: 20px;
-                    text-align: center;
-                    border-radius: 0 0 5px 5px;
-                    font-size: 12px;
-                }}
-                .button {{
-                    display: inline-block;
-                    padding: 10px 20px;
-                    background-color: #27ae60;
-                    color: white;
-                    text-decoration: none;
-                    border-radius: 5px;
-                    margin: 10px 0;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>AI Audit Report</h1>
-                </div>
-                
-                <div class="content">
-                    <p>Dear {recipient_name},</p>
-                    
-                    <p>Please find attached the comprehensive <strong>AI Audit Report</strong> for <strong>{company_name}</strong>.</p>
-                    
-                    <div class="summary-box">
-                        <h3>Executive Summary</h3>
-                        <p>{personalized_summary}</p>
-                    </div>
-                    
-                    <p>This report includes:</p>
-                    <ul>
-                        <li>Detailed department-wise AI readiness analysis</li>
-                        <li>Identified gaps and limitations</li>
-                        <li>AI maturity visualizations and charts</li>
-                        <li>Overall risk assessment</li>
-                    </ul>
-                    
-                    <p>The attached PDF contains comprehensive insights to help understand your organization's current AI maturity level and areas requiring attention.</p>
-                    
-                    <p>If you have any questions or need further clarification, please don't hesitate to reach out.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>AI Audit Agent</strong><br>
-                    Automated Audit & Analysis System</p>
-                </div>
-                
-                <div class="footer">
-                    <p><strong>AI Audit Agent</strong></p>
-                    <p>This is an automated report generated by our AI-powered audit system.</p>
-                    <p>Confidential Document | For Internal Use Only</p>
-                </div>
-            </div>
-        </body>
-        </html>
+        await self._reserve_slot_async(recipient_email, wait_for_slot)
+        
+        with tracing.span("mail.mime_build"):
+            message = self._build_report_message(
+                recipient_email,
+                recipient_name,
+                company_name,
+                personalized_summary,
+                pdf_path
+            )
+        if message is None:
+            raise RuntimeError(f"Failed to attach PDF: {pdf_path}")
+        
+        latency = await self.async_pool.send(message)
+        logger.info("Email sent via %s:%s in %.0f ms", self.smtp_host, self.smtp_port, latency * 1000)
+        return latency
+    
+    async def deliver_digest_async(
+        self,
+        recipient_email: str,
+        recipient_name: str,
+        reports: List[Tuple[str, str, str]],
+        wait_for_slot: bool = True
+    ) -> float:
         """
+        Send several reports to one recipient as a single message, raising on failure.
         
-        # Create plain text alternative
-        text_body = f"""
-Hi {recipient_name},
-
-Please find attached the AI Audit Report for {company_name}.
-
-Summary:
-{personalized_summary}
-
-This report includes detailed department-wise gaps and AI readiness visualizations.
-
-Best regards,
-AI Audit Agent
-Automated Audit & Analysis System
-
----
-Confidential Document | For Internal Use Only
+        Uses one SMTP transaction and one send-quota slot for the whole batch.
+        
+        Args:
+            recipient_email: Email address of recipient
+            recipient_name: Name of recipient
+            reports: (company_name, personalized_summary, pdf_path) per report
+            wait_for_slot: See deliver_report_async()
+        
+        Returns:
+            Send latency in seconds
         """
+        if not self.enabled:
+            raise RuntimeError("Email service is not enabled")
         
-        # Attach both HTML and plain text versions
-        part_text = MIMEText(text_body, 'plain')
-        part_html = MIMEText(html_body, 'html')
+        missing = [pdf_path for _, _, pdf_path in reports if not os.path.exists(pdf_path)]
+        if missing:
+            raise RuntimeError(f"Failed to attach PDF: {', '.join(missing)}")
         
-        message.attach(part_text)
-        message.attach(part_html)
+        await self._reserve_slot_async(recipient_email, wait_for_slot)
         
-        return message
+        entries = [
+            self._digest_entry(company_name, personalized_summary, pdf_path)
+            for company_name, personalized_summary, pdf_path in reports
+        ]
+        message = self.template.build_digest(
+            sender_email=self.sender_email,
+            recipient_email=recipient_email,
+            recipient_name=recipient_name,
+            entries=entries
+        )
+        
+        latency = await self.async_pool.send(message)
+        logger.info("Digest of %d reports sent via %s:%s in %.0f ms",
+                    len(entries), self.smtp_host, self.smtp_port, latency * 1000)
+        return latency
     
-    def _attach_pdf(
+    def plan_digests(self, pdf_paths: List[str]) -> List[List[int]]:
+        """
+        Split reports for one recipient into digest messages within the caps.
+        
+        Args:
+            pdf_paths: Reports in sending order
+            
+        Returns:
+            Groups of indexes into pdf_paths, one group per message (a single
+            report larger than the size cap is sent on its own)
+        """
+        groups: List[List[int]] = []
+        group_bytes = 0
+        for index, pdf_path in enumerate(pdf_paths):
+            size = self._message_bytes(pdf_path)
+            if (not groups or len(groups[-1]) >= self.digest_max_reports
+                    or group_bytes + size > self.digest_max_bytes):
+                groups.append([])
+                group_bytes = 0
+            groups[-1].append(index)
+            group_bytes += size
+        return groups
+    
+    def prepare_report(self, pdf_path: str, request_id: str, company_name: str) -> str:
+        """
+        Hand a freshly generated PDF to the delivery mode.
+        
+        In link mode the PDF is moved into the report store; the returned path
+        is what should be passed to send_report() later (e.g. on retry).
+        
+        Returns:
+            Path of the PDF to send
+        """
+        if self.report_store is None:
+            return pdf_path
+        return self.report_store.add(pdf_path, request_id, self._report_filename(company_name)).path
+    
+    def release_report(self, pdf_path: str):
+        """Delete a delivered PDF unless the report store is serving it"""
+        if self._stored_report(pdf_path) is not None:
+            return
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+            logger.info("Cleaned up PDF file")
+    
+    def _build_report_message(
         self,
-        message: MIMEMultipart,
-        pdf_path: str,
-        company_name: str
-    ) -> bool:
+        recipient_email: str,
+        recipient_name: str,
+        company_name: str,
+        personalized_summary: str,
+        pdf_path: str
+    ) -> Optional[PreparedMessage]:
         """
-        Attach PDF file to email message.
+        Create the report email with the PDF attached (or linked, in link mode).
         
         Args:
-            message: Email message object
+            recipient_email: Recipient's email address
+            recipient_name: Recipient's name
+            company_name: Company name
+            personalized_summary: Summary from LLM
             pdf_path: Path to PDF file
-            company_name: Company name for filename
             
         Returns:
-            True if attachment successful, False otherwise
+            Serialized message, or None if the PDF does not exist
         """
-        try:
-            if not os.path.exists(pdf_path):
-                logger.error(f"PDF file not found: {pdf_path}")
-                return False
-            
-            with open(pdf_path, 'rb') as pdf_file:
-                pdf_data = pdf_file.read()
-            
-            # Create attachment
-            pdf_attachment = MIMEApplication(pdf_data, _subtype='pdf')
-            
-            # Generate filename
-            safe_company_name = company_name.replace(' ', '_')[:30]
-            filename = f"AI_Audit_Report_{safe_company_name}.pdf"
-            
-            pdf_attachment.add_header(
-                'Content-Disposition',
-                'attachment',
-                filename=filename
+        if not os.path.exists(pdf_path):
+            logger.error("PDF file not found: %s", pdf_path)
+            return None
+        
+        report = self._stored_report(pdf_path)
+        if report is not None:
+            logger.info("Linking stored report %s", report.id)
+            return self.template.build(
+                sender_email=self.sender_email,
+                recipient_email=recipient_email,
+                recipient_name=recipient_name,
+                company_name=company_name,
+                personalized_summary=personalized_summary,
+                download_url=self.report_store.signed_url(report),
+                link_expires=self._format_expiry(report.expires_at)
             )
-            
-            message.attach(pdf_attachment)
-            
-            logger.info(f"PDF attached successfully: {filename}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error attaching PDF: {str(e)}", exc_info=True)
-            return False
+        
+        filename = self._report_filename(company_name)
+        
+        message = self.template.build(
+            sender_email=self.sender_email,
+            recipient_email=recipient_email,
+            recipient_name=recipient_name,
+            company_name=company_name,
+            personalized_summary=personalized_summary,
+            # Memory-mapped and base64-encoded window by window during DATA
+            attachment=Base64Attachment(path=pdf_path),
+            attachment_filename=filename
+        )
+        
+        logger.info("PDF attached successfully: %s", filename)
+        return message
+    
+    async def _reserve_slot_async(self, recipient_email: str, wait_for_slot: bool):
+        """Take a send-quota slot, sleeping or raising SendDeferred when none is free"""
+        while True:
+            wait = self.scheduler.reserve(recipient_email)
+            if wait == 0:
+                return
+            if not wait_for_slot:
+                raise SendDeferred(wait)
+            logger.info("Send quota reached, waiting %.0fs", wait)
+            await asyncio.sleep(wait)
+    
+    def _stored_report(self, pdf_path: str) -> Optional[StoredReport]:
+        """Stored report for a PDF in link mode, else None"""
+        if self.report_store is None:
+            return None
+        return self.report_store.find_by_path(pdf_path)
+    
+    def _digest_entry(self, company_name: str, personalized_summary: str, pdf_path: str) -> DigestEntry:
+        report = self._stored_report(pdf_path)
+        if report is not None:
+            return DigestEntry(
+                company_name=company_name,
+                personalized_summary=personalized_summary,
+                download_url=self.report_store.signed_url(report),
+                link_expires=self._format_expiry(report.expires_at)
+            )
+        return DigestEntry(
+            company_name=company_name,
+            personalized_summary=personalized_summary,
+            attachment=Base64Attachment(path=pdf_path),
+            attachment_filename=self._report_filename(company_name)
+        )
+    
+    def _message_bytes(self, pdf_path: str) -> int:
+        """Bytes a report adds to a message (links add no attachment)"""
+        if self._stored_report(pdf_path) is not None or not os.path.exists(pdf_path):
+            return 0
+        return Base64Attachment(path=pdf_path).encoded_size
+    
+    @staticmethod
+    def _format_expiry(expires_at: float) -> str:
+        return datetime.utcfromtimestamp(expires_at).strftime("%d %B %Y, %H:%M UTC")
+    
+    @staticmethod
+    def _report_filename(company_name: str) -> str:
+        # Company names come from the webhook; keep only filename-safe characters
+        safe_company_name = re.sub(r"[^\w.-]+", "_", company_name.strip())[:30] or "Company"
+        return f"AI_Audit_Report_{safe_company_name}.pdf"
     
-    def _send_email(self, message: MIMEMultipart, recipient_email: str) -> bool:
+    def _send_email(self, message: PreparedMessage, recipient_email: str) -> bool:
         """
         Send email via SMTP.
         
@@ -295,41 +384,70 @@ Confidential Document | For Internal Use Only
             True if sent successfully, False otherwise
         """
         try:
-            # Connect to SMTP server
-            if self.smtp_port == 465:
-                # SSL connection
-                server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port)
-            else:
-                # TLS connection
-                server = smtplib.SMTP(self.smtp_host, self.smtp_port)
-                server.starttls()
+            # Send over a pooled, already authenticated session
+            latency = self.pool.send(message)
             
-            # Login
-            server.login(self.sender_email, self.smtp_password)
-            
-            # Send email
-            server.send_message(message)
-            
-            # Close connection
-            server.quit()
-            
-            logger.info(f"Email sent successfully via {self.smtp_host}:{self.smtp_port}")
+            logger.info("Send latency: %.0f ms", latency * 1000)
+            logger.info("Email sent successfully via %s:%s", self.smtp_host, self.smtp_port)
             return True
             
         except smtplib.SMTPAuthenticationError:
             logger.error("SMTP authentication failed. Check email credentials.")
             return False
         except smtplib.SMTPException as e:
-            logger.error(f"SMTP error: {str(e)}")
+            logger.error("SMTP error: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Error sending email via SMTP: {str(e)}", exc_info=True)
+            logger.error("Error sending email via SMTP: %s", e, exc_info=True)
             return False
     
-    def test_connection(self) -> bool:
+    def get_send_stats(self) -> Dict[str, Any]:
+        """
+        Get SMTP send statistics.
+        
+        Returns:
+            Connection pool counters and per-send latency with and without reuse
+        """
+        if not self.pool:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "sync": self.pool.get_stats(),
+            "async": self.async_pool.get_stats()
+        }
+    
+    def get_throttle_stats(self, pending: int = 0) -> Dict[str, Any]:
+        """
+        Get send quota usage.
+        
+        Args:
+            pending: Messages waiting to be sent (for the projected drain time)
+            
+        Returns:
+            Budget counters and projected drain time in seconds
+        """
+        if not self.scheduler:
+            return {"enabled": False}
+        return {"enabled": True, **self.scheduler.get_stats(pending)}
+    
+    def close(self):
+        """Close pooled SMTP sessions"""
+        if self.pool:
+            self.pool.close()
+    
+    async def aclose(self):
+        """Close pooled SMTP sessions, including the async pool"""
+        self.close()
+        if self.async_pool:
+            await self.async_pool.close()
+    
+    def test_connection(self, timeout: Optional[float] = None) -> bool:
         """
         Test SMTP connection and authentication.
         
+        Args:
+            timeout: Socket timeout in seconds (None waits indefinitely)
+        
         Returns:
             True if connection successful, False otherwise
         """
@@ -339,9 +457,9 @@ Confidential Document | For Internal Use Only
         
         try:
             if self.smtp_port == 465:
-                server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port)
+                server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port, timeout=timeout)
             else:
-                server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+                server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=timeout)
                 server.starttls()
             
             server.login(self.sender_email, self.smtp_password)
@@ -351,5 +469,5 @@ Confidential Document | For Internal Use Only
             return True
             
         except Exception as e:
-            logger.error(f"Email service connection test failed: {str(e)}")
+            logger.error("Email service connection test failed: %s", e)
             return False
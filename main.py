@@ -3,23 +3,39 @@ AI Audit Agent - FastAPI Application
 Handles webhook from Google Sheets, generates AI audit reports, and emails them.
 """
 
+import os
+import hmac
+import math
+import time
+import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, Any
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, EmailStr, Field, validator
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import quote
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field, ValidationError, validator
+import orjson
 import uvicorn
 
-from llm_client import LLMClient
-from pdf_builder import PDFBuilder
-from mailer import EmailService
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from job_queue import LANES, LANE_BULK, LANE_INTERACTIVE, new_job_id
+from idempotency import IdempotencyStore, IdempotencyConflict
+from admission import AdmissionRejected
+from report_store import RangeNotSatisfiable, parse_byte_range, iter_file_range
+from readiness import ReadinessMonitor, disk_probe
+import debug_tools
+import audit_worker
+import metrics
+import log_setup
+import tracing
+import state_db
+from audit_worker import (
+    admission, email_service, job_events, job_queue, job_tracker, job_worker,
+    mail_outbox, report_store, audit_pipeline, loop_monitor, render_pool, llm_client
 )
+
+# Configure logging (JSON unless LOG_FORMAT=text; written by a background thread)
+log_setup.configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -29,10 +45,24 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Initialize services
-llm_client = LLMClient()
-pdf_builder = PDFBuilder()
-email_service = EmailService()
+# Audits run in this process unless RUN_JOB_WORKER=false, in which case this
+# process only validates and enqueues and `python -m audit_worker` processes run them
+RUN_JOB_WORKER = os.getenv("RUN_JOB_WORKER", "true").lower() == "true"
+
+# Repeated submissions (onEdit fires per cell edit) map to the first request
+idempotency_store = IdempotencyStore.from_env()
+
+# Batch ingestion limit for /webhook/sheet-rows
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "500"))
+
+# /debug endpoints (profiler, tracemalloc, object counts) are only served when a token is set
+DEBUG_ENDPOINTS_TOKEN = os.getenv("DEBUG_ENDPOINTS_TOKEN", "")
+allocation_tracker = debug_tools.AllocationTracker()
+_profile_lock = asyncio.Lock()
+
+# GET /ready serves cached dependency probes, refreshed in the background
+readiness = ReadinessMonitor.from_env()
+READY_MIN_FREE_DISK_MB = float(os.getenv("READY_MIN_FREE_DISK_MB", "500"))
 
 
 # Pydantic Models
@@ -66,6 +96,20 @@ class HealthResponse(BaseModel):
     service: str
 
 
+class StatsResponse(BaseModel):
+    """Runtime statistics response"""
+    timestamp: str
+    jobs: Dict[str, Any]
+    email: Dict[str, Any]
+    outbox: Dict[str, Any]
+    throttle: Dict[str, Any]
+    events: Dict[str, Any]
+    admission: Dict[str, Any]
+    lanes: Dict[str, Any]
+    pipeline: Dict[str, Any]
+    event_loop: Dict[str, Any]
+
+
 class WebhookResponse(BaseModel):
     """Webhook response"""
     status: str
@@ -74,83 +118,134 @@ class WebhookResponse(BaseModel):
     timestamp: str
 
 
-# Background Task Handler
-async def process_audit_request(request_data: Dict[str, Any], request_id: str):
+class RowResult(BaseModel):
+    """Outcome for one row of a batch webhook"""
+    index: int
+    status: str
+    job_id: Optional[str] = None
+    errors: List[str] = []
+
+
+class BatchWebhookResponse(BaseModel):
+    """Batch webhook response"""
+    status: str
+    accepted: int
+    rejected: int
+    results: List[RowResult]
+    timestamp: str
+
+
+def _parse_batch_body(body: bytes, content_type: str) -> List[Any]:
     """
-    Background task to process audit request:
-    1. Call LLM to generate analysis
-    2. Create PDF with visualizations
-    3. Send email with PDF attachment
+    Split a batch request body into rows.
+    
+    Accepts a JSON array, or NDJSON (one object per line). NDJSON lines that
+    are not valid JSON are returned as exceptions so they are reported per row.
     """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(orjson.loads(line))
+            except orjson.JSONDecodeError as e:
+                rows.append(e)
+        return rows
+    
     try:
-        company_name = request_data.get('company_name', 'Unknown')
-        logger.info(f"[{request_id}] Starting audit processing for {company_name}")
-        logger.info(f"[{request_id}] Company: {company_name}, Industry: {request_data.get('industry')}")
-        
-        # Step 1: Generate LLM Analysis
-        logger.info(f"[{request_id}] Calling LLM for analysis...")
-        llm_response = await llm_client.generate_audit_analysis(request_data)
-        
-        if not llm_response:
-            raise Exception("LLM returned empty response")
-        
-        # Log LLM response details
-        summary = llm_response.get('summary', {})
-        personalized_summary = summary.get('personalized_summary', '')
-        
-        logger.info(f"[{request_id}] LLM analysis completed successfully")
-        logger.info(f"[{request_id}] Summary length: {len(personalized_summary)} chars")
-        logger.info(f"[{request_id}] Risk score: {summary.get('overall_risk_score')}")
-        logger.info(f"[{request_id}] Maturity: {summary.get('ai_maturity_level')}")
-        logger.info(f"[{request_id}] Sections: {len(llm_response.get('sections', []))}")
-        
-        # Check if it's a fallback response
-        if 'demonstrates foundational digital capabilities' in personalized_summary:
-            logger.warning(f"[{request_id}] ⚠️  Response appears to be FALLBACK (generic text)")
-        else:
-            logger.info(f"[{request_id}] ✓ Response appears customized")
-        
-        # Verify company name is in summary
-        if company_name.lower() in personalized_summary.lower():
-            logger.info(f"[{request_id}] ✓ Company name found in summary")
-        else:
-            logger.warning(f"[{request_id}] ⚠️  Company name NOT in summary - may be fallback")
-        
-        # Step 2: Generate PDF with visualizations
-        logger.info(f"[{request_id}] Generating PDF report...")
-        pdf_path = pdf_builder.create_report(
-            company_data=request_data,
-            llm_analysis=llm_response,
-            request_id=request_id
+        rows = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of rows (or NDJSON)")
+    return rows
+
+
+def _admit(count: int = 1):
+    """Apply admission control; raises 429/503 with Retry-After when overloaded"""
+    try:
+        admission.admit(count)
+    except AdmissionRejected as e:
+        metrics.ADMISSION_REJECTIONS.labels(e.signal).inc()
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
         )
-        
-        logger.info(f"[{request_id}] PDF generated at: {pdf_path}")
-        
-        # Step 3: Send Email
-        logger.info(f"[{request_id}] Sending email to {request_data['recipient_email']}...")
-        email_sent = email_service.send_report(
-            recipient_email=request_data['recipient_email'],
-            recipient_name=request_data['recipient_name'],
-            company_name=request_data['company_name'],
-            personalized_summary=llm_response['summary']['personalized_summary'],
-            pdf_path=pdf_path
+
+
+def _job_lane(priority: Optional[str], default: str) -> str:
+    """Lane from the X-Priority header (interactive or bulk)"""
+    lane = (priority or default).strip().lower()
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of: {', '.join(LANES)}")
+    return lane
+
+
+def _job_source(request_data: Dict[str, Any], source_id: Optional[str]) -> str:
+    """Fair-queuing source: the X-Source-Id header (e.g. sheet ID), else the recipient's domain"""
+    if source_id:
+        return source_id.strip()[:200]
+    return str(request_data.get("recipient_email", "")).rsplit("@", 1)[-1].lower()
+
+
+def _queued_job_status(request_id: str) -> Optional[Dict[str, Any]]:
+    """Reduced job status from the job queue, or None if unknown"""
+    job = job_queue.get(request_id)
+    if job is None:
+        return None
+    return {
+        "request_id": job["id"],
+        "state": "queued" if job["state"] == "pending" else job["state"],
+        "lane": job["lane"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "attempts": job["attempts"],
+        "error": job["last_error"],
+    }
+
+
+def _validate_row(row: Any) -> Tuple[Optional[AuditRequest], List[str]]:
+    """Validate one batch row; returns the parsed request or the error messages"""
+    if isinstance(row, Exception):
+        return None, [f"Invalid JSON: {str(row)}"]
+    if not isinstance(row, dict):
+        return None, ["Row must be a JSON object"]
+    try:
+        return AuditRequest(**row), []
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        ]
+
+
+def _record_receive_spans(request: Request, job_ids: List[str], lane: str):
+    """Trace the webhook call (receipt to enqueue) once per accepted job"""
+    if not tracing.enabled():
+        return
+    received_at = getattr(request.state, "received_at", None) or time.time()
+    now = time.time()
+    for job_id in job_ids:
+        tracing.record(
+            "webhook.receive", received_at, now, job_id,
+            endpoint=request.url.path, lane=lane, batch_size=len(job_ids)
         )
-        
-        if email_sent:
-            logger.info(f"[{request_id}] Email sent successfully to {request_data['recipient_email']}")
-        else:
-            logger.error(f"[{request_id}] Failed to send email")
-        
-        # Cleanup: Remove generated PDF after sending
-        import os
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-            logger.info(f"[{request_id}] Cleaned up PDF file")
-        
-        logger.info(f"[{request_id}] Audit processing completed successfully")
-        
-    except Exception as e:
-        logger.error(f"[{request_id}] Error processing audit request: {str(e)}", exc_info=True)
+
+
+@app.middleware("http")
+async def time_webhooks(request: Request, call_next):
+    """Observe webhook latency (validation, admission, enqueue) per endpoint"""
+    if not request.url.path.startswith("/webhook/"):
+        return await call_next(request)
+    # Start of the webhook.receive span(s) recorded by the handler
+    request.state.received_at = time.time()
+    started = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        metrics.WEBHOOK_LATENCY.labels(request.url.path).observe(time.perf_counter() - started)
 
 
 # API Endpoints
@@ -174,26 +269,327 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness for load balancers: 503 unless every critical dependency probe passed (cached results)"""
+    is_ready, body = readiness.get_status()
+    return JSONResponse(status_code=200 if is_ready else 503, content=body)
+
+
+async def _probe_llm() -> Tuple[bool, Dict[str, Any]]:
+    # Importing openai for the first client blocks; keep it off the loop
+    await asyncio.to_thread(llm_client.warm_up)
+    return True, await llm_client.check_connection(timeout=readiness.timeout)
+
+
+async def _probe_smtp() -> Tuple[bool, Dict[str, Any]]:
+    if not email_service.enabled:
+        # Running without email credentials is a supported configuration
+        return True, {"enabled": False}
+    ok = await asyncio.to_thread(email_service.test_connection, readiness.timeout)
+    details: Dict[str, Any] = {"enabled": True, "host": email_service.smtp_host}
+    if not ok:
+        details["error"] = "SMTP connection or login failed"
+    return ok, details
+
+
+async def _probe_queue() -> Tuple[bool, Dict[str, Any]]:
+    depth = await asyncio.to_thread(job_queue.pending_count)
+    limit = admission.max_queue_depth
+    details: Dict[str, Any] = {"depth": depth, "max_depth": limit}
+    if limit > 0 and depth >= limit:
+        details["error"] = "queue at the admission limit"
+        return False, details
+    return True, details
+
+
+async def _probe_render_pool() -> Tuple[bool, Dict[str, Any]]:
+    details = render_pool.get_stats()
+    if details["broken"]:
+        details["error"] = "a render worker process died"
+    return not details["broken"], details
+
+
+def _add_readiness_probes():
+    """Probes of what this process depends on (the LLM, SMTP and renders only where audits run)"""
+    readiness.add("disk", disk_probe(
+        [os.getenv("OUTPUT_DIR", "/tmp"), os.path.dirname(state_db.get_state_db_path())],
+        READY_MIN_FREE_DISK_MB
+    ))
+    # Reported only: admission control already sheds load when the queue is full
+    readiness.add("queue", _probe_queue, critical=False)
+    if RUN_JOB_WORKER:
+        readiness.add("llm", _probe_llm, remote=True)
+        readiness.add("smtp", _probe_smtp, remote=True)
+        readiness.add("render_pool", _probe_render_pool)
+
+
+@app.get("/stats", response_model=StatsResponse)
+async def stats():
+    """Runtime statistics (job queue, SMTP pool usage, send latency, outbox depth, send quotas, admission, per-lane latency, pipeline stages, event-loop lag)"""
+    outbox_stats = mail_outbox.get_stats()
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "jobs": job_queue.get_stats(),
+        "email": email_service.get_send_stats(),
+        "outbox": outbox_stats,
+        "throttle": email_service.get_throttle_stats(
+            pending=outbox_stats["pending"] + outbox_stats["sending"]
+        ),
+        "events": job_events.get_stats(),
+        "admission": admission.get_stats(),
+        "lanes": job_tracker.get_lane_stats(),
+        "pipeline": audit_pipeline.get_stats(),
+        "event_loop": loop_monitor.get_stats()
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus exposition (aggregated over all processes in multiprocess mode)"""
+    body, content_type = metrics.render_latest()
+    return Response(content=body, headers={"Content-Type": content_type})
+
+
+def _check_debug_token(authorization: Optional[str]):
+    """Operator endpoints (/debug, dead letters): 404 unless DEBUG_ENDPOINTS_TOKEN is set, 401 without the right bearer token"""
+    if not DEBUG_ENDPOINTS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), DEBUG_ENDPOINTS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid debug token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/debug/profile")
+async def debug_profile(
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    idle: bool = False,
+    format: str = "collapsed",
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Sample every thread's stack of this process for `seconds`.
+    Returns collapsed stacks (text, for flamegraph.pl/speedscope) or, with
+    format=json, the stacks plus the most sampled leaf functions.
+    """
+    _check_debug_token(authorization)
+    if not 0 < seconds <= 60 or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 60], interval_ms in [1, 1000]")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    async with _profile_lock:
+        stacks = await asyncio.to_thread(debug_tools.sample_stacks, seconds, interval_ms / 1000, idle)
+    
+    if format == "json":
+        return {
+            "pid": os.getpid(),
+            "samples": sum(stacks.values()),
+            "top": debug_tools.top_stacks(stacks),
+            "stacks": stacks,
+        }
+    return Response(content=debug_tools.format_collapsed(stacks), media_type="text/plain")
+
+
+@app.post("/debug/tracemalloc/snapshot")
+async def debug_tracemalloc_snapshot(top: int = 25, frames: int = 1, authorization: Optional[str] = Header(None)):
+    """Start tracing (first call), then return top allocation sites and growth since the last snapshot"""
+    _check_debug_token(authorization)
+    return await asyncio.to_thread(allocation_tracker.snapshot, top, frames)
+
+
+@app.delete("/debug/tracemalloc")
+async def debug_tracemalloc_stop(authorization: Optional[str] = Header(None)):
+    """Stop tracing allocations"""
+    _check_debug_token(authorization)
+    allocation_tracker.stop()
+    return {"tracing": False}
+
+
+@app.get("/debug/objects")
+async def debug_objects(authorization: Optional[str] = Header(None)):
+    """Live Matplotlib figures and ReportLab objects in this process and in one render worker"""
+    _check_debug_token(authorization)
+    return {
+        "process": await asyncio.to_thread(debug_tools.object_census),
+        "render_worker": await render_pool.call_in_worker(debug_tools.object_census),
+    }
+
+
+@app.get("/jobs/{request_id}")
+async def job_status(request_id: str):
+    """
+    Status of an audit request: state, queue wait, per-stage timings
+    (LLM, render, send), token usage and PDF size.
+    """
+    status = job_tracker.get(request_id)
+    if status is not None:
+        return status
+    
+    # Not seen by this process (separate audit_worker, restart, or past
+    # retention): the job queue still knows its state
+    status = _queued_job_status(request_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job {request_id} not found")
+    return status
+
+
+@app.get("/jobs/{request_id}/events")
+async def job_events_stream(request_id: str, request: Request):
+    """
+    Server-Sent Events stream of an audit's progress:
+    queued, running, llm, render, section (k of n), mailed, done/failed.
+    Reconnecting clients resume after the Last-Event-ID header.
+    
+    Jobs run by another process get a single `status` event with the job
+    queue state instead, and a retry hint so EventSource polls it.
+    """
+    if job_tracker.get(request_id) is None:
+        status = _queued_job_status(request_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail=f"Job {request_id} not found")
+        frame = b"retry: 5000\nevent: status\ndata: %s\n\n" % orjson.dumps(status)
+        return Response(content=frame, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_event_id = 0
+    
+    return StreamingResponse(
+        job_events.subscribe(request_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/outbox/dead-letters")
+async def list_dead_letters(limit: int = 100, authorization: Optional[str] = Header(None)):
+    """List emails that exhausted their delivery attempts (needs the debug token)"""
+    _check_debug_token(authorization)
+    return {"dead_letters": mail_outbox.list_dead_letters(limit)}
+
+
+@app.post("/outbox/dead-letters/{dead_letter_id}/retry")
+async def retry_dead_letter(dead_letter_id: int, authorization: Optional[str] = Header(None)):
+    """Re-send a dead-lettered email without regenerating the report (needs the debug token)"""
+    _check_debug_token(authorization)
+    outbox_id = mail_outbox.requeue_dead_letter(dead_letter_id)
+    if outbox_id is None:
+        raise HTTPException(status_code=404, detail=f"Dead letter {dead_letter_id} not found")
+    
+    logger.info("Dead letter %s requeued as outbox item %s", dead_letter_id, outbox_id)
+    return {
+        "status": "requeued",
+        "outbox_id": outbox_id,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/reports/{report_id}")
+async def download_report(report_id: str, expires: int, sig: str, request: Request):
+    """
+    Download a stored report through a signed link (link delivery mode).
+    Supports single byte ranges (resumable downloads) and ETag revalidation.
+    """
+    if report_store is None:
+        raise HTTPException(status_code=404, detail="Report downloads are not enabled")
+    if not report_store.verify(report_id, expires, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired download link")
+    
+    report = report_store.get(report_id)
+    if report is None or not os.path.exists(report.path):
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    headers = {
+        "ETag": report.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=86400",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(report.filename)}",
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and report.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = None
+    range_header = request.headers.get("range")
+    # If-Range: only resume when the client still has the same version
+    if range_header and request.headers.get("if-range", report.etag) == report.etag:
+        try:
+            byte_range = parse_byte_range(range_header, report.size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{report.size}"})
+    
+    if byte_range is None:
+        start, end, status_code = 0, report.size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{report.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        iter_file_range(report.path, start, end),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers
+    )
+
+
 @app.post("/webhook/sheet-row", response_model=WebhookResponse)
 async def webhook_sheet_row(
     request: AuditRequest,
-    background_tasks: BackgroundTasks
+    raw_request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    priority: Optional[str] = Header(None, alias="X-Priority"),
+    source_id: Optional[str] = Header(None, alias="X-Source-Id")
 ):
     """
     Webhook endpoint triggered by Google Sheets.
     Receives company data and initiates audit report generation.
+    
+    Identical payloads within DEDUP_WINDOW_SECONDS, or repeats of the same
+    Idempotency-Key header, return the original request_id without starting
+    another audit.
+    
+    The audit is queued in the interactive lane unless X-Priority: bulk is
+    sent; X-Source-Id (e.g. the sheet ID) groups jobs for fair queuing.
+    Returns 429 or 503 with Retry-After when admission control sheds load
+    (duplicates are answered first and never shed).
     """
+    lane = _job_lane(priority, LANE_INTERACTIVE)
     try:
-        # Generate unique request ID
-        request_id = f"audit_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
-        
-        logger.info(f"[{request_id}] Received audit request for {request.company_name}")
+        # Generate unique, sortable request ID
+        request_id = new_job_id()
         
         # Convert Pydantic model to dict for processing
         request_data = request.dict()
         
-        # Add background task for processing
-        background_tasks.add_task(process_audit_request, request_data, request_id)
+        existing_id = idempotency_store.register(request_data, request_id, idempotency_key)
+        if existing_id is not None:
+            metrics.DEDUP_HITS.inc()
+            logger.info("Duplicate submission for %s ignored", request.company_name, extra={"request_id": existing_id})
+            return {
+                "status": "duplicate",
+                "message": f"Audit request for {request.company_name} is already being processed",
+                "request_id": existing_id,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        
+        logger.info("Received audit request for %s (%s lane)", request.company_name, lane, extra={"request_id": request_id})
+        try:
+            # Only new work is subject to admission; a duplicate always gets its request_id back
+            _admit()
+            job_queue.enqueue(request_data, request_id, lane=lane, source=_job_source(request_data, source_id))
+        except Exception:
+            # Not queued (shed or failed): a retry of this submission must not be reported as a duplicate
+            idempotency_store.release(request_data, request_id, idempotency_key)
+            raise
+        _record_receive_spans(raw_request, [request_id], lane)
+        if RUN_JOB_WORKER:
+            job_tracker.create(request_id, lane=lane)
+            job_worker.notify()
         
         return {
             "status": "accepted",
@@ -202,15 +598,104 @@ async def webhook_sheet_row(
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        logger.error(f"Error in webhook handler: {str(e)}", exc_info=True)
+        logger.error("Error in webhook handler: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/webhook/sheet-rows", response_model=BatchWebhookResponse)
+async def webhook_sheet_rows(request: Request):
+    """
+    Batch webhook: many sheet rows in one request.
+    Body is a JSON array of audit requests, or NDJSON (Content-Type:
+    application/x-ndjson). Every row is validated independently; all valid
+    rows are queued in a single transaction and get their own job ID.
+    Admission control applies to the batch as a whole. Rows go to the bulk
+    lane unless X-Priority says otherwise.
+    """
+    lane = _job_lane(request.headers.get("x-priority"), LANE_BULK)
+    source_id = request.headers.get("x-source-id")
+    rows = _parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if not rows:
+        raise HTTPException(status_code=400, detail="No rows in request")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many rows ({len(rows)} > {MAX_BATCH_ROWS})")
+    
+    results = []
+    valid = []
+    for index, row in enumerate(rows):
+        audit_request, errors = _validate_row(row)
+        if errors:
+            results.append(RowResult(index=index, status="invalid", errors=errors))
+        else:
+            valid.append((index, audit_request.dict()))
+    
+    if valid:
+        _admit(len(valid))
+    job_ids = job_queue.enqueue_many(
+        [payload for _, payload in valid],
+        lane=lane,
+        sources=[_job_source(payload, source_id) for _, payload in valid]
+    ) if valid else []
+    _record_receive_spans(request, job_ids, lane)
+    if RUN_JOB_WORKER:
+        for job_id in job_ids:
+            job_tracker.create(job_id, lane=lane)
+    results.extend(
+        RowResult(index=index, status="queued", job_id=job_id)
+        for (index, _), job_id in zip(valid, job_ids)
+    )
+    results.sort(key=lambda result: result.index)
+    if job_ids and RUN_JOB_WORKER:
+        job_worker.notify()
+    
+    logger.info("Batch webhook: %d row(s) queued, %d rejected", len(job_ids), len(rows) - len(job_ids))
+    
+    body = {
+        "status": "accepted" if len(job_ids) == len(rows) else ("partial" if job_ids else "rejected"),
+        "accepted": len(job_ids),
+        "rejected": len(rows) - len(job_ids),
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if not job_ids:
+        return JSONResponse(status_code=422, content=BatchWebhookResponse(**body).dict())
+    return body
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start background workers (queued audit jobs, outbox retries) unless they run separately"""
+    job_events.bind(asyncio.get_running_loop())
+    loop_monitor.start()
+    _add_readiness_probes()
+    readiness.start()
+    if RUN_JOB_WORKER:
+        await audit_worker.start()
+    else:
+        logger.info("RUN_JOB_WORKER=false: audits are processed by separate audit_worker processes")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and release pooled connections"""
+    readiness.set_draining()
+    if RUN_JOB_WORKER:
+        await audit_worker.stop()
+    await readiness.stop()
+    await loop_monitor.stop()
+    metrics.mark_process_dead()
+    tracing.flush()
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={
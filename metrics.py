@@ -0,0 +1,94 @@
+"""
+Prometheus Metrics
+Latency histograms, counters and in-flight gauges of the audit pipeline, served at /metrics
+"""
+
+import os
+import logging
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# prometheus_client switches to file-backed values (one mmap file per process)
+# when this is set before it is imported; /metrics then sums every process
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+WEBHOOK_LATENCY = Histogram(
+    "audit_webhook_request_seconds",
+    "Time to validate and accept a webhook request",
+    ["endpoint"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+QUEUE_WAIT = Histogram(
+    "audit_queue_wait_seconds",
+    "Time from acceptance until a worker starts the audit",
+    ["lane"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+LLM_CALL_LATENCY = Histogram(
+    "audit_llm_call_seconds",
+    "Latency of one Azure OpenAI call",
+    ["attempt", "outcome"],
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+)
+RENDER_LATENCY = Histogram(
+    "audit_render_seconds",
+    "PDF render time (charts + layout)",
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 60.0)
+)
+SMTP_SEND_LATENCY = Histogram(
+    "audit_smtp_send_seconds",
+    "SMTP send time; connection is reused (pooled session) or fresh (connect + TLS + login)",
+    ["connection"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+LOOP_LAG = Histogram(
+    "audit_event_loop_lag_seconds",
+    "How late the event loop ran a timer (time held by other callbacks)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+LLM_RETRIES = Counter("audit_llm_retries_total", "LLM calls retried after a failed attempt")
+LLM_FALLBACKS = Counter("audit_llm_fallbacks_total", "Analyses replaced by the generic fallback response")
+LLM_PARSE_FAILURES = Counter("audit_llm_parse_failures_total", "LLM responses that failed JSON/schema validation")
+LLM_TOKENS = Counter("audit_llm_tokens_total", "Tokens used by LLM calls", ["kind"])
+DEDUP_HITS = Counter("audit_dedup_hits_total", "Webhook submissions answered from the dedup store")
+ADMISSION_REJECTIONS = Counter("audit_admission_rejections_total", "Requests shed by admission control", ["reason"])
+LOOP_STALLS = Counter("audit_event_loop_stalls_total", "Event loop blocked past LOOP_BLOCK_THRESHOLD_SECONDS")
+JOBS_FINISHED = Counter("audit_jobs_finished_total", "Audits finished", ["lane", "outcome"])
+
+JOBS_IN_FLIGHT = Gauge(
+    "audit_jobs_in_flight", "Audits being processed", multiprocess_mode="livesum"
+)
+RENDERS_IN_FLIGHT = Gauge(
+    "audit_renders_in_flight", "PDF renders in progress", multiprocess_mode="livesum"
+)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    Exposition of all metrics.
+
+    In multiprocess mode the values of every process sharing
+    PROMETHEUS_MULTIPROC_DIR (uvicorn workers, audit_worker processes) are
+    aggregated; otherwise this process's registry is returned.
+
+    Returns:
+        (body, content type)
+    """
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this process's live gauges from the shared metrics (call at shutdown)"""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(os.getpid())
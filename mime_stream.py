@@ -0,0 +1,95 @@
+"""
+Streaming MIME Attachments
+Base64-encodes attachments window by window while SMTP DATA is being written
+"""
+
+import os
+import re
+import mmap
+import binascii
+from typing import Iterable, Iterator, Optional, Union
+
+# 57 raw bytes encode to one 76 character base64 line
+_LINE_BYTES = 57
+_LEADING_DOT = re.compile(rb"(?m)^\.")
+
+BufferLike = Union[bytes, bytearray, memoryview]
+
+
+class Base64Attachment:
+    """
+    Attachment body encoded lazily from a file (memory-mapped) or a buffer.
+
+    Only one window of raw bytes plus its encoded form is held at a time,
+    whatever the attachment size.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        data: Optional[BufferLike] = None,
+        window_lines: int = 1024
+    ):
+        """
+        Initialize the attachment source. Files are opened on iteration, so
+        the same message can be sent again (e.g. on retry).
+
+        Args:
+            path: File to attach
+            data: In-memory buffer to attach (used when path is None)
+            window_lines: Base64 lines encoded per chunk (57 raw bytes each)
+        """
+        if (path is None) == (data is None):
+            raise ValueError("Exactly one of path or data is required")
+        self.path = path
+        self.data = data
+        self.window = _LINE_BYTES * window_lines
+
+    @property
+    def size(self) -> int:
+        """Raw (unencoded) size in bytes"""
+        if self.path is not None:
+            return os.path.getsize(self.path)
+        return len(self.data)
+
+    @property
+    def encoded_size(self) -> int:
+        """Size on the wire: base64 with a CRLF after every 76 characters"""
+        size = self.size
+        lines = -(-size // _LINE_BYTES)
+        return 4 * -(-size // 3) + 2 * lines
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Yield base64 lines (CRLF terminated) one window at a time"""
+        if self.data is not None:
+            yield from self._encode(memoryview(self.data))
+            return
+
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield from self._encode(view)
+                finally:
+                    view.release()
+
+    def _encode(self, view: memoryview) -> Iterator[bytes]:
+        for offset in range(0, len(view), self.window):
+            window = view[offset:offset + self.window]
+            yield b"".join(
+                binascii.b2a_base64(window[i:i + _LINE_BYTES], newline=False) + b"\r\n"
+                for i in range(0, len(window), _LINE_BYTES)
+            )
+
+
+def iter_data_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Dot-stuff message chunks for SMTP DATA.
+
+    Every chunk must start at a line boundary and end with CRLF (true for
+    PreparedMessage chunks), so stuffing can be applied chunk by chunk.
+    """
+    for chunk in chunks:
+        yield _LEADING_DOT.sub(b"..", chunk)
@@ -4,12 +4,14 @@ Generates comprehensive AI audit reports with charts using ReportLab and Matplot
 """
 
 import os
+import time
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
+# Figures are created without pyplot so concurrent renders share no global state
+from matplotlib.figure import Figure
 import numpy as np
 from io import BytesIO
 
@@ -19,13 +21,34 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, Image, KeepTogether
+    PageBreak, Image, KeepTogether, Flowable
 )
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.pdfgen import canvas
 
+import tracing
+
 logger = logging.getLogger(__name__)
 
+# Called with (section number, total sections) while the PDF is laid out
+ProgressCallback = Callable[[int, int], None]
+
+
+class _ProgressMarker(Flowable):
+    """Zero-size flowable that reports progress when the layout reaches it"""
+    
+    def __init__(self, callback: ProgressCallback, index: int, total: int):
+        super().__init__()
+        self.callback = callback
+        self.index = index
+        self.total = total
+    
+    def wrap(self, available_width, available_height):
+        return 0, 0
+    
+    def draw(self):
+        self.callback(self.index, self.total)
+
 
 class PDFBuilder:
     """Builds PDF reports with visualizations for AI audits"""
@@ -90,11 +113,31 @@ class PDFBuilder:
             fontName='Helvetica'
         ))
     
+    def warm_up(self):
+        """
+        Pay the one-time costs of the first report up front: Matplotlib
+        resolves and loads its fonts (the font cache itself is built when
+        matplotlib is first imported) and the polar projection, and ReportLab
+        computes the font metrics of the custom styles.
+        """
+        started = time.perf_counter()
+        sections = [
+            {'section_name': 'Operations', 'level': 'Medium'},
+            {'section_name': 'Sales', 'level': 'High'},
+            {'section_name': 'Finance', 'level': 'Low'},
+        ]
+        self._create_maturity_bar_chart(sections)
+        self._create_risk_radar_chart(sections)
+        for name in ('CustomTitle', 'CustomSubtitle', 'CustomSectionHeader', 'CustomBodyText'):
+            Paragraph("Warm-up", self.styles[name]).wrap(6 * inch, 2 * inch)
+        logger.info("PDF builder warmed up in %.2fs", time.perf_counter() - started)
+    
     def create_report(
         self,
         company_data: Dict[str, Any],
         llm_analysis: Dict[str, Any],
-        request_id: str
+        request_id: str,
+        progress: Optional[ProgressCallback] = None
     ) -> str:
         """
         Create complete PDF report.
@@ -103,28 +146,30 @@ class PDFBuilder:
             company_data: Company information from webhook
             llm_analysis: Analysis generated by LLM
             request_id: Unique identifier for this request
+            progress: Optional callback invoked as each department section is rendered
             
         Returns:
             Path to generated PDF file
         """
         try:
             company_name = company_data.get('company_name', 'Unknown')
-            logger.info(f"[{request_id}] Creating PDF for: {company_name}")
+            logger.info("Creating PDF for: %s", company_name)
             
             # Log what we're working with
             summary = llm_analysis.get('summary', {})
-            logger.info(f"[{request_id}] PDF data - Company: {company_name}")
-            logger.info(f"[{request_id}] PDF data - Industry: {company_data.get('industry')}")
-            logger.info(f"[{request_id}] PDF data - Summary chars: {len(summary.get('personalized_summary', ''))}")
-            logger.info(f"[{request_id}] PDF data - Sections: {len(llm_analysis.get('sections', []))}")
+            logger.info("PDF data - Company: %s", company_name)
+            logger.info("PDF data - Industry: %s", company_data.get('industry'))
+            logger.info("PDF data - Summary chars: %s", len(summary.get('personalized_summary', '')))
+            logger.info("PDF data - Sections: %s", len(llm_analysis.get('sections', [])))
             
             # Generate filename
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
             company_name_safe = company_name.replace(' ', '_').replace('/', '_')[:30]
-            filename = f"AI_Audit_{company_name_safe}_{timestamp}.pdf"
+            # Request ID keeps same-company reports rendered in the same second apart
+            filename = f"AI_Audit_{company_name_safe}_{timestamp}_{request_id}.pdf"
             filepath = os.path.join(self.output_dir, filename)
             
-            logger.info(f"[{request_id}] PDF filename: {filename}")
+            logger.info("PDF filename: %s", filename)
             
             # Create document
             doc = SimpleDocTemplate(
@@ -152,20 +197,22 @@ class PDFBuilder:
             story.append(PageBreak())
             
             # Detailed analysis
-            story.extend(self._create_detailed_analysis(llm_analysis))
+            story.extend(self._create_detailed_analysis(llm_analysis, progress))
             
             # Footer
             story.append(PageBreak())
             story.extend(self._create_footer())
             
             # Build PDF
-            doc.build(story, onFirstPage=self._add_page_number, onLaterPages=self._add_page_number)
+            with tracing.span("pdf.build", request_id=request_id, flowables=len(story)) as build_span:
+                doc.build(story, onFirstPage=self._add_page_number, onLaterPages=self._add_page_number)
+                build_span.set(pdf_bytes=os.path.getsize(filepath))
             
-            logger.info(f"PDF report generated successfully: {filepath}")
+            logger.info("PDF report generated successfully: %s", filepath)
             return filepath
             
         except Exception as e:
-            logger.error(f"Error creating PDF report: {str(e)}", exc_info=True)
+            logger.error("Error creating PDF report: %s", e, exc_info=True)
             raise
     
     def _create_cover_page(self, company_data: Dict[str, Any]) -> List:
@@ -284,21 +331,23 @@ class PDFBuilder:
             return content
         
         # Generate bar chart
-        bar_chart_path = self._create_maturity_bar_chart(sections)
-        if bar_chart_path:
-            img = Image(bar_chart_path, width=6*inch, height=3.5*inch)
+        with tracing.span("pdf.chart", chart="maturity_bar"):
+            bar_chart = self._create_maturity_bar_chart(sections)
+        if bar_chart:
+            img = Image(bar_chart, width=6*inch, height=3.5*inch)
             content.append(img)
             content.append(Spacer(1, 0.3*inch))
         
         # Generate radar chart
-        radar_chart_path = self._create_risk_radar_chart(sections)
-        if radar_chart_path:
-            img = Image(radar_chart_path, width=5*inch, height=5*inch)
+        with tracing.span("pdf.chart", chart="risk_radar"):
+            radar_chart = self._create_risk_radar_chart(sections)
+        if radar_chart:
+            img = Image(radar_chart, width=5*inch, height=5*inch)
             content.append(img)
         
         return content
     
-    def _create_maturity_bar_chart(self, sections: List[Dict]) -> str:
+    def _create_maturity_bar_chart(self, sections: List[Dict]) -> Optional[BytesIO]:
         """
         Create bar chart showing AI maturity by department.
         
@@ -306,7 +355,7 @@ class PDFBuilder:
             sections: List of department sections from LLM analysis
             
         Returns:
-            Path to generated chart image
+            PNG image of the chart
         """
         try:
             # Extract data
@@ -326,7 +375,8 @@ class PDFBuilder:
                 colors_list.append(color_mapping.get(level, '#95a5a6'))
             
             # Create figure
-            fig, ax = plt.subplots(figsize=(10, 6))
+            fig = Figure(figsize=(10, 6))
+            ax = fig.subplots()
             
             y_pos = np.arange(len(departments))
             bars = ax.barh(y_pos, maturity_scores, color=colors_list, edgecolor='black', linewidth=1.2)
@@ -348,20 +398,20 @@ class PDFBuilder:
             ax.grid(axis='x', alpha=0.3, linestyle='--')
             ax.set_axisbelow(True)
             
-            plt.tight_layout()
+            fig.tight_layout()
             
-            # Save to file
-            chart_path = os.path.join(self.output_dir, 'maturity_bar_chart.png')
-            plt.savefig(chart_path, dpi=150, bbox_inches='tight', facecolor='white')
-            plt.close()
+            # Render in memory (no shared chart files between concurrent reports)
+            chart = BytesIO()
+            fig.savefig(chart, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+            chart.seek(0)
             
-            return chart_path
+            return chart
             
         except Exception as e:
-            logger.error(f"Error creating bar chart: {str(e)}")
+            logger.error("Error creating bar chart: %s", e)
             return None
     
-    def _create_risk_radar_chart(self, sections: List[Dict]) -> str:
+    def _create_risk_radar_chart(self, sections: List[Dict]) -> Optional[BytesIO]:
         """
         Create radar chart showing department risk distribution.
         
@@ -369,7 +419,7 @@ class PDFBuilder:
             sections: List of department sections from LLM analysis
             
         Returns:
-            Path to generated chart image
+            PNG image of the chart
         """
         try:
             # Extract data
@@ -400,7 +450,8 @@ class PDFBuilder:
             angles += angles[:1]
             
             # Create figure
-            fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(projection='polar'))
+            fig = Figure(figsize=(8, 8))
+            ax = fig.add_subplot(projection='polar')
             
             # Plot data
             ax.plot(angles, risk_scores_plot, 'o-', linewidth=2, color='#e74c3c', label='Risk Level')
@@ -426,20 +477,24 @@ class PDFBuilder:
             # Grid styling
             ax.grid(True, linestyle='--', alpha=0.7)
             
-            plt.tight_layout()
+            fig.tight_layout()
             
-            # Save to file
-            chart_path = os.path.join(self.output_dir, 'risk_radar_chart.png')
-            plt.savefig(chart_path, dpi=150, bbox_inches='tight', facecolor='white')
-            plt.close()
+            # Render in memory (no shared chart files between concurrent reports)
+            chart = BytesIO()
+            fig.savefig(chart, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+            chart.seek(0)
             
-            return chart_path
+            return chart
             
         except Exception as e:
-            logger.error(f"Error creating radar chart: {str(e)}")
+            logger.error("Error creating radar chart: %s", e)
             return None
     
-    def _create_detailed_analysis(self, llm_analysis: Dict[str, Any]) -> List:
+    def _create_detailed_analysis(
+        self,
+        llm_analysis: Dict[str, Any],
+        progress: Optional[ProgressCallback] = None
+    ) -> List:
         """Create detailed department-wise analysis"""
         content = []
         
@@ -457,11 +512,14 @@ class PDFBuilder:
         
         sections = llm_analysis.get('sections', [])
         
-        for section in sections:
+        for index, section in enumerate(sections, 1):
             dept_name = section.get('section_name', 'Unknown Department')
             level = section.get('level', 'N/A')
             drawbacks = section.get('drawbacks', [])
             
+            if progress is not None:
+                content.append(_ProgressMarker(progress, index, len(sections)))
+            
             # Department header
             content.append(Paragraph(
                 f"{dept_name} (Maturity: {level})",
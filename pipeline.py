@@ -0,0 +1,194 @@
+"""
+Staged Pipeline
+Audit processing split into stages (LLM, render, mail) with their own workers, linked by bounded queues
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Processes one item in place; raising fails the item
+StageHandler = Callable[[Any], Awaitable[None]]
+
+_UTILIZATION_WINDOW = 60.0
+
+
+class Stage:
+    """
+    One pipeline stage: an input queue and a fixed number of workers.
+
+    The queue is bounded, so when this stage falls behind, upstream workers
+    block handing items over instead of piling work up in memory.
+    """
+
+    def __init__(self, name: str, handler: StageHandler, workers: int, queue_size: int):
+        """
+        Initialize the stage.
+
+        Args:
+            name: Stage name (used in stats)
+            handler: Coroutine processing one item
+            workers: Items processed at the same time
+            queue_size: Items that may wait for a free worker
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.queue: "asyncio.Queue[Tuple[Any, asyncio.Future]]" = asyncio.Queue(maxsize=self.queue_size)
+        self.next: Optional["Stage"] = None
+        self.processed = 0
+        self.failed = 0
+        self._busy_seconds = 0.0
+        self._active: Dict[int, float] = {}
+        # Handler task per item being processed, keyed by the item's future
+        self._handlers: Dict[asyncio.Future, asyncio.Task] = {}
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if not self._tasks:
+            self._samples.append((time.monotonic(), self._busy_seconds))
+            self._tasks = [asyncio.create_task(self._run(index)) for index in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, busy workers and utilization over the last minute"""
+        now = time.monotonic()
+        busy_total = self._busy_seconds + sum(now - started for started in self._active.values())
+        while len(self._samples) > 1 and self._samples[1][0] <= now - _UTILIZATION_WINDOW:
+            self._samples.popleft()
+        if not self._samples or now - self._samples[-1][0] >= 1.0:
+            self._samples.append((now, busy_total))
+        since, busy_since = self._samples[0]
+        elapsed = now - since
+        utilization = (busy_total - busy_since) / (self.workers * elapsed) if elapsed > 0 else 0.0
+        return {
+            "workers": self.workers,
+            "busy": len(self._active),
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue_size,
+            "processed": self.processed,
+            "failed": self.failed,
+            "utilization": round(min(1.0, utilization), 3),
+        }
+
+    async def _run(self, index: int):
+        while True:
+            item, future = await self.queue.get()
+            if future.done():
+                # Caller gave up (e.g. shutdown); drop the item
+                continue
+
+            self._active[index] = time.monotonic()
+            # Own task per item, so the caller can stop this item's handler alone
+            handler = asyncio.ensure_future(self.handler(item))
+            self._handlers[future] = handler
+            try:
+                await handler
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    # This worker is being stopped (awaiting cancelled the handler too)
+                    future.cancel()
+                    raise
+                # Only the handler was cancelled: its caller gave up; drop the item
+                continue
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            finally:
+                del self._handlers[future]
+                self._busy_seconds += time.monotonic() - self._active.pop(index)
+
+            self.processed += 1
+            if self.next is None:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                # Blocks while the next stage is full: backpressure flows upstream
+                try:
+                    await self.next.queue.put((item, future))
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+
+
+class Pipeline:
+    """
+    Chain of stages. An item enters the first stage's queue and completes
+    when the last stage has processed it; the first failing stage ends it.
+
+    A slow stage (say, an SMTP server taking 30s per message) only ties up
+    that stage's workers, while the other stages keep working on other items
+    until the queues between them fill up.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        for stage, following in zip(stages, stages[1:]):
+            stage.next = following
+
+    @property
+    def capacity(self) -> int:
+        """Items the pipeline can hold (being processed or queued)"""
+        return sum(stage.workers + stage.queue_size for stage in self.stages)
+
+    async def run(self, item: Any, start: Optional[str] = None):
+        """
+        Push an item through every stage.
+
+        Waits while the first stage's queue is full. If the caller is
+        cancelled, the handler processing the item is cancelled too, and
+        this returns (raising CancelledError) only once it has stopped, so
+        the caller can safely hand the work to someone else.
+
+        Args:
+            item: Item to process
+            start: Name of the stage to begin with (earlier stages already
+                ran, e.g. before a worker restart); defaults to the first
+
+        Raises:
+            Exception: Whatever the failing stage raised
+        """
+        first = self.stages[0] if start is None else next(stage for stage in self.stages if stage.name == start)
+        future = asyncio.get_running_loop().create_future()
+        await first.queue.put((item, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            future.cancel()
+            for stage in self.stages:
+                handler = stage._handlers.get(future)
+                if handler is not None:
+                    handler.cancel()
+                    await asyncio.wait([handler])
+            raise
+
+    def start(self):
+        """Start every stage's workers on the running event loop"""
+        for stage in self.stages:
+            stage.start()
+
+    async def stop(self):
+        """Cancel the workers; items still in flight are failed with CancelledError"""
+        for stage in self.stages:
+            await stage.stop()
+        for stage in self.stages:
+            while not stage.queue.empty():
+                _, future = stage.queue.get_nowait()
+                future.cancel()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage stats"""
+        return {stage.name: stage.get_stats() for stage in self.stages}
@@ -0,0 +1,173 @@
+"""
+Readiness Probes
+Dependency checks (LLM, SMTP, queue, disk, render pool) refreshed in the background and served from cache by /ready
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A check returns (ok, details) or raises; an exception counts as a failure
+ProbeCheck = Callable[[], Awaitable[Tuple[bool, Dict[str, Any]]]]
+
+
+@dataclass
+class Probe:
+    """One dependency check and its last result"""
+    name: str
+    check: ProbeCheck
+    interval: float
+    # Non-critical probes are reported but do not make the instance unready
+    critical: bool = True
+    ok: Optional[bool] = None
+    details: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    checked_at: Optional[float] = None
+    latency_ms: Optional[float] = None
+
+
+class ReadinessMonitor:
+    """
+    Runs each probe on its own interval in a background task and keeps the
+    last result. /ready only reads these results, so a load balancer polling
+    it never triggers an SMTP login or an LLM call. A result older than
+    three intervals (probe stuck or not run) counts as failed.
+    """
+
+    def __init__(self, interval: float = 30.0, remote_interval: float = 300.0, timeout: float = 10.0):
+        """
+        Initialize the monitor.
+
+        Args:
+            interval: Default seconds between runs of local probes (queue, disk, render pool)
+            remote_interval: Default seconds between runs of probes calling external services (LLM, SMTP)
+            timeout: Seconds a probe may take before it counts as failed
+        """
+        self.interval = interval
+        self.remote_interval = remote_interval
+        self.timeout = timeout
+        self._probes: Dict[str, Probe] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._draining = False
+
+    @classmethod
+    def from_env(cls) -> "ReadinessMonitor":
+        """Build a monitor configured from READY_PROBE_* environment variables"""
+        return cls(
+            interval=float(os.getenv("READY_PROBE_INTERVAL_SECONDS", "30")),
+            remote_interval=float(os.getenv("READY_REMOTE_PROBE_INTERVAL_SECONDS", "300")),
+            timeout=float(os.getenv("READY_PROBE_TIMEOUT_SECONDS", "10"))
+        )
+
+    def add(self, name: str, check: ProbeCheck, remote: bool = False, critical: bool = True):
+        """
+        Register a probe (before start).
+
+        Args:
+            name: Key in the /ready response
+            check: Coroutine function returning (ok, details)
+            remote: Calls an external service; runs on the longer interval
+            critical: A failure makes the instance unready
+        """
+        interval = self.remote_interval if remote else self.interval
+        self._probes[name] = Probe(name=name, check=check, interval=interval, critical=critical)
+
+    def start(self):
+        """Start the probe loops on the running event loop (each probe runs once right away)"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._run(probe)) for probe in self._probes.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def set_draining(self):
+        """Report unready from now on (the instance is shutting down)"""
+        self._draining = True
+
+    def get_status(self) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Cached readiness.
+
+        Returns:
+            (ready, body): ready is False while draining, or when a critical
+            probe failed, is stale or has not completed yet
+        """
+        now = time.time()
+        checks = {}
+        ready = not self._draining
+        for probe in self._probes.values():
+            stale = probe.checked_at is not None and now - probe.checked_at > 3 * probe.interval
+            ok = bool(probe.ok) and not stale
+            if probe.critical and not ok:
+                ready = False
+            entry: Dict[str, Any] = {
+                "ok": ok,
+                "critical": probe.critical,
+                "checked_at": datetime.utcfromtimestamp(probe.checked_at).isoformat() if probe.checked_at else None,
+                "latency_ms": probe.latency_ms,
+                **probe.details,
+            }
+            if probe.ok is None:
+                entry["error"] = "not checked yet"
+            elif stale:
+                entry["error"] = "result is stale"
+            elif probe.error:
+                entry["error"] = probe.error
+            checks[probe.name] = entry
+        body = {
+            "status": "draining" if self._draining else ("ready" if ready else "not_ready"),
+            "timestamp": datetime.utcnow().isoformat(),
+            "checks": checks,
+        }
+        return ready, body
+
+    async def _run(self, probe: Probe):
+        while True:
+            started = time.perf_counter()
+            try:
+                ok, details = await asyncio.wait_for(probe.check(), timeout=self.timeout)
+                error = None if ok else details.pop("error", None)
+            except asyncio.TimeoutError:
+                ok, details, error = False, {}, f"timed out after {self.timeout:g}s"
+            except Exception as e:
+                ok, details, error = False, {}, f"{type(e).__name__}: {str(e)}"
+
+            if ok != probe.ok:
+                if ok:
+                    logger.info("Readiness probe %s passed", probe.name)
+                else:
+                    logger.warning("Readiness probe %s failed: %s", probe.name, error)
+            probe.ok = ok
+            probe.details = details
+            probe.error = error
+            probe.checked_at = time.time()
+            probe.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            await asyncio.sleep(probe.interval)
+
+
+def disk_probe(paths: List[str], min_free_mb: float) -> ProbeCheck:
+    """Probe that fails when a filesystem holding one of `paths` has less than min_free_mb free"""
+    async def check() -> Tuple[bool, Dict[str, Any]]:
+        free_mb = {}
+        for path in paths:
+            # The path itself may not exist yet; check the nearest existing parent
+            while path and not os.path.exists(path):
+                path = os.path.dirname(path)
+            free_mb[path or "/"] = round(shutil.disk_usage(path or "/").free / 1024 / 1024, 1)
+        details: Dict[str, Any] = {"free_mb": free_mb, "min_free_mb": min_free_mb}
+        low = [path for path, free in free_mb.items() if free < min_free_mb]
+        if low:
+            details["error"] = f"low disk space on {', '.join(low)}"
+        return not low, details
+    return check
@@ -0,0 +1,253 @@
+"""
+Render Pool
+Runs PDF rendering (Matplotlib + ReportLab, CPU-bound) in worker processes, off the event loop
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+import tracing
+import log_setup
+
+if TYPE_CHECKING:
+    # pdf_builder pulls in Matplotlib, NumPy and ReportLab; only render workers import it
+    from pdf_builder import PDFBuilder, ProgressCallback
+
+logger = logging.getLogger(__name__)
+
+# Per-process state of pool workers (set by _init_worker)
+_worker_builder: Optional["PDFBuilder"] = None
+_worker_progress = None
+
+
+def _init_worker(output_dir: str, progress_queue):
+    global _worker_builder, _worker_progress
+    from pdf_builder import PDFBuilder
+    log_setup.configure_logging()
+    # Pool workers skip atexit; multiprocessing finalizers do run on their exit
+    multiprocessing.util.Finalize(None, log_setup.shutdown_logging, exitpriority=10)
+    _worker_builder = PDFBuilder(output_dir=output_dir)
+    _worker_builder.warm_up()
+    _worker_progress = progress_queue
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def _render_in_worker(
+    company_data: Dict[str, Any],
+    llm_analysis: Dict[str, Any],
+    request_id: str,
+    trace_parent: Optional[tracing.SpanContext] = None
+) -> str:
+    try:
+        with tracing.attach(trace_parent), log_setup.bind_request_id(request_id):
+            return _worker_builder.create_report(
+                company_data=company_data,
+                llm_analysis=llm_analysis,
+                request_id=request_id,
+                progress=lambda index, total: _worker_progress.put((request_id, index, total))
+            )
+    finally:
+        # Pool workers exit without running atexit handlers
+        tracing.flush()
+
+
+def _worker_context():
+    """
+    Process start method for render workers.
+
+    Workers must not inherit the event loop, sockets or SQLite handles, so
+    they are not forked from the API process. forkserver (POSIX) forks them
+    from a clean server with pdf_builder (Matplotlib/ReportLab) and this
+    module preloaded, without re-running the application's __main__;
+    spawn is the fallback elsewhere.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["pdf_builder", __name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class RenderPool:
+    """
+    Renders reports in a pool of worker processes (one render per process at
+    a time), so renders run in parallel across cores and never block the
+    event loop. Section progress is sent back over a queue and delivered to
+    the caller's callback from a reader thread.
+
+    With processes=0 reports are rendered in a thread of this process instead.
+    """
+
+    def __init__(self, output_dir: str = "/tmp", processes: int = 2):
+        """
+        Initialize the pool (worker processes start on first use).
+
+        Args:
+            output_dir: Directory for generated PDFs
+            processes: Worker processes (0 renders in a thread instead)
+        """
+        self.output_dir = output_dir
+        self.processes = processes
+        self._callbacks: Dict[str, "ProgressCallback"] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._builder: Optional["PDFBuilder"] = None
+        self._progress_queue = None
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, output_dir: str) -> "RenderPool":
+        """Build a pool configured from RENDER_PROCESSES (defaults to the CPU count)"""
+        return cls(
+            output_dir=output_dir,
+            processes=int(os.getenv("RENDER_PROCESSES", str(os.cpu_count() or 2)))
+        )
+
+    async def render(
+        self,
+        company_data: Dict[str, Any],
+        llm_analysis: Dict[str, Any],
+        request_id: str,
+        progress: Optional["ProgressCallback"] = None
+    ) -> str:
+        """
+        Render a report.
+
+        Args:
+            company_data: Company information from webhook
+            llm_analysis: Analysis generated by LLM
+            request_id: Unique identifier for this request
+            progress: Optional callback invoked (from another thread) per rendered section
+
+        Returns:
+            Path to the generated PDF file
+        """
+        if self.processes <= 0:
+            builder = await asyncio.to_thread(self._get_builder)
+            return await asyncio.to_thread(
+                builder.create_report, company_data, llm_analysis, request_id, progress
+            )
+
+        if progress is not None:
+            self._callbacks[request_id] = progress
+        try:
+            executor = self._get_executor()
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, _render_in_worker, company_data, llm_analysis, request_id, tracing.current()
+            )
+        except BrokenProcessPool:
+            logger.error("Render worker process died; restarting the pool", extra={"request_id": request_id})
+            self._reset_executor()
+            raise
+        finally:
+            self._callbacks.pop(request_id, None)
+
+    async def warm_up(self):
+        """
+        Start the worker processes now instead of on the first render, so
+        their imports, font cache and stylesheet (see PDFBuilder.warm_up)
+        are ready before the first audit. With processes=0 the in-process
+        builder is warmed up in a thread.
+        """
+        if self.processes <= 0:
+            await asyncio.to_thread(self._get_builder)
+        else:
+            # Starting processes (and the forkserver) blocks; keep it off the loop
+            await asyncio.to_thread(self._start_workers)
+
+    async def call_in_worker(self, fn: Callable[..., Any], *args: Any) -> Optional[Any]:
+        """
+        Run a module-level function in one of the worker processes (whichever
+        is free next), e.g. to inspect its memory. Returns None with processes=0.
+        """
+        if self.processes <= 0:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Worker process state (started lazily; broken after a worker died until the next render)"""
+        with self._lock:
+            executor = self._executor
+        if self.processes <= 0:
+            return {"processes": 0, "mode": "thread", "started": self._builder is not None, "broken": False}
+        return {
+            "processes": self.processes,
+            "mode": "process",
+            "started": executor is not None,
+            "alive": sum(1 for process in list((executor._processes or {}).values()) if process.is_alive()) if executor else 0,
+            "broken": bool(executor._broken) if executor else False,
+        }
+
+    def close(self):
+        """Stop the worker processes and the progress reader"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+            if self._progress_queue is not None:
+                self._progress_queue.put(None)
+                self._reader.join(timeout=5)
+                self._progress_queue = None
+                self._reader = None
+
+    def _start_workers(self):
+        executor = self._get_executor()
+        # One call per worker; the executor starts a process for each while none is idle
+        for future in [executor.submit(_worker_pid) for _ in range(self.processes)]:
+            future.result()
+
+    def _get_builder(self) -> "PDFBuilder":
+        with self._lock:
+            if self._builder is None:
+                from pdf_builder import PDFBuilder
+                self._builder = PDFBuilder(output_dir=self.output_dir)
+                self._builder.warm_up()
+            return self._builder
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                context = _worker_context()
+                if self._progress_queue is None:
+                    self._progress_queue = context.SimpleQueue()
+                    self._reader = threading.Thread(
+                        target=self._read_progress, args=(self._progress_queue,),
+                        name="render-progress", daemon=True
+                    )
+                    self._reader.start()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.output_dir, self._progress_queue)
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _read_progress(self, progress_queue):
+        while True:
+            message = progress_queue.get()
+            if message is None:
+                return
+            request_id, index, total = message
+            callback = self._callbacks.get(request_id)
+            if callback is not None:
+                try:
+                    callback(index, total)
+                except Exception as e:
+                    logger.warning("Progress callback failed: %s", e, extra={"request_id": request_id})
@@ -0,0 +1,262 @@
+"""
+Report Store
+Keeps generated PDFs on local disk and issues signed, expiring download links
+"""
+
+import os
+import re
+import hmac
+import time
+import base64
+import shutil
+import hashlib
+import logging
+import secrets
+import threading
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+import state_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_STORE_DIR = "/tmp/ai_audit_reports/reports"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_store (
+    id TEXT PRIMARY KEY,
+    request_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_report_store_expires ON report_store (expires_at);
+"""
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+_SIGNATURE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+# Values shipped in examples; links signed with them could be forged by anyone
+_PLACEHOLDER_SECRETS = {"change_me", "changeme", "secret"}
+
+
+class RangeNotSatisfiable(ValueError):
+    """Range header does not overlap the file"""
+
+
+@dataclass
+class StoredReport:
+    """A report PDF served from the store"""
+    id: str
+    request_id: str
+    filename: str
+    path: str
+    size: int
+    etag: str
+    created_at: float
+    expires_at: float
+
+
+class ReportStore:
+    """
+    Local report storage shared through the state database.
+
+    Each report gets an unguessable ID; download links carry an HMAC over
+    (id, expiry) so they can be verified without a lookup. Files are kept
+    until their link expires and are purged when new reports are added.
+    """
+
+    def __init__(
+        self,
+        store_dir: str = DEFAULT_REPORT_STORE_DIR,
+        secret: Optional[str] = None,
+        link_ttl_seconds: float = 7 * 86400,
+        base_url: str = "http://localhost:8000",
+        db_path: Optional[str] = None
+    ):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            store_dir: Directory holding the stored PDFs
+            secret: Link signing key (REPORT_LINK_SECRET); must be the same
+                in every process serving downloads and across restarts
+            link_ttl_seconds: Lifetime of a report and its download link
+            base_url: Public URL of this service, used to build links
+            db_path: State database file (defaults to STATE_DB_PATH)
+
+        Raises:
+            ValueError: If no secret is configured, or only the .env.example placeholder
+        """
+        if not secret:
+            raise ValueError("REPORT_LINK_SECRET is required when REPORT_DELIVERY_MODE=link")
+        if secret.strip().lower() in _PLACEHOLDER_SECRETS:
+            raise ValueError("REPORT_LINK_SECRET is still the example placeholder; generate one with: openssl rand -hex 32")
+
+        self.store_dir = store_dir
+        self.link_ttl_seconds = link_ttl_seconds
+        self.base_url = base_url.rstrip("/")
+        self._secret = secret.encode("utf-8")
+        self._lock = threading.Lock()
+        self._conn = state_db.connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        os.makedirs(store_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "ReportStore":
+        """Build a store configured from REPORT_* environment variables"""
+        return cls(
+            store_dir=os.getenv("REPORT_STORE_DIR", DEFAULT_REPORT_STORE_DIR),
+            secret=os.getenv("REPORT_LINK_SECRET"),
+            link_ttl_seconds=float(os.getenv("REPORT_LINK_TTL_HOURS", "168")) * 3600,
+            base_url=os.getenv("PUBLIC_BASE_URL", "http://localhost:8000")
+        )
+
+    def add(self, pdf_path: str, request_id: str, filename: str) -> StoredReport:
+        """
+        Move a generated PDF into the store.
+
+        Args:
+            pdf_path: Freshly generated PDF (moved, not copied)
+            request_id: Request that produced the report
+            filename: Download filename shown to the recipient
+
+        Returns:
+            The stored report
+        """
+        self.purge_expired()
+
+        report_id = secrets.token_urlsafe(16)
+        path = os.path.join(self.store_dir, f"{report_id}.pdf")
+        shutil.move(pdf_path, path)
+
+        # Reports are immutable, so a content hash is a stable strong ETag
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+
+        now = time.time()
+        report = StoredReport(
+            id=report_id,
+            request_id=request_id,
+            filename=filename,
+            path=path,
+            size=os.path.getsize(path),
+            etag=f'"{digest.hexdigest()[:32]}"',
+            created_at=now,
+            expires_at=now + self.link_ttl_seconds
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO report_store (id, request_id, filename, path, size, etag, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (report.id, report.request_id, report.filename, report.path, report.size,
+                 report.etag, report.created_at, report.expires_at)
+            )
+        logger.info("Report stored as %s (%s bytes)", report_id, report.size, extra={"request_id": request_id})
+        return report
+
+    def get(self, report_id: str) -> Optional[StoredReport]:
+        """Look up an unexpired report by ID"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM report_store WHERE id = ? AND expires_at > ?", (report_id, time.time())
+            ).fetchone()
+        return StoredReport(**dict(row)) if row else None
+
+    def find_by_path(self, path: str) -> Optional[StoredReport]:
+        """Look up the report stored at a file path (None if the path is not in the store)"""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.store_dir):
+            return None
+        report_id, _ = os.path.splitext(os.path.basename(path))
+        return self.get(report_id)
+
+    def signed_url(self, report: StoredReport) -> str:
+        """Download link valid until the report expires"""
+        expires = int(report.expires_at)
+        return f"{self.base_url}/reports/{report.id}?expires={expires}&sig={self._sign(report.id, expires)}"
+
+    def verify(self, report_id: str, expires: int, signature: str) -> bool:
+        """Check a link signature and that it has not expired"""
+        if expires < time.time():
+            return False
+        # Signatures are unpadded base64url; anything else (e.g. non-ASCII) is simply invalid
+        if not _SIGNATURE_PATTERN.match(signature):
+            return False
+        return hmac.compare_digest(self._sign(report_id, expires).encode("ascii"), signature.encode("ascii"))
+
+    def purge_expired(self) -> int:
+        """Delete expired reports and their files; returns the number removed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, path FROM report_store WHERE expires_at <= ?", (time.time(),)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM report_store WHERE id = ?", [(row["id"],) for row in rows])
+
+        for row in rows:
+            if os.path.exists(row["path"]):
+                os.remove(row["path"])
+        if rows:
+            logger.info("Purged %d expired report(s)", len(rows))
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _sign(self, report_id: str, expires: int) -> str:
+        mac = hmac.new(self._secret, f"{report_id}:{expires}".encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(mac).rstrip(b"=").decode("ascii")
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range` header.
+
+    Args:
+        header: Header value, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-500"
+        size: File size in bytes
+
+    Returns:
+        Inclusive (start, end) offsets, or None if the header is not a
+        single byte range (the full file should be served)
+
+    Raises:
+        RangeNotSatisfiable: If the range lies outside the file
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        # Syntactically invalid: ignore the header
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def iter_file_range(path: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yield bytes start..end (inclusive) of a file in chunks"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
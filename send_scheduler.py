@@ -0,0 +1,188 @@
+"""
+SMTP Send Scheduler
+Keeps outgoing mail within provider quotas (per-minute, per-day, per-recipient-domain)
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+import state_db
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60.0
+DAY = 86400.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mail_send_log (
+    sent_at REAL NOT NULL,
+    domain TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mail_send_log_sent_at ON mail_send_log (sent_at);
+CREATE INDEX IF NOT EXISTS idx_mail_send_log_domain ON mail_send_log (domain, sent_at);
+"""
+
+
+class SendDeferred(Exception):
+    """No send budget is available right now"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Send quota reached, next slot in {retry_after:.0f}s")
+
+
+class SendScheduler:
+    """
+    Sliding-window send budget shared through the state database.
+
+    Every reserved slot is logged to SQLite, so the budgets hold across
+    restarts and across processes sending from the same account. Windows are
+    rolling (last 60 seconds / last 24 hours), matching how Gmail counts.
+    A limit of 0 disables that check.
+    """
+
+    def __init__(
+        self,
+        per_minute: int = 20,
+        per_day: int = 450,
+        domain_min_interval: float = 2.0,
+        db_path: Optional[str] = None
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            per_minute: Maximum sends in any 60 second window
+            per_day: Maximum sends in any 24 hour window
+            domain_min_interval: Minimum seconds between sends to the same recipient domain
+            db_path: State database file (defaults to STATE_DB_PATH)
+        """
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.domain_min_interval = domain_min_interval
+        self._lock = threading.Lock()
+        self._conn = state_db.connect(db_path)
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "SendScheduler":
+        """Build a scheduler configured from SMTP_RATE_* environment variables"""
+        return cls(
+            per_minute=int(os.getenv("SMTP_RATE_LIMIT_PER_MINUTE", "20")),
+            per_day=int(os.getenv("SMTP_RATE_LIMIT_PER_DAY", "450")),
+            domain_min_interval=float(os.getenv("SMTP_DOMAIN_MIN_INTERVAL_SECONDS", "2"))
+        )
+
+    def reserve(self, recipient_email: str) -> float:
+        """
+        Reserve a send slot for a recipient.
+
+        Args:
+            recipient_email: Recipient address (its domain is paced separately)
+
+        Returns:
+            0 if the slot was reserved and the message may be sent now,
+            otherwise the number of seconds until the next slot opens
+        """
+        domain = recipient_email.rsplit("@", 1)[-1].lower()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                self._conn.execute("DELETE FROM mail_send_log WHERE sent_at <= ?", (now - DAY,))
+
+                wait = max(0.0, self._next_slot(domain) - now)
+                if wait == 0:
+                    self._conn.execute(
+                        "INSERT INTO mail_send_log (sent_at, domain) VALUES (?, ?)", (now, domain)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if wait > 0:
+            logger.debug("Send to %s deferred by %.1fs (quota)", domain, wait)
+        return wait
+
+    def projected_drain_seconds(self, pending: int) -> float:
+        """
+        Estimate how long it takes to send `pending` messages under the budgets.
+
+        Domain pacing is ignored, so this is a lower bound when many messages
+        share a recipient domain.
+        """
+        if pending <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.time()
+            day_log = [row[0] for row in self._conn.execute(
+                "SELECT sent_at FROM mail_send_log WHERE sent_at > ? ORDER BY sent_at", (now - DAY,)
+            )]
+
+        start = now
+        last_batch = pending
+        if self.per_day > 0:
+            remaining_today = max(0, self.per_day - len(day_log))
+            overflow = pending - remaining_today
+            if overflow > 0:
+                # Each message beyond today's budget waits for an old send to age out
+                full_days, index = divmod(overflow - 1, self.per_day)
+                expiry = day_log[index] + DAY if index < len(day_log) else now + DAY
+                start = expiry + full_days * DAY
+                last_batch = index + 1
+
+        if self.per_minute > 0 and last_batch > self.per_minute:
+            # The final batch is spread over consecutive minute windows
+            start += (math.ceil(last_batch / self.per_minute) - 1) * MINUTE
+        return round(start - now, 1)
+
+    def get_stats(self, pending: int = 0) -> Dict[str, Any]:
+        """
+        Current budget usage.
+
+        Args:
+            pending: Messages waiting to be sent (for the drain projection)
+        """
+        with self._lock:
+            now = time.time()
+            last_minute = self._conn.execute(
+                "SELECT COUNT(*) FROM mail_send_log WHERE sent_at > ?", (now - MINUTE,)
+            ).fetchone()[0]
+            last_day = self._conn.execute(
+                "SELECT COUNT(*) FROM mail_send_log WHERE sent_at > ?", (now - DAY,)
+            ).fetchone()[0]
+        return {
+            "limit_per_minute": self.per_minute,
+            "limit_per_day": self.per_day,
+            "domain_min_interval_seconds": self.domain_min_interval,
+            "sent_last_minute": last_minute,
+            "sent_last_day": last_day,
+            "pending": pending,
+            "projected_drain_seconds": self.projected_drain_seconds(pending),
+        }
+
+    def _next_slot(self, domain: str) -> float:
+        """Earliest epoch time at which all budgets allow another send"""
+        candidates = [0.0]
+        for limit, window in ((self.per_minute, MINUTE), (self.per_day, DAY)):
+            if limit > 0:
+                # The limit-th most recent send must have left the window
+                row = self._conn.execute(
+                    "SELECT sent_at FROM mail_send_log ORDER BY sent_at DESC LIMIT 1 OFFSET ?",
+                    (limit - 1,)
+                ).fetchone()
+                if row:
+                    candidates.append(row[0] + window)
+        if self.domain_min_interval > 0:
+            row = self._conn.execute(
+                "SELECT MAX(sent_at) FROM mail_send_log WHERE domain = ?", (domain,)
+            ).fetchone()
+            if row[0] is not None:
+                candidates.append(row[0] + self.domain_min_interval)
+        return max(candidates)
@@ -0,0 +1,388 @@
+"""
+SMTP Connection Pool
+Keeps authenticated SMTP sessions alive between sends
+"""
+
+import time
+import asyncio
+import logging
+import smtplib
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from email_templates import PreparedMessage
+from mime_stream import iter_data_chunks
+from async_smtp import AsyncSMTPClient, AsyncSMTPError, AsyncSMTPDisconnected
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    """An authenticated SMTP session (smtplib or async) plus bookkeeping"""
+
+    def __init__(self, server: Union[smtplib.SMTP, AsyncSMTPClient]):
+        self.server = server
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class _BasePool:
+    """
+    Configuration and statistics shared by the sync and async pools.
+
+    Idle sessions are health-checked with NOOP before reuse, dropped sessions
+    are replaced transparently and every session is recycled after
+    `max_messages_per_connection` messages.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        max_connections: int = 2,
+        max_messages_per_connection: int = 100,
+        noop_interval: float = 30.0,
+        timeout: float = 30.0
+    ):
+        """
+        Initialize the pool. No connection is opened until the first send.
+
+        Args:
+            host: SMTP server hostname
+            port: SMTP port (465 = implicit TLS, anything else = STARTTLS)
+            username: SMTP login
+            password: SMTP password
+            max_connections: Maximum number of concurrent sessions
+            max_messages_per_connection: Messages sent before a session is recycled
+            noop_interval: Idle seconds after which a session is checked with NOOP
+            timeout: Socket timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_connections = max_connections
+        self.max_messages_per_connection = max_messages_per_connection
+        self.noop_interval = noop_interval
+        self.timeout = timeout
+
+        self._idle: List[_PooledConnection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._stats = {
+            "connections_opened": 0,
+            "connections_recycled": 0,
+            "reconnects": 0,
+            "sends_reused": 0,
+            "sends_fresh": 0,
+            "latency_reused_total": 0.0,
+            "latency_fresh_total": 0.0,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool statistics.
+
+        Returns:
+            Counters plus average send latency with and without session reuse
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            idle = len(self._idle)
+
+        reused_total = stats.pop("latency_reused_total")
+        fresh_total = stats.pop("latency_fresh_total")
+        stats["idle_connections"] = idle
+        stats["max_connections"] = self.max_connections
+        stats["avg_send_ms_reused"] = (
+            round(reused_total / stats["sends_reused"] * 1000, 1) if stats["sends_reused"] else None
+        )
+        stats["avg_send_ms_fresh"] = (
+            round(fresh_total / stats["sends_fresh"] * 1000, 1) if stats["sends_fresh"] else None
+        )
+        return stats
+
+    def _record_send(self, latency: float, reused: bool):
+        connection = "reused" if reused else "fresh"
+        metrics.SMTP_SEND_LATENCY.labels(connection).observe(latency)
+        now = time.time()
+        tracing.record("smtp.send", now - latency, now, connection=connection)
+        with self._lock:
+            if reused:
+                self._stats["sends_reused"] += 1
+                self._stats["latency_reused_total"] += latency
+            else:
+                self._stats["sends_fresh"] += 1
+                self._stats["latency_fresh_total"] += latency
+
+    def _record(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+
+
+class SMTPConnectionPool(_BasePool):
+    """Thread-safe pool of authenticated smtplib sessions"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+
+    def send(self, message: PreparedMessage) -> float:
+        """
+        Send a message over a pooled session.
+
+        Args:
+            message: Serialized email message
+
+        Returns:
+            Send latency in seconds (including connect/login for fresh sessions)
+
+        Raises:
+            smtplib.SMTPException: If the message could not be sent
+        """
+        with self._slots:
+            start = time.perf_counter()
+            conn, reused = self._checkout()
+            try:
+                self._sendmail(conn.server, message)
+            except smtplib.SMTPServerDisconnected:
+                self._discard(conn)
+                if not reused:
+                    raise
+                # The server dropped a pooled session since it was last used
+                logger.info("Pooled SMTP session dropped, reconnecting")
+                self._record("reconnects")
+                conn, reused = self._open(), False
+                try:
+                    self._sendmail(conn.server, message)
+                except Exception:
+                    self._discard(conn)
+                    raise
+            except Exception:
+                self._discard(conn)
+                raise
+
+            latency = time.perf_counter() - start
+            self._checkin(conn)
+
+        self._record_send(latency, reused)
+        return latency
+
+    def close(self):
+        """Close all idle sessions and stop pooling"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._quit(conn)
+
+    def _sendmail(self, server: smtplib.SMTP, message: PreparedMessage):
+        """Send a message, streaming chunks to the socket during DATA"""
+        # Text parts are 8bit UTF-8
+        mail_options = ["BODY=8BITMIME"] if server.has_extn("8bitmime") else []
+
+        code, response = server.mail(message.from_addr, mail_options)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, response, message.from_addr)
+        for address in message.to_addrs:
+            code, response = server.rcpt(address)
+            if code not in (250, 251):
+                server.rset()
+                raise smtplib.SMTPRecipientsRefused({address: (code, response)})
+
+        server.putcmd("data")
+        code, response = server.getreply()
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, response)
+
+        for chunk in iter_data_chunks(message.iter_chunks()):
+            server.send(chunk)
+        server.send(b".\r\n")
+
+        code, response = server.getreply()
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPDataError(code, response)
+
+    def _checkout(self) -> Tuple[_PooledConnection, bool]:
+        """Return a healthy session and whether it was reused"""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._open(), False
+            if time.monotonic() - conn.last_used < self.noop_interval or self._is_alive(conn):
+                return conn, True
+            self._discard(conn)
+            self._record("reconnects")
+
+    def _checkin(self, conn: _PooledConnection):
+        """Return a session to the pool, recycling it if it has sent enough messages"""
+        conn.messages_sent += 1
+        conn.last_used = time.monotonic()
+
+        if conn.messages_sent >= self.max_messages_per_connection:
+            self._record("connections_recycled")
+            self._quit(conn)
+            return
+
+        with self._lock:
+            if not self._closed:
+                self._idle.append(conn)
+                return
+        self._quit(conn)
+
+    def _open(self) -> _PooledConnection:
+        """Connect and log in a new session"""
+        if self.port == 465:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            server.starttls()
+
+        try:
+            server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+
+        self._record("connections_opened")
+        logger.info("Opened pooled SMTP session to %s:%s", self.host, self.port)
+        return _PooledConnection(server)
+
+    def _is_alive(self, conn: _PooledConnection) -> bool:
+        """Health-check an idle session with NOOP"""
+        try:
+            code, _ = conn.server.noop()
+            return code == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _discard(self, conn: Optional[_PooledConnection]):
+        """Drop a broken session without raising"""
+        if conn is not None:
+            try:
+                conn.server.close()
+            except Exception:
+                pass
+
+    def _quit(self, conn: _PooledConnection):
+        """Politely end a session without raising"""
+        try:
+            conn.server.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.server.close()
+
+
+class AsyncSMTPConnectionPool(_BasePool):
+    """Pool of authenticated AsyncSMTPClient sessions for use on the event loop"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = asyncio.Semaphore(self.max_connections)
+
+    async def send(self, message: PreparedMessage) -> float:
+        """
+        Send a message over a pooled session.
+
+        Args:
+            message: Serialized email message
+
+        Returns:
+            Send latency in seconds (including connect/login for fresh sessions)
+
+        Raises:
+            AsyncSMTPError: If the message could not be sent
+        """
+        async with self._slots:
+            start = time.perf_counter()
+            conn, reused = await self._checkout()
+            try:
+                await conn.server.sendmail_chunks(message.from_addr, message.to_addrs, message.iter_chunks())
+            except AsyncSMTPDisconnected:
+                conn.server.close()
+                if not reused:
+                    raise
+                # The server dropped a pooled session since it was last used
+                logger.info("Pooled SMTP session dropped, reconnecting")
+                self._record("reconnects")
+                conn, reused = await self._open(), False
+                try:
+                    await conn.server.sendmail_chunks(message.from_addr, message.to_addrs, message.iter_chunks())
+                except BaseException:
+                    conn.server.close()
+                    raise
+            except BaseException:
+                conn.server.close()
+                raise
+
+            latency = time.perf_counter() - start
+            await self._checkin(conn)
+
+        self._record_send(latency, reused)
+        return latency
+
+    async def close(self):
+        """Close all idle sessions and stop pooling"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.server.quit()
+
+    async def _checkout(self) -> Tuple[_PooledConnection, bool]:
+        """Return a healthy session and whether it was reused"""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return await self._open(), False
+            if time.monotonic() - conn.last_used < self.noop_interval or await self._is_alive(conn):
+                return conn, True
+            conn.server.close()
+            self._record("reconnects")
+
+    async def _checkin(self, conn: _PooledConnection):
+        """Return a session to the pool, recycling it if it has sent enough messages"""
+        conn.messages_sent += 1
+        conn.last_used = time.monotonic()
+
+        if conn.messages_sent >= self.max_messages_per_connection:
+            self._record("connections_recycled")
+            await conn.server.quit()
+            return
+
+        with self._lock:
+            if not self._closed:
+                self._idle.append(conn)
+                return
+        await conn.server.quit()
+
+    async def _open(self) -> _PooledConnection:
+        """Connect and log in a new session"""
+        server = AsyncSMTPClient(
+            self.host,
+            self.port,
+            username=self.username,
+            password=self.password,
+            timeout=self.timeout
+        )
+        await server.connect()
+
+        self._record("connections_opened")
+        logger.info("Opened pooled async SMTP session to %s:%s", self.host, self.port)
+        return _PooledConnection(server)
+
+    async def _is_alive(self, conn: _PooledConnection) -> bool:
+        """Health-check an idle session with NOOP"""
+        try:
+            return await conn.server.noop() == 250
+        except (AsyncSMTPError, OSError, asyncio.TimeoutError):
+            return False
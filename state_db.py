@@ -0,0 +1,62 @@
+"""
+Local State Database
+Shared SQLite file used by the durable stores (mail outbox, counters, queues)
+"""
+
+import os
+import sqlite3
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_DB_PATH = "/tmp/ai_audit_reports/audit_state.db"
+
+
+def get_state_db_path() -> str:
+    """Return the configured state database path"""
+    return os.getenv("STATE_DB_PATH", DEFAULT_STATE_DB_PATH)
+
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    """
+    Open a connection to the state database.
+
+    The connection may be shared between threads; callers serialize access
+    with their own lock. WAL mode lets several processes read and write the
+    same file concurrently.
+
+    Args:
+        db_path: Database file (defaults to STATE_DB_PATH)
+
+    Returns:
+        sqlite3 connection in autocommit mode with dict-like rows
+    """
+    db_path = db_path or get_state_db_path()
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    logger.debug("Opened state database: %s", db_path)
+    return conn
+
+
+def ensure_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """
+    Add columns missing from a table created by an older version.
+
+    Args:
+        conn: State database connection
+        table: Existing table name
+        columns: Column name -> definition (e.g. "TEXT NOT NULL DEFAULT 'bulk'")
+    """
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logger.info("Added column %s.%s", table, name)
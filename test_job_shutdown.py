@@ -0,0 +1,66 @@
+"""
+Shutdown check for the job worker and the staged pipeline.
+
+Drives a drain timeout while a stage handler is still running and checks
+that the handler is stopped before its job is released to the queue, so
+the worker that claims the job next never runs alongside it.
+
+Usage:
+    python -m pytest -q test_job_shutdown.py
+"""
+
+import asyncio
+
+from job_queue import JobQueue, JobWorker
+from pipeline import Pipeline, Stage
+
+
+def test_drain_timeout_stops_handler_before_release(tmp_path):
+    events = []
+
+    async def run():
+        queue = JobQueue(db_path=str(tmp_path / "state.db"))
+        started = asyncio.Event()
+
+        async def slow_stage(item):
+            started.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                events.append("handler cancelled")
+                raise
+            events.append("handler finished")
+
+        pipeline = Pipeline([Stage("slow", slow_stage, workers=1, queue_size=1)])
+
+        async def handler(payload, job_id, created_at, lane, checkpoint):
+            await pipeline.run(payload)
+            return True
+
+        release = queue.release
+
+        def recording_release(job_id):
+            events.append("released")
+            release(job_id)
+
+        queue.release = recording_release
+        worker = JobWorker(queue, handler, concurrency=1, poll_interval=0.05)
+
+        pipeline.start()
+        worker.start()
+        queue.enqueue({"n": 1}, "job-1")
+        worker.notify()
+        await asyncio.wait_for(started.wait(), timeout=5)
+
+        await worker.stop(drain_timeout=0.1)
+        state = queue.get("job-1")
+        stats = pipeline.get_stats()["slow"]
+        await pipeline.stop()
+        queue.close()
+        return state, stats
+
+    state, stats = asyncio.run(run())
+
+    assert events == ["handler cancelled", "released"]
+    assert state["state"] == "pending"
+    assert stats["busy"] == 0
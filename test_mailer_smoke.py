@@ -0,0 +1,179 @@
+"""
+Smoke check for report delivery over the async SMTP pool.
+
+Runs EmailService.deliver_report_async against an in-process SMTP stub
+(STARTTLS with a throwaway self-signed certificate), so the whole send path
+(quota reservation, MIME build, pooled connection, DATA) runs without a
+real mail server.
+
+Usage:
+    python -m pytest -q test_mailer_smoke.py
+"""
+
+import asyncio
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+import async_smtp
+
+
+class StubSMTPServer:
+    """Minimal ESMTP server that accepts any login and records each message"""
+
+    def __init__(self, tls_context: ssl.SSLContext, starttls: bool = True):
+        self.tls_context = tls_context
+        self.starttls = starttls
+        self.commands = []
+        self.messages = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._session, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _session(self, reader, writer):
+        tls = False
+
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 stub ESMTP")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                verb = line.decode().strip().split(" ")[0].upper()
+                self.commands.append(verb)
+                if verb in ("EHLO", "HELO"):
+                    writer.write(b"250-stub\r\n")
+                    if self.starttls and not tls:
+                        writer.write(b"250-STARTTLS\r\n")
+                    await reply("250 AUTH PLAIN LOGIN")
+                elif verb == "STARTTLS":
+                    await reply("220 Ready to start TLS")
+                    await writer.start_tls(self.tls_context)
+                    tls = True
+                elif verb == "AUTH":
+                    await reply("235 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = bytearray()
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk == b".\r\n":
+                            break
+                        data += chunk
+                    self.messages.append(bytes(data))
+                    await reply("250 Queued")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Not implemented")
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is required to create the stub certificate")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", str(key), "-out", str(cert), "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return str(cert), str(key)
+
+
+def test_deliver_report_async(tmp_path, monkeypatch, certificate):
+    cert, key = certificate
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert, key)
+    client_context = ssl.create_default_context(cafile=cert)
+    monkeypatch.setattr(async_smtp.ssl, "create_default_context", lambda: client_context)
+
+    pdf_path = tmp_path / "report.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4\n% smoke test\n%%EOF\n")
+
+    async def run():
+        server = StubSMTPServer(server_context)
+        await server.start()
+        monkeypatch.setenv("SENDER_EMAIL", "audits@example.com")
+        monkeypatch.setenv("SMTP_PASSWORD", "secret")
+        monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+        monkeypatch.setenv("SMTP_PORT", str(server.port))
+        monkeypatch.setenv("STATE_DB_PATH", str(tmp_path / "state.db"))
+
+        from mailer import EmailService
+
+        service = EmailService()
+        try:
+            latency = await service.deliver_report_async(
+                recipient_email="owner@example.org",
+                recipient_name="Pat",
+                company_name="Acme Corp",
+                personalized_summary="Three quick wins for your site.",
+                pdf_path=str(pdf_path),
+            )
+        finally:
+            await service.async_pool.close()
+            await server.stop()
+        return latency, server.messages
+
+    latency, messages = asyncio.run(run())
+
+    assert latency >= 0
+    assert len(messages) == 1
+    assert b"To: owner@example.org" in messages[0]
+    assert b"Acme_Corp" in messages[0]
+
+
+def test_refuses_login_without_starttls(certificate):
+    cert, key = certificate
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert, key)
+
+    async def run():
+        server = StubSMTPServer(server_context, starttls=False)
+        await server.start()
+        client = async_smtp.AsyncSMTPClient("127.0.0.1", server.port, "audits@example.com", "secret", timeout=5)
+        try:
+            with pytest.raises(async_smtp.AsyncSMTPError):
+                await client.connect()
+        finally:
+            await server.stop()
+        return server.commands
+
+    commands = asyncio.run(run())
+
+    assert "AUTH" not in commands
+
+
+def test_attachment_filename_cannot_inject_headers():
+    from email_templates import _content_disposition
+    from mailer import EmailService
+
+    header = _content_disposition('Evil".pdf\r\nBcc: victim@example.com')
+    assert header.count(b"\r\n") == 2
+    assert b"filename*=utf-8''Evil%22.pdfBcc" in header
+
+    filename = EmailService._report_filename('Acme "Corp"\r\nBcc: x@example.com')
+    assert filename == "AI_Audit_Report_Acme_Corp_Bcc_x_example.com.pdf"
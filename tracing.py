@@ -0,0 +1,381 @@
+"""
+Request Tracing
+Lightweight spans per audit (webhook, queue, LLM, render, mail), exported to JSONL or an OTLP/HTTP collector
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import hashlib
+import logging
+import secrets
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# none | jsonl | otlp
+EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+JSONL_PATH = os.getenv("TRACING_JSONL_PATH", "/tmp/ai_audit_traces.jsonl")
+OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Fraction of audits traced; decided per request_id, so every process agrees
+SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "ai-audit-agent")
+
+_BATCH_SIZE = 256
+_FLUSH_INTERVAL = 1.0
+_MAX_PENDING = 10000
+
+
+@dataclass(frozen=True, slots=True)
+class SpanContext:
+    """Identity of a span, passed to children (also across processes)"""
+    trace_id: str
+    span_id: str
+    request_id: str
+
+
+@dataclass(slots=True)
+class Span:
+    """One timed operation of an audit"""
+    name: str
+    context: SpanContext
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    def set(self, **attributes: Any):
+        """Add attributes (e.g. results known only at the end)"""
+        self.attributes.update(attributes)
+
+    def fail(self, error: str):
+        """Mark the span as failed without raising through it"""
+        self.status = "error"
+        self.attributes["error"] = error
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.context.request_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is off or the audit is not sampled"""
+    __slots__ = ()
+
+    def set(self, **attributes: Any):
+        pass
+
+    def fail(self, error: str):
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Optional[SpanContext]] = ContextVar("trace_span", default=None)
+
+
+def enabled() -> bool:
+    return EXPORTER in ("jsonl", "otlp")
+
+
+def trace_id_for(request_id: str) -> str:
+    """Trace ID (32 hex chars, as in OTLP) derived from the request_id"""
+    return hashlib.blake2b(request_id.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def current() -> Optional[SpanContext]:
+    """Context of the active span, to hand to work running elsewhere (a pipeline stage, a render process)"""
+    return _current.get()
+
+
+@contextmanager
+def attach(parent: Optional[SpanContext]) -> Iterator[None]:
+    """Make `parent` the active span, so spans opened inside become its children"""
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(
+    name: str,
+    request_id: Optional[str] = None,
+    parent: Optional[SpanContext] = None,
+    start: Optional[float] = None,
+    **attributes: Any
+) -> Iterator[Any]:
+    """
+    Time a block as a span.
+
+    The span joins the trace of `request_id` or, without one, of the active
+    span; with neither it is not recorded. An exception marks it as an error.
+
+    Args:
+        name: Span name (e.g. llm.attempt)
+        request_id: Audit the span belongs to
+        parent: Parent span (defaults to the active span of the same audit)
+        start: Start time (epoch seconds) if the operation began earlier
+        **attributes: Span attributes
+    """
+    new = _start(name, request_id, parent, start, attributes)
+    if new is None:
+        yield _NOOP
+        return
+
+    token = _current.set(new.context)
+    try:
+        yield new
+    except BaseException as e:
+        new.fail(f"{type(e).__name__}: {str(e)}")
+        raise
+    finally:
+        _current.reset(token)
+        new.end = time.time()
+        _exporter.export(new)
+
+
+def record(
+    name: str,
+    start: float,
+    end: float,
+    request_id: Optional[str] = None,
+    parent: Optional[SpanContext] = None,
+    **attributes: Any
+):
+    """Record a span whose start and end were measured elsewhere (e.g. time spent queued)"""
+    new = _start(name, request_id, parent, start, attributes)
+    if new is not None:
+        new.end = end
+        _exporter.export(new)
+
+
+def flush(timeout: float = 5.0):
+    """Wait until spans recorded so far have been exported"""
+    _exporter.flush(timeout)
+
+
+def _start(
+    name: str,
+    request_id: Optional[str],
+    parent: Optional[SpanContext],
+    start: Optional[float],
+    attributes: Dict[str, Any]
+) -> Optional[Span]:
+    if not enabled():
+        return None
+    parent = parent or _current.get()
+    if request_id is None:
+        if parent is None:
+            return None
+        request_id = parent.request_id
+    elif parent is not None and parent.request_id != request_id:
+        parent = None
+
+    trace_id = parent.trace_id if parent is not None else trace_id_for(request_id)
+    if SAMPLE_RATE < 1.0 and int(trace_id[:8], 16) / 0xFFFFFFFF >= SAMPLE_RATE:
+        return None
+    return Span(
+        name=name,
+        context=SpanContext(trace_id, secrets.token_hex(8), request_id),
+        parent_id=parent.span_id if parent is not None else None,
+        start=start if start is not None else time.time(),
+        attributes=attributes
+    )
+
+
+class _Exporter:
+    """
+    Ships finished spans from a background thread in batches, so recording a
+    span costs a queue put. Spans are dropped (and counted) if the exporter
+    falls too far behind.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=_MAX_PENDING)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def export(self, finished: Span):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a forked child (threads do not survive fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=_MAX_PENDING)
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch: List[Span] = []
+            waiters: List[threading.Event] = []
+            deadline = time.monotonic() + _FLUSH_INTERVAL
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    logger.warning("Exporting %d span(s) failed: %s", len(batch), e)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch: List[Span]):
+        if EXPORTER == "jsonl":
+            # One write per batch in append mode; lines from several processes do not interleave
+            data = b"".join(orjson.dumps(finished.to_dict(), default=str) + b"\n" for finished in batch)
+            with open(JSONL_PATH, "ab") as f:
+                f.write(data)
+        elif EXPORTER == "otlp":
+            import requests
+            response = requests.post(
+                OTLP_ENDPOINT,
+                data=orjson.dumps(_otlp_payload(batch), default=str),
+                headers={"Content-Type": "application/json"},
+                timeout=5
+            )
+            response.raise_for_status()
+
+
+def _otlp_payload(batch: List[Span]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON (ExportTraceServiceRequest) body"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [{
+                    "traceId": finished.context.trace_id,
+                    "spanId": finished.context.span_id,
+                    "parentSpanId": finished.parent_id or "",
+                    "name": finished.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(int(finished.start * 1e9)),
+                    "endTimeUnixNano": str(int(finished.end * 1e9)),
+                    "attributes": _otlp_attributes({"audit.request_id": finished.context.request_id, **finished.attributes}),
+                    "status": {"code": 2, "message": finished.attributes.get("error", "")}
+                    if finished.status == "error" else {"code": 1},
+                } for finished in batch],
+            }],
+        }]
+    }
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    converted = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            converted.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            converted.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            converted.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            converted.append({"key": key, "value": {"stringValue": str(value)}})
+    return converted
+
+
+_exporter = _Exporter()
+atexit.register(flush)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(path: str, quantile: float = 0.99):
+    """
+    Print span latency percentiles from a JSONL trace file, and the spans of
+    the audit at the given quantile of end-to-end time (its critical path).
+    """
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                entry = orjson.loads(line)
+                traces.setdefault(entry["trace_id"], []).append(entry)
+
+    durations: Dict[str, List[float]] = {}
+    for spans in traces.values():
+        for entry in spans:
+            durations.setdefault(entry["name"], []).append(entry["duration_ms"])
+    print(f"{len(traces)} traces\n")
+    print(f"{'span':<20} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, values in sorted(durations.items()):
+        values.sort()
+        print(f"{name:<20} {len(values):>7} {_percentile(values, 0.50):>10.1f} {_percentile(values, 0.95):>10.1f} "
+              f"{_percentile(values, 0.99):>10.1f} {values[-1]:>10.1f}")
+
+    audits = sorted(
+        (entry["duration_ms"], trace_id)
+        for trace_id, spans in traces.items()
+        for entry in spans if entry["name"] == "audit"
+    )
+    if not audits:
+        return
+    total_ms, trace_id = audits[min(len(audits) - 1, max(0, int(round(quantile * len(audits))) - 1))]
+    # Parents before children starting at the same time
+    spans = sorted(traces[trace_id], key=lambda entry: (entry["start"], -entry["duration_ms"]))
+    origin = spans[0]["start"]
+    depth = {}
+    print(f"\np{quantile * 100:g} audit {spans[0]['request_id']}: {total_ms / 1000:.2f}s\n")
+    for entry in spans:
+        depth[entry["span_id"]] = depth.get(entry["parent_id"], -1) + 1
+        offset = (entry["start"] - origin) * 1000
+        label = "  " * depth[entry["span_id"]] + entry["name"]
+        bar_start = int(offset / total_ms * 40) if total_ms else 0
+        bar = " " * bar_start + "#" * max(1, int(entry["duration_ms"] / total_ms * 40) if total_ms else 1)
+        print(f"{label:<28} +{offset:>9.0f} ms {entry['duration_ms']:>9.0f} ms |{bar:<41}|")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1] if len(sys.argv) > 1 else JSONL_PATH)